@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Agent Pool for WealthLens
+Reusable Agno agents per role: checked out for exactly one call, reset, and returned
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List
+
+from agno.agent import Agent
+
+
+class AgentPool:
+    """
+    Elastic pool of identically configured agents for one role. A caller holds an agent
+    exclusively for the duration of one run, so concurrent research requests never share
+    run state; when every pooled agent is busy a new one is built instead of waiting.
+    """
+
+    def __init__(self, role: str, factory: Callable[[], Agent], max_idle: int = 4):
+        self.role = role
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle: List[Agent] = []
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "in_use": 0}
+
+    @staticmethod
+    def _reset(agent: Agent) -> None:
+        """Drop what the previous call left on the agent (messages, last run)"""
+        memory = getattr(agent, "memory", None)
+        if memory is not None and hasattr(memory, "clear"):
+            memory.clear()
+        if hasattr(agent, "run_response"):
+            agent.run_response = None
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            agent = self._idle.pop() if self._idle else None
+            self._stats["reused" if agent is not None else "created"] += 1
+            self._stats["in_use"] += 1
+        if agent is None:
+            agent = self.factory()
+        try:
+            yield agent
+        finally:
+            self._reset(agent)
+            with self._lock:
+                self._stats["in_use"] -= 1
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(agent)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "idle": len(self._idle)}
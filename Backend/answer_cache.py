@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Semantic Answer Cache for WealthLens
+Reuses answers for near-identical questions, matched by embedding similarity
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, FrozenSet, Optional, Tuple
+
+import numpy as np
+from termcolor import colored
+
+from single_flight import normalize_query
+from vars import (
+    ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_TTL, ANSWER_CACHE_REALTIME_TTL, ANSWER_CACHE_MAX_ENTRIES
+)
+
+# Words of a question: tickers keep their $, ^ and .NS, figures their separators
+WORD_PATTERN = re.compile(r"[$^]?[A-Za-z0-9][\w&.%-]*")
+# Words that may change between two questions without changing what is asked
+FUNCTION_WORDS = frozenset(
+    "a an the is are was were be do does did of in on at to for from by with about and or "
+    "i me my we our you your it its s this that these those what how".split()
+)
+
+
+def query_entities(query: str) -> FrozenSet[str]:
+    """Figures, tickers and capitalized names in a question: TCS, $AAPL, ^NSEI, Reliance, 2025, 12.5%"""
+    entities = set()
+    for i, word in enumerate(WORD_PATTERN.findall(query)):
+        word = word.rstrip(".-")
+        if (any(c.isdigit() for c in word) or word[0] in "$^"
+                or (word.isupper() and word != "I")
+                or (word[0].isupper() and i > 0)):  # A question's first word is capitalized anyway
+            entities.add(word.lower())
+    return frozenset(entities)
+
+
+def swaps_words(a: str, b: str) -> bool:
+    """
+    Two normalized questions of the same length that differ only by words swapped in place,
+    at least one of them a content word: how lowercase names differ ("invest in tesla" / "invest in nvidia")
+    """
+    a_words, b_words = a.split(), b.split()
+    if len(a_words) != len(b_words):
+        return False
+    return any(x != y and not {x, y} <= FUNCTION_WORDS for x, y in zip(a_words, b_words))
+
+
+class _CachedAnswer:
+    __slots__ = ("query", "mode", "vector", "entities", "response", "expires_at", "hits")
+
+    def __init__(self, query: str, mode: str, vector: np.ndarray, response: Dict[str, Any], expires_at: float):
+        self.query = query
+        self.mode = mode
+        self.vector = vector
+        self.entities = query_entities(query)
+        self.response = response
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class SemanticAnswerCache:
+    """
+    Embedding-keyed answer cache with TTLs, LRU eviction and hit-rate metrics.
+    Keys hold the question only, so callers must bypass it for answers that depend on session history.
+    A similar question is only served another's answer when both name the same entities, since
+    "price of AAPL today" and "price of MSFT today" embed almost identically.
+    """
+
+    def __init__(self, embeddings=None, threshold: float = ANSWER_CACHE_SIMILARITY,
+                 ttl: float = ANSWER_CACHE_TTL, realtime_ttl: float = ANSWER_CACHE_REALTIME_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        if embeddings is None:
+            from models import Models
+            embeddings = Models().embeddings_ollama
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.realtime_ttl = realtime_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], _CachedAnswer]" = OrderedDict()  # (mode, normalized query)
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "exact_hits": 0, "misses": 0, "stores": 0,
+                       "evictions": 0, "expired": 0, "invalidated": 0, "embed_errors": 0,
+                       "entity_mismatches": 0}
+
+    # --- internals ---
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _purge_expired(self, now: float) -> None:
+        """Drop expired entries. Caller holds the lock."""
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self._stats["expired"] += len(expired)
+
+    def _best_match(self, query: str, vector: np.ndarray, mode: str) -> Tuple[Optional[Tuple[str, str]], float]:
+        """
+        Most similar cached question of this mode that clears the threshold and names the same entities.
+        Caller holds the lock.
+        """
+        keys = [key for key in self._entries if key[0] == mode]
+        if not keys:
+            return None, 0.0
+        matrix = np.vstack([self._entries[key].vector for key in keys])
+        scores = matrix @ vector  # unit vectors: dot product == cosine similarity
+        entities, normalized = query_entities(query), normalize_query(query)
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                break
+            entry = self._entries[keys[i]]
+            if entry.entities == entities and not swaps_words(keys[i][1], normalized):
+                return keys[i], float(scores[i])
+            self._stats["entity_mismatches"] += 1
+        return None, 0.0
+
+    def _hit(self, key: Tuple[str, str], similarity: float, exact: bool) -> Dict[str, Any]:
+        """Record a hit and return the cached response. Caller holds the lock."""
+        entry = self._entries[key]
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        if exact:
+            self._stats["exact_hits"] += 1
+        print(colored(f"Answer cache hit (similarity {similarity:.3f}) for: '{entry.query}'", "green"))
+        return dict(entry.response, cache={"hit": True, "similarity": round(similarity, 4), "matched_query": entry.query})
+
+    # --- public API ---
+
+    async def alookup(self, query: str, mode: str = "standard") -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Look up a cached answer. Returns (response or None, query vector).
+        Pass the vector back to store() so a miss is only embedded once.
+        """
+        key = (mode, normalize_query(query))
+        now = time.monotonic()
+        with self._lock:
+            self._stats["lookups"] += 1
+            self._purge_expired(now)
+            # Exact normalized text needs no embedding call
+            if key in self._entries:
+                return self._hit(key, 1.0, exact=True), None
+
+        try:
+            vector = self._unit(await self.embeddings.aembed_query(key[1]))
+        except Exception as e:
+            print(colored(f"Answer cache embedding failed: {e}", "yellow"))
+            with self._lock:
+                self._stats["embed_errors"] += 1
+                self._stats["misses"] += 1
+            return None, None
+
+        with self._lock:
+            match, similarity = self._best_match(query, vector, mode)
+            if match:
+                return self._hit(match, similarity, exact=False), vector
+            self._stats["misses"] += 1
+        return None, vector
+
+    async def astore(self, query: str, response: Dict[str, Any], realtime: bool,
+                     mode: str = "standard", vector: Optional[np.ndarray] = None) -> None:
+        """Cache an answer; real-time questions get the short TTL"""
+        normalized = normalize_query(query)
+        if vector is None:
+            try:
+                vector = self._unit(await self.embeddings.aembed_query(normalized))
+            except Exception as e:
+                print(colored(f"Answer cache embedding failed, not caching: {e}", "yellow"))
+                with self._lock:
+                    self._stats["embed_errors"] += 1
+                return
+
+        ttl = self.realtime_ttl if realtime else self.ttl
+        cached = {k: v for k, v in response.items() if k != "cache"}
+        with self._lock:
+            self._entries[(mode, normalized)] = _CachedAnswer(query, mode, vector, cached, time.monotonic() + ttl)
+            self._entries.move_to_end((mode, normalized))
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    async def ainvalidate(self, query: Optional[str] = None, mode: Optional[str] = None) -> int:
+        """
+        Explicit invalidation. With a query: drop every entry the query would match.
+        Without one: drop everything (optionally only for one mode). Returns entries removed.
+        """
+        vector = None
+        if query is not None:
+            try:
+                vector = self._unit(await self.embeddings.aembed_query(normalize_query(query)))
+            except Exception as e:
+                print(colored(f"Answer cache embedding failed during invalidation: {e}", "yellow"))
+
+        with self._lock:
+            doomed = []
+            for key, entry in self._entries.items():
+                if mode is not None and key[0] != mode:
+                    continue
+                if query is None:
+                    doomed.append(key)
+                elif key[1] == normalize_query(query):
+                    doomed.append(key)
+                elif vector is not None and float(entry.vector @ vector) >= self.threshold:
+                    doomed.append(key)
+            for key in doomed:
+                del self._entries[key]
+            self._stats["invalidated"] += len(doomed)
+        return len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return stats
+
+
+# Create a global instance
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Async helpers for WealthLens
+Runs the parts of the pipeline that have no async API on a bounded thread pool
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import httpx
+
+from vars import BLOCKING_EXECUTOR_WORKERS
+
+# Shared by every async caller so the total number of blocking threads stays bounded
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_EXECUTOR_WORKERS,
+    thread_name_prefix="wealthlens-blocking",
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the shared executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context into the worker thread (per-request metrics breakdown)
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(blocking_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+class LoopLocalAsyncClient(httpx.AsyncClient):
+    """
+    httpx.AsyncClient for objects that outlive an event loop (SDK clients built once per process).
+    Pooled connections belong to the loop that opened them, so requests are sent through one inner
+    client per running loop, made by `factory`; a loop's client is dropped with the loop.
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncClient], **kwargs):
+        super().__init__(**kwargs)
+        self._factory = factory
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    def loop_client(self) -> httpx.AsyncClient:
+        """The inner client of the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = self._clients[loop] = self._factory()
+            return client
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self.loop_client().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the running loop's inner client (other loops' clients go with their loops)"""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Agent Pool Benchmark for WealthLens
+Per-call cost of building a fresh Agno agent versus checking one out of a role pool (no LLM calls)
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from agno.agent import Agent
+from termcolor import colored
+
+from agent_pool import AgentPool
+from deep_research import yf_tool
+from vars import get_llm_id, get_llm_provider
+
+
+def factory():
+    # The heaviest DeepResearch role: tool-enabled YFinance agent
+    return Agent(model=get_llm_provider(get_llm_id("reasoning")), tools=[yf_tool], show_tool_calls=True, markdown=True)
+
+
+def measure(label: str, step, calls: int):
+    timings = []
+    tracemalloc.start()
+    for _ in range(calls):
+        start = time.perf_counter()
+        step()
+        timings.append((time.perf_counter() - start) * 1e6)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    print(f"{label:<18} mean {statistics.mean(timings):9.1f} us   p95 {timings[int(0.95 * (len(timings) - 1))]:9.1f} us   "
+          f"peak alloc {peak / 1024:8.1f} KiB")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent construction versus pooled reuse")
+    parser.add_argument("--calls", type=int, default=200, help="Agent checkouts to time (a deep research run makes 20+)")
+    args = parser.parse_args()
+
+    factory()  # Warm the LLM client registry so both paths start equal
+    pool = AgentPool("yfinance", factory)
+
+    def pooled():
+        with pool.acquire():
+            pass
+
+    fresh_us = measure("fresh Agent()", factory, args.calls)
+    pooled_us = measure("pooled acquire", pooled, args.calls)
+    print(colored(f"Overhead removed per call: {fresh_us - pooled_us:.1f} us "
+                  f"({fresh_us / max(pooled_us, 1e-9):.0f}x), pool stats: {pool.stats()}", "green"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Replay Benchmark for WealthLens
+p50/p95/p99 latency, throughput and peak RSS of the query pipeline, deep research and web search at rising concurrency, offline
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable
+
+from termcolor import colored
+
+from provider_replay import ProviderReplay, DEFAULT_FIXTURES_PATH, parse_latency
+
+DEFAULT_QUERIES = [
+    "What is the current price of Reliance Industries?",
+    "How did the Nifty 50 and Sensex close today?",
+    "Compare the P/E ratios of TCS and Infosys",
+    "What are the key risks of investing in small-cap mutual funds?",
+    "Latest news on Apple earnings",
+    "Should I invest in gold ETFs or sovereign gold bonds?",
+    "What is the price of bitcoin in USD?",
+    "Explain the difference between ELSS and PPF for tax saving",
+]
+TARGETS = ("query", "deep_research", "search")
+# Layers that would answer repeated benchmark queries without running the pipeline
+CACHE_FLAGS = ("ENABLE_ANSWER_CACHE", "ENABLE_REQUEST_COALESCING", "ENABLE_SEARCH_CACHE",
+               "ENABLE_QUOTE_CACHE", "ENABLE_EMBEDDING_CACHE")
+
+
+class RSSSampler:
+    """Peak resident set size while a concurrency level runs, sampled from /proc"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_kb() -> int:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak since start, KiB on Linux
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_kb = self.current_kb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, max(math.ceil(p * len(sorted_values)) - 1, 0))]
+
+
+def level_report(target: str, concurrency: int, latencies: List[float], errors: int, wall: float, peak_kb: int) -> Dict[str, Any]:
+    done = len(latencies)
+    latencies = sorted(latencies) or [0.0]
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": done + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "throughput_rps": round(done / wall, 2) if wall else 0.0,
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def configure_caches(keep: bool) -> str:
+    """
+    Call before any target is imported: modules read these settings from vars at import.
+    Caches and request coalescing are switched off so every request runs the pipeline and every
+    provider call is recorded; with keep they stay on, backed by empty files in a temp directory
+    rather than ./db. Returns that directory.
+    """
+    import vars
+    cache_dir = tempfile.mkdtemp(prefix="wealthlens-replay-")
+    for flag in CACHE_FLAGS:
+        setattr(vars, flag, keep)
+    vars.SEARCH_CACHE_PATH = os.path.join(cache_dir, "search_cache.sqlite3")
+    vars.EMBEDDING_CACHE_PATH = os.path.join(cache_dir, "embedding_cache.sqlite3")
+    return cache_dir
+
+
+# --- Targets ---
+
+def make_target(name: str, deep_search: bool) -> Dict[str, Any]:
+    """{"async": bool, "call": fn(query)}; imports happen here, after the replay is installed"""
+    if name == "query":
+        import run
+        from conversation_memory import SummarizingMemory
+        from session_store import MemorySessionStore
+        store = MemorySessionStore()
+
+        async def call(query: str):
+            memory = SummarizingMemory(store, uuid.uuid4().hex)
+            return await run.aprocess_query_flow(query, memory, deep_search=deep_search)
+        return {"async": True, "call": call}
+
+    if name == "deep_research":
+        from deep_research import DeepResearch
+        from vars import MAX_SEARCH_CALLS, MAX_DEPTH
+        # research() keeps per-run state off the instance: one researcher serves every worker
+        researcher = DeepResearch(max_search_calls=MAX_SEARCH_CALLS, max_depth=MAX_DEPTH)
+
+        def call(query: str):
+            return researcher.research(query)
+        return {"async": False, "call": call}
+
+    if name == "search":
+        from enhanced_web_search import enhanced_web_search
+
+        async def call(query: str):
+            return await enhanced_web_search.acomprehensive_search(query, os.environ.get("TAVILY_API_KEY"))
+        return {"async": True, "call": call}
+
+    raise ValueError(f"Unknown target {name!r}, expected one of {TARGETS}")
+
+
+async def _run_async_level(call: Callable, queries: List[str], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(query: str):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(query)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(colored(f"  {type(e).__name__}: {e}", "red"))
+
+    await asyncio.gather(*(one(q) for q in queries))
+    return latencies, errors
+
+
+def _run_sync_level(call: Callable, queries: List[str], concurrency: int):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(query: str):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            call(query)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+        except Exception as e:
+            with lock:
+                errors += 1
+            print(colored(f"  {type(e).__name__}: {e}", "red"))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, queries))
+    return latencies, errors
+
+
+def run_level(target: Dict[str, Any], name: str, queries: List[str], concurrency: int) -> Dict[str, Any]:
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        if target["async"]:
+            latencies, errors = asyncio.run(_run_async_level(target["call"], queries, concurrency))
+        else:
+            latencies, errors = _run_sync_level(target["call"], queries, concurrency)
+        wall = time.perf_counter() - start
+    return level_report(name, concurrency, latencies, errors, wall, rss.peak_kb)
+
+
+def record(targets: List[str], queries: List[str], deep_search: bool):
+    """Each query once per target, sequentially, against the live providers"""
+    for name in targets:
+        target = make_target(name, deep_search)
+        for query in queries:
+            print(colored(f"Recording {name}: {query}", "cyan"))
+            try:
+                if target["async"]:
+                    asyncio.run(target["call"](query))
+                else:
+                    target["call"](query)
+            except Exception as e:
+                print(colored(f"  {type(e).__name__}: {e}", "red"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WealthLens offline against recorded provider fixtures")
+    parser.add_argument("--record", action="store_true", help="Call the live providers once and save fixtures")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_PATH)
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64", help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default: max(2 x level, queries))")
+    parser.add_argument("--queries", help="Text file, one query per line (default: built-in finance questions)")
+    parser.add_argument("--deep-search", action="store_true", help="Run the query target with deep research")
+    parser.add_argument("--latency", default="recorded",
+                        help='"recorded", or per provider seconds, e.g. llm=0.8,tavily=1.2,yfinance=0.3,search=0.5')
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every injected latency")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- fraction of random latency jitter")
+    parser.add_argument("--caches", action="store_true",
+                        help="Keep the answer/search/quote/embedding caches and request coalescing on (replay only)")
+    parser.add_argument("--output", help="Write the results as JSON lines to this file")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = DEFAULT_QUERIES
+
+    if not args.record:
+        # Clients refuse to build without keys; nothing reaches the real APIs during replay
+        for key in ("GROQ_API_KEY", "TAVILY_API_KEY"):
+            os.environ.setdefault(key, "replay")
+    # Recording must reach every provider: a cache hit would leave its call out of the fixtures
+    cache_dir = configure_caches(keep=args.caches and not args.record)
+
+    replay = ProviderReplay(args.fixtures, mode="record" if args.record else "replay",
+                            latency=parse_latency(args.latency), latency_scale=args.latency_scale, jitter=args.jitter)
+    replay.install()
+
+    if args.record:
+        try:
+            record(targets, queries, args.deep_search)
+        finally:
+            replay.uninstall()
+            replay.save()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        print(json.dumps(replay.stats()))
+        return
+
+    results = []
+    for name in targets:
+        target = make_target(name, args.deep_search)
+        run_level(target, name, queries[:1], 1)  # Warm up: imports, lazy subsystems, agent pools
+        print(colored(f"\n{name}: levels {args.levels}", "cyan", attrs=["bold"]))
+        for level in [int(n) for n in args.levels.split(",")]:
+            count = args.requests or max(2 * level, len(queries))
+            result = run_level(target, name, [queries[i % len(queries)] for i in range(count)], level)
+            results.append(result)
+            print(json.dumps(result))
+    replay.uninstall()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(colored(f"\nReplay matches per provider: {json.dumps(replay.stats())}", "cyan"))
+    print(colored(f"Process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB", "cyan"))
+    if args.output:
+        with open(args.output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Retrieval Benchmark for WealthLens
+Recall@k, MRR and latency of the dense, hybrid and hybrid+rerank knowledge base retrievers
+"""
+
+import argparse
+import json
+import math
+import random
+import statistics
+import time
+from typing import Dict, Any, List
+
+from termcolor import colored
+
+from ingest import vector_store
+from hybrid_retriever import HybridRetriever, bm25_index, content_id, tokenize
+from reranker import reranker
+from vars import RETRIEVAL_FETCH_K
+
+
+def synthetic_queries(samples: int, terms: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Known-item queries: the rarest terms of a random chunk (tickers, codes and figures rank
+    first), with that chunk as the single relevant answer.
+    """
+    data = vector_store.get(include=["documents"])
+    texts = [t for t in data["documents"] if t and len(tokenize(t)) >= terms]
+    rng = random.Random(seed)
+    n = max(len(bm25_index), 1)
+    queries = []
+    for text in rng.sample(texts, min(samples, len(texts))):
+        unique_terms = set(tokenize(text))
+        by_rarity = sorted(unique_terms, key=lambda t: len(bm25_index.postings.get(t, {})) or n)
+        queries.append({"query": " ".join(by_rarity[:terms]), "relevant_ids": [content_id(text)]})
+    return queries
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    """JSONL lines of {"query": ..., "relevant": [substring, ...]}; a chunk containing any substring is relevant"""
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(doc, case: Dict[str, Any]) -> bool:
+    if "relevant_ids" in case:
+        return content_id(doc.page_content) in case["relevant_ids"]
+    return any(snippet.lower() in doc.page_content.lower() for snippet in case["relevant"])
+
+
+def evaluate(name: str, retriever, cases: List[Dict[str, Any]], k: int) -> Dict[str, Any]:
+    latencies, hits, reciprocal_ranks = [], 0, []
+    for case in cases:
+        start = time.perf_counter()
+        docs = retriever.invoke(case["query"])[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = next((i for i, doc in enumerate(docs, start=1) if is_relevant(doc, case)), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    latencies.sort()
+    return {
+        "retriever": name,
+        f"recall@{k}": round(hits / len(cases), 3),
+        "mrr": round(statistics.mean(reciprocal_ranks), 3),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark knowledge base retrievers")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", help="JSONL file of labelled queries (default: synthetic known-item queries)")
+    parser.add_argument("--samples", type=int, default=100, help="Synthetic queries to generate")
+    parser.add_argument("--terms", type=int, default=4, help="Terms per synthetic query")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if not len(bm25_index):
+        bm25_index.rebuild_from_store(vector_store)
+    cases = load_queries(args.queries) if args.queries else synthetic_queries(args.samples, args.terms, args.seed)
+    if not cases:
+        print(colored("No queries to run: ingest some documents first.", "red"))
+        return
+
+    retrievers = {
+        "dense": vector_store.as_retriever(search_kwargs={"k": args.k}),
+        "hybrid": HybridRetriever(vector_store=vector_store, bm25=bm25_index, k=args.k, fetch_k=RETRIEVAL_FETCH_K),
+    }
+    if reranker.available:
+        retrievers["hybrid+rerank"] = HybridRetriever(
+            vector_store=vector_store, bm25=bm25_index, k=args.k, fetch_k=RETRIEVAL_FETCH_K, reranker=reranker)
+
+    print(colored(f"Benchmarking {len(retrievers)} retrievers on {len(cases)} queries (k={args.k})", "cyan"))
+    for name, retriever in retrievers.items():
+        retriever.invoke(cases[0]["query"])  # Warm up (model load, index load)
+        print(json.dumps(evaluate(name, retriever, cases, args.k)))
+
+
+if __name__ == "__main__":
+    main()
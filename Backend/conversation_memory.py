@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Conversation Memory for WealthLens
+Token-budgeted session memory: recent turns verbatim, older turns folded into a rolling summary
+"""
+
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, message_to_dict
+from termcolor import colored
+
+from llm_scheduler import llm_priority
+from session_store import SessionStore, SessionChatMessageHistory
+from vars import MEMORY_RECENT_TURNS, MEMORY_TOKEN_BUDGET, MEMORY_SUMMARY_TOKENS
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for English text with Llama-family tokenizers; no tokenizer download needed"""
+    return len(text) // 4 + 1
+
+
+def clip_to_tokens(text: str, tokens: int, keep: str = "head") -> str:
+    """Cut text to roughly `tokens` tokens, keeping its beginning or its end"""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit] + " …" if keep == "head" else "… " + text[-limit:]
+
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(m.content) for m in messages)
+
+
+class SummarizingMemory:
+    """
+    Drop-in for ConversationBufferMemory in the query pipeline (load_memory_variables /
+    save_context / clear), over the same session store. The history handed to the LLM is at most
+    `token_budget` tokens: a rolling summary (within `summary_tokens`) followed by the last
+    `recent_turns` question/answer pairs verbatim. After each turn, older pairs are folded into
+    the summary with summarizer.summarize (or `summarize_fn`, same signature), so prompt size
+    stays flat however long the session runs.
+    """
+
+    memory_key = "chat_history"
+
+    def __init__(self, store: SessionStore, session_id: str, recent_turns: int = MEMORY_RECENT_TURNS,
+                 token_budget: int = MEMORY_TOKEN_BUDGET, summary_tokens: int = MEMORY_SUMMARY_TOKENS,
+                 summarize_fn: Optional[Callable[..., str]] = None):
+        self.chat_memory = SessionChatMessageHistory(store, session_id)
+        self.store = store
+        self.session_id = session_id
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarize_fn = summarize_fn
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @staticmethod
+    def _split(messages: List[BaseMessage]) -> Tuple[str, List[BaseMessage]]:
+        """(summary text, verbatim messages) of a stored history"""
+        if messages and isinstance(messages[0], SystemMessage) and messages[0].content.startswith(SUMMARY_PREFIX):
+            return messages[0].content[len(SUMMARY_PREFIX):], messages[1:]
+        return "", messages
+
+    def _within_budget(self, summary: str, verbatim: List[BaseMessage]) -> List[BaseMessage]:
+        """Newest verbatim messages that fit next to the summary; the latest pair is always kept, clipped if needed"""
+        budget = self.token_budget - (estimate_tokens(summary) if summary else 0)
+        kept: List[BaseMessage] = []
+        used = 0
+        for message in reversed(verbatim):
+            tokens = estimate_tokens(message.content)
+            if used + tokens > budget:
+                if len(kept) < 2:
+                    room = max(budget - used, 1) // (2 - len(kept))
+                    kept.append(type(message)(content=clip_to_tokens(message.content, room)))
+                    used += room
+                    continue
+                break
+            kept.append(message)
+            used += tokens
+        return kept[::-1]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, List[BaseMessage]]:
+        summary, verbatim = self._split(self.chat_memory.messages)
+        history = self._within_budget(summary, verbatim[-2 * self.recent_turns:])
+        if summary:
+            history.insert(0, SystemMessage(content=SUMMARY_PREFIX + summary))
+        return {self.memory_key: history}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        self.chat_memory.add_messages([
+            HumanMessage(content=str(next(iter(inputs.values()), ""))),
+            AIMessage(content=str(next(iter(outputs.values()), ""))),
+        ])
+        self.compact()
+
+    def clear(self) -> None:
+        self.chat_memory.clear()
+
+    def compact(self) -> bool:
+        """Fold the turns that no longer fit the verbatim window into the summary. Returns whether it did."""
+        messages = self.chat_memory.messages
+        summary, verbatim = self._split(messages)
+        fold = max(len(verbatim) - 2 * self.recent_turns, 0)
+        # Also fold pairs that push the verbatim part past its share of the budget
+        while len(verbatim) - fold > 2 and \
+                message_tokens(verbatim[fold:]) > self.token_budget - self.summary_tokens:
+            fold += 2
+        if not fold:
+            return False
+
+        transcript = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" for m in verbatim[:fold]
+        )
+        new_summary = self._summarize(summary, transcript)
+        # The summary takes the place of the old summary and the folded turns, in one store update
+        count = fold + (1 if len(messages) > len(verbatim) else 0)
+        self.store.replace_prefix(self.session_id, count, message_to_dict(SystemMessage(content=SUMMARY_PREFIX + new_summary)))
+        print(colored(f"Session {self.session_id}: folded {fold // 2} turns into the summary "
+                      f"({estimate_tokens(new_summary)} tokens)", "grey"))
+        return True
+
+    def _summarize(self, summary: str, transcript: str) -> str:
+        if self.summarize_fn is not None:
+            summarize = self.summarize_fn
+        else:
+            from summarizer import summarize  # Builds its LLM chain on import
+        text = (
+            f"Running summary of a conversation with a financial assistant:\n{summary or '(none yet)'}\n\n"
+            f"Newer turns to merge into it:\n{transcript}\n\n"
+            f"Write the updated summary in at most {self.summary_tokens * 3 // 4} words. Keep names, tickers, "
+            f"figures, dates and the user's stated goals and preferences; drop pleasantries."
+        )
+        with llm_priority("background"):
+            new_summary = summarize(text, format_type="conversation transcript")
+        if new_summary.startswith("Error:"):
+            # Summarizer unavailable: keep the most recent text rather than losing the turns outright
+            print(colored(f"Conversation summary failed, keeping a clipped transcript: {new_summary}", "yellow"))
+            new_summary = clip_to_tokens(f"{summary}\n{transcript}".strip(), self.summary_tokens, keep="tail")
+        return clip_to_tokens(new_summary.strip(), self.summary_tokens)
+
+
+if __name__ == "__main__":
+    # Example usage
+    from session_store import MemorySessionStore
+
+    memory = SummarizingMemory(MemorySessionStore(), "example-session", recent_turns=2, token_budget=300)
+    for i in range(4):
+        memory.save_context({"input": f"What is the P/E of stock {i}?"}, {"output": f"Stock {i} trades at {10 + i}x earnings."})
+    for message in memory.load_memory_variables({})["chat_history"]:
+        print(f"{message.type}: {message.content}")
@@ -1,8 +1,14 @@
 # deep_research.py
 import time
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from tavily import TavilyClient
 from agno.agent import Agent
-from vars import get_llm_id, get_llm_provider, MAX_DEPTH, MAX_SEARCH_CALLS, NUM_SUBQUESTIONS
+from vars import (
+    get_llm_id, get_llm_provider, MAX_DEPTH, MAX_SEARCH_CALLS, NUM_SUBQUESTIONS,
+    PARALLEL_RESEARCH, MAX_RESEARCH_WORKERS, ENABLE_SEARCH_CACHE
+)
 import os
 from typing import List, Dict, Any, Optional, Callable # Import Callable
 from dotenv import load_dotenv
@@ -13,6 +19,10 @@ import re
 import json
 from datetime import datetime
 from agno.tools.yfinance import YFinanceTools
+import metrics
+from agent_pool import AgentPool
+from llm_scheduler import llm_priority
+from search_cache import search_cache
 
 load_dotenv()
 console = Console()
@@ -29,16 +39,72 @@ yf_tool = YFinanceTools(
     company_info=True,
 )
 
+# One pool per agent role, shared by every researcher and run; every agent gets its own
+# model copy (shared HTTP pools) and is reset when it goes back to the pool
+_reasoning_id, _analysis_id = get_llm_id("reasoning"), get_llm_id("remote")
+agent_pools = {
+    "planner": AgentPool("planner", lambda: Agent(
+        model=get_llm_provider(_analysis_id),
+        description="You are an expert research planner...",
+        # system_message=SYSTEM_PROMPT_FOR_SUBQUESTIONS
+    ), MAX_RESEARCH_WORKERS),
+    "decomposer": AgentPool("decomposer", lambda: Agent(model=get_llm_provider(_analysis_id)), MAX_RESEARCH_WORKERS),
+    "relevance": AgentPool("relevance", lambda: Agent(model=get_llm_provider(_reasoning_id)), MAX_RESEARCH_WORKERS),
+    "yfinance": AgentPool("yfinance", lambda: Agent(
+        model=get_llm_provider(_reasoning_id), tools=[yf_tool], show_tool_calls=True, markdown=True
+    ), MAX_RESEARCH_WORKERS),
+    "analyst": AgentPool("analyst", lambda: Agent(
+        model=get_llm_provider(_reasoning_id), # Use reasoning model for analysis correctness
+        description="You are a research analyst...",
+    ), MAX_RESEARCH_WORKERS),
+    "synthesizer": AgentPool("synthesizer", lambda: Agent(
+        model=get_llm_provider(_analysis_id),
+        description="You are a senior research analyst...",
+    ), MAX_RESEARCH_WORKERS),
+}
+
+
+class _ResearchRun:
+    """State of one research() call: the user prompt, its search budget and its debug log"""
+
+    def __init__(self, query: str, max_search_calls: int):
+        self.query = query
+        self.max_search_calls = max_search_calls
+        self.search_calls_made = 0
+        self.debug_log: List[str] = []
+        self.budget_lock = threading.Lock()
+
+
+# The run being executed and, inside a parallel branch, the branch's log buffer. Branches run
+# in a copy of the caller's context, so both follow the work onto pool threads.
+# Every fan-out level of every run shares these threads; see _research_many for why nesting is safe
+_research_executor = ThreadPoolExecutor(max_workers=max(1, MAX_RESEARCH_WORKERS), thread_name_prefix="deep-research")
+
+_current_run: contextvars.ContextVar[Optional[_ResearchRun]] = contextvars.ContextVar("research_run", default=None)
+_branch_buffer: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("research_branch_buffer", default=None)
+
 
 class DeepResearch:
-    def __init__(self, max_depth=MAX_DEPTH, max_search_calls=MAX_SEARCH_CALLS):
-        self.reasoning_model = get_llm_provider(get_llm_id("reasoning"))
-        self.analysis_model = get_llm_provider(get_llm_id("remote"))
+    def __init__(self, max_depth=MAX_DEPTH, max_search_calls=MAX_SEARCH_CALLS,
+                 parallel=PARALLEL_RESEARCH, max_workers=MAX_RESEARCH_WORKERS):
+        # Configuration only: per-run state lives in a _ResearchRun, so one researcher can
+        # serve concurrent research() calls
         self.max_depth = max_depth
         self.max_search_calls = max_search_calls
-        self.search_calls_made = 0
-        self.debug_log = []
-        self.user_prompt = ""
+        # Concurrent execution mode: subquestions and their recursive children fan out
+        # onto the shared research threads, at most max_workers branches per fan-out. The
+        # search budget is guarded by a lock, and log lines from each branch are buffered
+        # and replayed in subquestion order.
+        self.parallel = parallel
+        self.max_workers = max(1, max_workers)
+        self.agent_pools = agent_pools
+
+    @staticmethod
+    def _run() -> _ResearchRun:
+        run = _current_run.get()
+        if run is None:
+            raise RuntimeError("DeepResearch helpers must be called from within research()")
+        return run
 
     # Modified _log method
     def _log(self, message, color=None, attrs=None, stream_callback: Optional[Callable[[str], None]] = None):
@@ -50,7 +116,19 @@ class DeepResearch:
         else:
             print(message)
 
-        self.debug_log.append(log_entry) # Append raw message to internal log
+        self._emit(log_entry, stream_callback)
+
+    def _emit(self, log_entry: str, stream_callback: Optional[Callable[[str], None]] = None):
+        """Append an entry to the debug log and forward it to the stream callback."""
+        buffer = _branch_buffer.get()
+        if buffer is not None:
+            # Inside a parallel branch: hold the entry until the branch is replayed in order
+            buffer.append(log_entry)
+            return
+
+        run = _current_run.get()
+        if run is not None:
+            run.debug_log.append(log_entry) # Append raw message to the run's log
 
         # If a callback is provided, call it with the raw message
         if stream_callback:
@@ -61,6 +139,94 @@ class DeepResearch:
                 # Avoid crashing backend if streaming fails, just print error
                 print(colored(f"--- STREAMING CALLBACK ERROR: {e} ---", "red"))
 
+    def _reserve_search_call(self) -> bool:
+        """Atomically claim one unit of the search budget. Returns False if exhausted."""
+        run = self._run()
+        with run.budget_lock:
+            if run.search_calls_made >= run.max_search_calls:
+                return False
+            run.search_calls_made += 1
+            return True
+
+    def _release_search_call(self):
+        """Give back a reserved search call (the call failed and should not count)."""
+        run = self._run()
+        with run.budget_lock:
+            run.search_calls_made = max(0, run.search_calls_made - 1)
+
+    def _budget_remaining(self) -> bool:
+        run = self._run()
+        with run.budget_lock:
+            return run.search_calls_made < run.max_search_calls
+
+    def _research_many(self, subquestions: List[str], depth: int, stream_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """Research a list of subquestions, concurrently when parallel mode is enabled.
+
+        Results are returned in input order and each branch's log lines are streamed as a
+        contiguous block in that same order, so the output is identical to a sequential run
+        apart from timing.
+
+        Branches go to the shared, bounded research executor. A caller never blocks on a branch
+        that has not started: it takes the branch back and runs it on its own thread, so a
+        branch waiting on its children cannot starve the pool (or deadlock it when every
+        thread is such a branch). Branches beyond max_workers run on the caller directly.
+        """
+        if not self.parallel or len(subquestions) < 2:
+            return {
+                sq: self._research_subquestion(sq, depth=depth, stream_callback=stream_callback)
+                for sq in subquestions
+            }
+
+        buffers: List[List[str]] = [[] for _ in subquestions]
+
+        def run_branch(index: int, sq: str) -> Dict[str, Any]:
+            # Set in the branch's own context copy, so it never leaks into the caller's
+            _branch_buffer.set(buffers[index])
+            return self._research_subquestion(sq, depth=depth, stream_callback=stream_callback)
+
+        def settle(index: int, sq: str, future: Optional[Future]) -> Dict[str, Any]:
+            try:
+                if future is None or future.cancel():
+                    # Over the cap, or not started (no free thread): run it here instead of waiting
+                    return contextvars.copy_context().run(run_branch, index, sq)
+                return future.result()
+            except Exception as e:
+                buffers[index].append(f"{'  ' * depth}Research branch failed for '{sq}': {e}")
+                return {
+                    "subquestion": sq, "summary": f"Research failed: {e}",
+                    "search_results": None, "context": "", "additional_info": {}
+                }
+
+        # Each branch runs in a copy of the caller's context so its spans reach the request breakdown
+        futures = [
+            _research_executor.submit(contextvars.copy_context().run, run_branch, i, sq)
+            for i, sq in enumerate(subquestions[:self.max_workers])
+        ]
+        # The caller works through the overflow while the pooled branches run
+        settled = {i: settle(i, subquestions[i], None) for i in range(len(futures), len(subquestions))}
+
+        # Wait in submission order: branch i is flushed as soon as it and all earlier
+        # branches are done, which keeps the stream deterministic but still progressive.
+        results = {}
+        for i, sq in enumerate(subquestions):
+            results[sq] = settled[i] if i in settled else settle(i, sq, futures[i])
+            for entry in buffers[i]:
+                self._emit(entry, stream_callback)
+        return results
+
+    def _run_agent(self, role: str, prompt: str, step: str):
+        """Run a pooled agent for this role as one timed deep research sub-step, recording its LLM latency and tokens."""
+        with self.agent_pools[role].acquire() as agent:
+            start = time.perf_counter()
+            # Queued behind interactive calls when the model's rate-limit budget runs short
+            with metrics.stage_span(f"deep_research.{step}"), llm_priority("background"):
+                response = agent.run(prompt)
+            metrics.record_agno_run(getattr(agent.model, "id", "unknown"), time.perf_counter() - start, response)
+        return response
+
+    def agent_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {role: pool.stats() for role, pool in self.agent_pools.items()}
+
     def _parse_subquestions(self, response_content: str, num_questions: int) -> List[str]:
         """Robustly parse numbered list of subquestions from LLM response."""
         # (Keep existing implementation - no changes needed here)
@@ -83,13 +249,6 @@ class DeepResearch:
     # Modified _generate_subquestions
     def _generate_subquestions(self, query: str, num_questions=NUM_SUBQUESTIONS, stream_callback: Optional[Callable[[str], None]] = None) -> List[str]:
         """Break down query into subquestions, using the stream callback for logging."""
-        agent = Agent(
-            model=self.analysis_model,
-            description="You are an expert research planner...",
-            # system_message=SYSTEM_PROMPT_FOR_SUBQUESTIONS
-        )
-        self.user_prompt = query # Store user prompt for context in analysis
-
         prompt = f"""
         You need to research the following complex topic: "{query}"
         Break this down into exactly {num_questions} specific...
@@ -103,7 +262,7 @@ class DeepResearch:
 
         try:
             self._log(f"Generating {num_questions} subquestions for: '{query}'", "cyan", stream_callback=stream_callback)
-            response = agent.run(prompt)
+            response = self._run_agent("planner", prompt, "subquestions")
             content = response.content
             if "<think>" in content:
                 content = content.split("</think>")[-1].strip()
@@ -122,7 +281,6 @@ class DeepResearch:
     # Modified _should_decompose (added stream_callback, though not directly used for logging here)
     def _should_decompose(self, subquestion: str, context: str, stream_callback: Optional[Callable[[str], None]] = None) -> bool:
         """Decide if a subquestion needs further decomposition."""
-        agent = Agent(model=self.analysis_model)
         prompt = f"""
         Consider the subquestion: "{subquestion}"
         Initial research provided this context:
@@ -133,7 +291,7 @@ class DeepResearch:
         Answer with only YES or NO.
         """
         try:
-            response = agent.run(prompt)
+            response = self._run_agent("decomposer", prompt, "decompose")
             return "YES" in response.content.upper()
         except Exception as e:
             # Log the error using the callback
@@ -146,9 +304,9 @@ class DeepResearch:
         self._log(
             f"\n{'  ' * depth}Researching (Depth {depth}): {subquestion}", "green", stream_callback=stream_callback)
 
-        if self.search_calls_made >= self.max_search_calls:
+        if not self._budget_remaining():
             self._log(
-                f"{'  ' * depth}Skipping research: Max search calls ({self.max_search_calls}) reached.", "red", stream_callback=stream_callback)
+                f"{'  ' * depth}Skipping research: Max search calls ({self._run().max_search_calls}) reached.", "red", stream_callback=stream_callback)
             return {
                 "subquestion": subquestion, "summary": "Max search calls reached.",
                 "search_results": None, "context": "", "additional_info": {}
@@ -159,22 +317,24 @@ class DeepResearch:
         tool_outputs = {}
 
         # --- Tool Integration ---
-        agent = Agent(model=self.reasoning_model)
         relevance_prompt = f"""
         Analyze this question: "{subquestion}"
         Is this question related to stock prices... using YFinance...?
         Answer with only YES or NO.
         """
         try:
-            relevance_response = agent.run(relevance_prompt)
+            relevance_response = self._run_agent("relevance", relevance_prompt, "relevance")
             is_yfinance_relevant = "YES" in relevance_response.content.upper()
 
-            if is_yfinance_relevant:
+            if is_yfinance_relevant and not self._reserve_search_call():
+                self._log(f"{'  ' * depth}Skipping YFinance: Max search calls reached.", "red", stream_callback=stream_callback)
+                is_yfinance_relevant = False
+            elif is_yfinance_relevant:
                 self._log(f"{'  ' * depth}YFinance determined to be relevant for: {subquestion}", "blue", stream_callback=stream_callback)
-                yf_agent = Agent(model=self.reasoning_model, tools=[yf_tool], show_tool_calls=True, markdown=True)
                 try:
                     self._log(f"{'  ' * depth}Calling YFinance for: {subquestion}", "blue", stream_callback=stream_callback)
-                    yf_response = yf_agent.run(subquestion)
+                    with metrics.provider_span("yfinance_agent"):
+                        yf_response = self._run_agent("yfinance", subquestion, "yfinance")
                     yf_output = yf_response.content
                     if "404 Client Error:" in yf_output: # Check for common yfinance error
                          self._log(f"{'  ' * depth}YFinance returned 404 error. Falling back.", "red", stream_callback=stream_callback)
@@ -184,9 +344,9 @@ class DeepResearch:
                     context += f"\nYFinance Tool Output:\n{yf_output}\n"
                     self._log(f"{'  ' * depth}YFinance Output received.", "magenta", stream_callback=stream_callback)
                     # Note: show_tool_calls=True in Agno might print, but we log receipt here.
-                    self.search_calls_made += 1 # Increment after successful call
                 except Exception as e:
                     self._log(f"{'  ' * depth}YFinance agent failed: {e}", "red", stream_callback=stream_callback)
+                    self._release_search_call() # Only successful calls count against the budget
                     # Decide if fallback to Tavily is needed here or handled below
                     is_yfinance_relevant = False # Treat as not relevant if failed
             else:
@@ -198,11 +358,19 @@ class DeepResearch:
 
         # --- Tavily Web Search (Run if YFinance not relevant, failed, or general search needed) ---
         # Simplified logic: Always run Tavily unless YFinance provided a definitive answer (hard to judge, so usually run)
-        if self.search_calls_made < self.max_search_calls:
+        if self._reserve_search_call():
             self._log(f"{'  ' * depth}Performing Tavily search for: {subquestion}", "blue", stream_callback=stream_callback)
             try:
-                search_results = tavily_client.search(query=subquestion, search_depth="advanced", max_results=5)
-                self.search_calls_made += 1
+                def fetch():
+                    with metrics.provider_span("tavily"):
+                        return tavily_client.search(query=subquestion, search_depth="advanced", max_results=5)
+
+                with metrics.stage_span("deep_research.tavily"):
+                    # Billed per call: repeat subquestions are served from the shared search cache
+                    if ENABLE_SEARCH_CACHE:
+                        search_results = search_cache.get_or_fetch("tavily", "advanced", subquestion, fetch)
+                    else:
+                        search_results = fetch()
                 if search_results and search_results.get("results"):
                     context += "\nWeb Search Results (Tavily):\n" + "\n\n".join([f"Source: {r.get('url', 'N/A')}\nContent: {r.get('content', '')}" for r in search_results["results"]])
                     self._log(f"{'  ' * depth}Tavily search successful.", "magenta", stream_callback=stream_callback)
@@ -210,6 +378,7 @@ class DeepResearch:
                     self._log(f"{'  ' * depth}Tavily search returned no results.", "yellow", stream_callback=stream_callback)
             except Exception as e:
                 self._log(f"{'  ' * depth}Tavily search failed: {e}", "red", stream_callback=stream_callback)
+                self._release_search_call()
                 context += "\nWeb search failed."
         else:
              self._log(f"{'  ' * depth}Skipping Tavily search: Max search calls reached.", "red", stream_callback=stream_callback)
@@ -217,19 +386,15 @@ class DeepResearch:
 
         # --- Recursive Decomposition ---
         additional_info = {}
-        if depth < self.max_depth and self.search_calls_made < self.max_search_calls:
+        if depth < self.max_depth and self._budget_remaining():
             # Pass callback to _should_decompose
             if self._should_decompose(subquestion, context, stream_callback=stream_callback):
                 self._log(f"{'  ' * depth}Further decomposing: {subquestion}", "magenta", stream_callback=stream_callback)
                  # Pass callback to _generate_subquestions
                 sub_subquestions = self._generate_subquestions(subquestion, num_questions=2, stream_callback=stream_callback)
 
-                sub_findings = {}
-                for sub_sq in sub_subquestions:
-                    # Recursive call - pass callback
-                    sub_result = self._research_subquestion(sub_sq, depth=depth + 1, stream_callback=stream_callback)
-                    sub_findings[sub_sq] = sub_result
-                additional_info["sub_research"] = sub_findings
+                # Recursive calls - fanned out in parallel mode, callback passed down
+                additional_info["sub_research"] = self._research_many(sub_subquestions, depth + 1, stream_callback=stream_callback)
             else:
                 self._log(f"{'  ' * depth}Decomposition not needed for: {subquestion}", "yellow", stream_callback=stream_callback)
 
@@ -250,11 +415,6 @@ class DeepResearch:
     def _analyze_findings(self, subquestion: str, context: str, additional_info: Dict, stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Analyze findings, using stream callback for logging."""
         self._log(f"Analyzing findings for: {subquestion}", "cyan", stream_callback=stream_callback)
-        agent = Agent(
-            model=self.reasoning_model, # Use reasoning model for analysis correctness
-            description="You are a research analyst...",
-        )
-
         sub_research_summary = ""
         if "sub_research" in additional_info:
             sub_research_summary = "\n\n--- Findings from Deeper Analysis ---\n"
@@ -271,11 +431,11 @@ class DeepResearch:
 
         Instructions:
         1. Focus *only* on answering the subquestion: "{subquestion}"
-        2. Analyse the correctness of the information provided. If the information is incorrect with respect to the subquestion and the user prompt (which is "{self.user_prompt}") in general... provide the correct information.
+        2. Analyse the correctness of the information provided. If the information is incorrect with respect to the subquestion and the user prompt (which is "{self._run().query}") in general... provide the correct information.
         3. Create a clear, concise, and factual summary...
         """ # (Keep existing prompt structure)
         try:
-            response = agent.run(prompt)
+            response = self._run_agent("analyst", prompt, "analysis")
             self._log(f"Analysis complete for: {subquestion}", "green", stream_callback=stream_callback)
             return response.content
         except Exception as e:
@@ -286,11 +446,6 @@ class DeepResearch:
     def _synthesize_research(self, main_query: str, research_results: Dict[str, Dict], stream_callback: Optional[Callable[[str], None]] = None) -> str:
         """Synthesize final answer, using stream callback for logging."""
         self._log("Synthesizing final research report...", "cyan", stream_callback=stream_callback)
-        agent = Agent(
-            model=self.analysis_model,
-            description="You are a senior research analyst...",
-        )
-
         findings_context = ""
         for subq, result in research_results.items():
             findings_context += f"\n\n## Research Findings for: {subq}\n\n{result.get('summary', 'No summary available.')}"
@@ -311,7 +466,7 @@ class DeepResearch:
         9. Format the output using Markdown for readability.
         """
         try:
-            response = agent.run(prompt)
+            response = self._run_agent("synthesizer", prompt, "synthesis")
             self._log("Final synthesis complete.", "green", stream_callback=stream_callback)
             return response.content
         except Exception as e:
@@ -320,9 +475,14 @@ class DeepResearch:
 
     # Modified research method signature
     def research(self, query: str, stream_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
-        """Execute deep research, passing stream callback down."""
-        self.debug_log = [] # Clear log for new research
-        self.search_calls_made = 0 # Reset counter
+        """Execute deep research, passing stream callback down. Safe to call concurrently."""
+        # A context of its own per call, so concurrent calls never see each other's run
+        return contextvars.copy_context().run(self._research, _ResearchRun(query, self.max_search_calls), stream_callback)
+
+    def _research(self, run: _ResearchRun, stream_callback: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        _current_run.set(run)
+        _branch_buffer.set(None)
+        query = run.query
         # Pass callback to initial log
         self._log(f"\n=== Starting Deep Research on: {query} ===", "blue", attrs=["bold"], stream_callback=stream_callback)
 
@@ -334,27 +494,31 @@ class DeepResearch:
             return {
                 "query": query,
                 "answer": "Could not perform deep research due to an issue generating subquestions.",
-                "debug_log": "\n".join(self.debug_log),
+                "debug_log": "\n".join(run.debug_log),
                  "subquestions": [],
                  "subquestion_results": {}
             }
 
         # Step 2: Pass callback to research each subquestion
-        subquestion_results = {}
-        for sq in subquestions:
-            if self.search_calls_made >= self.max_search_calls:
-                self._log(f"Max search calls ({self.max_search_calls}) reached. Skipping remaining subquestions.", "red", stream_callback=stream_callback)
-                subquestion_results[sq] = {"summary": "Skipped due to max search call limit."}
-                continue
-            # Pass callback here
-            subquestion_results[sq] = self._research_subquestion(sq, depth=0, stream_callback=stream_callback)
+        if self.parallel:
+            self._log(f"Researching {len(subquestions)} subquestions in parallel (max {self.max_workers} workers)", "cyan", stream_callback=stream_callback)
+            subquestion_results = self._research_many(subquestions, depth=0, stream_callback=stream_callback)
+        else:
+            subquestion_results = {}
+            for sq in subquestions:
+                if not self._budget_remaining():
+                    self._log(f"Max search calls ({run.max_search_calls}) reached. Skipping remaining subquestions.", "red", stream_callback=stream_callback)
+                    subquestion_results[sq] = {"summary": "Skipped due to max search call limit."}
+                    continue
+                # Pass callback here
+                subquestion_results[sq] = self._research_subquestion(sq, depth=0, stream_callback=stream_callback)
 
         # Step 3: Pass callback to synthesize findings
         final_answer = self._synthesize_research(query, subquestion_results, stream_callback=stream_callback)
 
         self._log("\n=== Deep Research Complete ===", "blue", attrs=["bold"], stream_callback=stream_callback)
 
-        total_calls = self.search_calls_made
+        total_calls = run.search_calls_made
         self._log(f"Total search calls made: {total_calls}", "cyan", stream_callback=stream_callback)
 
         # Return the full results including the internally collected debug_log
@@ -363,7 +527,7 @@ class DeepResearch:
             "subquestions": subquestions,
             "subquestion_results": subquestion_results,
             "answer": final_answer,
-            "debug_log": "\n".join(self.debug_log) # Still return the complete log
+            "debug_log": "\n".join(run.debug_log) # Still return the complete log
         }
 
 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Embedding Cache for WealthLens
+Persistent, content-addressed cache in front of an embedding model (SQLite + in-memory LRU)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from vars import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MEMORY_ENTRIES
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps a LangChain Embeddings model. Vectors are keyed by (namespace, sha256(text)) where the
+    namespace is the model name, with queries kept apart from documents since some models embed
+    them differently. Lookups go LRU -> SQLite -> model, and only the misses of a batch are embedded.
+    Vectors are held as float32 arrays (a quarter of a list of Python floats) and only turned into
+    lists when handed back to LangChain, so hits and misses return the same float32 values.
+    """
+
+    def __init__(self, model: Embeddings, model_name: str, path: str = EMBEDDING_CACHE_PATH,
+                 memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES):
+        self.model = model
+        self.model_name = model_name
+        self.path = path
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "embedded_texts": 0,
+                       "embed_calls": 0, "batch_duplicates": 0, "disk_errors": 0}
+
+    # --- storage ---
+
+    def _conn(self) -> sqlite3.Connection:
+        """Open the database lazily. Caller holds the lock."""
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " namespace TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (namespace, hash))"
+            )
+        return self._db
+
+    def _remember(self, key: tuple, vector: np.ndarray) -> None:
+        """Insert into the LRU front. Caller holds the lock."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, namespace: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for h in hashes:
+                vector = self._memory.get((namespace, h))
+                if vector is not None:
+                    self._memory.move_to_end((namespace, h))
+                    found[h] = vector
+            self._stats["memory_hits"] += len(found)
+            missing = [h for h in hashes if h not in found]
+            try:
+                conn = self._conn()
+                for i in range(0, len(missing), 500):  # stay under SQLite's variable limit
+                    part = missing[i:i + 500]
+                    rows = conn.execute(
+                        f"SELECT hash, vector FROM embeddings WHERE namespace = ? AND hash IN ({','.join('?' * len(part))})",
+                        [namespace, *part],
+                    ).fetchall()
+                    for h, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[h] = vector
+                        self._remember((namespace, h), vector)
+                        self._stats["disk_hits"] += 1
+            except sqlite3.Error as e:
+                self._stats["disk_errors"] += 1
+                print(f"Embedding cache read failed: {e}")
+        return found
+
+    def _store(self, namespace: str, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for h, vector in vectors.items():
+                self._remember((namespace, h), vector)
+            try:
+                conn = self._conn()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (namespace, hash, vector) VALUES (?, ?, ?)",
+                    [(namespace, h, v.tobytes()) for h, v in vectors.items()],
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                self._stats["disk_errors"] += 1
+                print(f"Embedding cache write failed: {e}")
+
+    # --- batch API ---
+
+    def _embed_cached(self, texts: List[str], namespace: str, embed_misses) -> List[np.ndarray]:
+        hashes = [text_hash(t) for t in texts]
+        unique = list(dict.fromkeys(hashes))
+        found = self._lookup(namespace, unique)
+        missing = [h for h in unique if h not in found]
+        if missing:
+            first_text = dict(zip(reversed(hashes), reversed(texts)))  # hash -> text
+            computed = embed_misses([first_text[h] for h in missing])
+            new_vectors = {h: np.asarray(v, dtype=np.float32) for h, v in zip(missing, computed)}
+            self._store(namespace, new_vectors)
+            found.update(new_vectors)
+        with self._lock:
+            self._stats["misses"] += len(missing)
+            self._stats["embedded_texts"] += len(missing)
+            self._stats["embed_calls"] += 1 if missing else 0
+            self._stats["batch_duplicates"] += len(hashes) - len(unique)
+        return [found[h] for h in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch, sending only texts not already cached to the model"""
+        if not texts:
+            return []
+        return [v.tolist() for v in self._embed_cached(texts, self.model_name, self.model.embed_documents)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_cached([text], f"{self.model_name}#query",
+                                  lambda misses: [self.model.embed_query(misses[0])])[0].tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters and the number of embeddings the cache saved computing"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = sum(v.nbytes for v in self._memory.values())
+        served = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / served, 3) if served else 0.0
+        stats["embeddings_saved"] = stats["memory_hits"] + stats["disk_hits"] + stats["batch_duplicates"]
+        return stats
+
+
+# One cache per model shared by every Models() instance (ingestion, retriever, answer cache)
+_shared: Dict[str, CachedEmbeddings] = {}
+_shared_lock = threading.Lock()
+
+
+def cached_embeddings(model: Embeddings, model_name: str) -> CachedEmbeddings:
+    with _shared_lock:
+        if model_name not in _shared:
+            _shared[model_name] = CachedEmbeddings(model, model_name)
+        return _shared[model_name]
+
+
+def embedding_cache_stats() -> Dict[str, Dict[str, Any]]:
+    with _shared_lock:
+        return {name: cache.stats() for name, cache in _shared.items()}
@@ -6,11 +6,11 @@ Handles Indian stocks (BSE/NSE), global stocks, and other financial instruments
 
 import requests
 import json
-import yfinance as yf
+import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 from termcolor import colored
-import time
+from quote_cache import quote_cache
 
 class EnhancedFinancialTools:
     """Enhanced financial tools for comprehensive market data"""
@@ -41,12 +41,12 @@ class EnhancedFinancialTools:
             
             for sym in symbols_to_try:
                 try:
-                    stock = yf.Ticker(sym)
-                    info = stock.info
+                    # Shared TTL cache: popular symbols don't hit Yahoo on every request
+                    info = quote_cache.get_info(sym)
                     
                     if info and 'regularMarketPrice' in info and info['regularMarketPrice']:
                         # Get historical data for additional info
-                        hist = stock.history(period="5d")
+                        hist = quote_cache.get_history(sym, period="5d")
                         
                         if not hist.empty:
                             current_price = info['regularMarketPrice']
@@ -123,8 +123,7 @@ class EnhancedFinancialTools:
         try:
             print(colored(f"Fetching global stock price for {symbol}...", "blue"))
             
-            stock = yf.Ticker(symbol)
-            info = stock.info
+            info = quote_cache.get_info(symbol)
             
             if not info or 'regularMarketPrice' not in info:
                 return {
@@ -139,7 +138,7 @@ class EnhancedFinancialTools:
             change_percent = (change / prev_close) * 100 if prev_close else 0
             
             # Get historical data
-            hist = stock.history(period="5d")
+            hist = quote_cache.get_history(symbol, period="5d")
             today_data = hist.iloc[-1] if len(hist) > 0 else None
             
             result = {
@@ -171,30 +170,95 @@ class EnhancedFinancialTools:
                 "message": f"Failed to fetch stock price for {symbol}"
             }
     
+    def get_batch_quotes(self, symbols: List[str], period: str = "5d") -> pd.DataFrame:
+        """
+        Get quotes for many symbols with a single batched yf.download call.
+        Returns a DataFrame indexed by symbol with columns current_price, previous_close,
+        change, change_percent, open, high, low, volume (NaN where a symbol has no data).
+        """
+        columns = ["current_price", "previous_close", "change", "change_percent", "open", "high", "low", "volume"]
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return pd.DataFrame(columns=columns)
+        
+        print(colored(f"Fetching batch quotes for {len(symbols)} symbols...", "blue"))
+        data = quote_cache.get_download(symbols, period=period)
+        if data is None or data.empty:
+            return pd.DataFrame(index=symbols, columns=columns, dtype=float)
+        if not isinstance(data.columns, pd.MultiIndex):
+            # Older yfinance returns flat columns for a single ticker
+            data = data.copy()
+            data.columns = pd.MultiIndex.from_product([data.columns, symbols])
+        
+        close = data["Close"].reindex(columns=symbols)
+        # Exchanges trade on different calendars, so each symbol's "today" is its own
+        # last valid row: count valid rows per column and select by rank, no Python loop.
+        valid = close.notna()
+        rank = valid.cumsum()
+        n_valid = rank.iloc[-1]
+        last_row = valid & rank.eq(n_valid, axis=1)
+        prev_row = valid & rank.eq(n_valid - 1, axis=1)
+        
+        def at(frame: pd.DataFrame, mask: pd.DataFrame) -> pd.Series:
+            return frame.reindex(columns=symbols).where(mask).max()
+        
+        quotes = pd.DataFrame(index=pd.Index(symbols, name="symbol"))
+        quotes["current_price"] = at(close, last_row)
+        quotes["previous_close"] = at(close, prev_row).fillna(quotes["current_price"])
+        quotes["change"] = quotes["current_price"] - quotes["previous_close"]
+        quotes["change_percent"] = (quotes["change"] / quotes["previous_close"].where(quotes["previous_close"] != 0)) * 100
+        for field, column in (("Open", "open"), ("High", "high"), ("Low", "low"), ("Volume", "volume")):
+            quotes[column] = at(data[field], last_row) if field in data.columns.get_level_values(0) else float("nan")
+        
+        return quotes.round({"current_price": 2, "previous_close": 2, "change": 2, "change_percent": 2,
+                             "open": 2, "high": 2, "low": 2})
+    
     def get_market_indices(self) -> Dict[str, Any]:
         """Get major market indices"""
         try:
+            # Name -> (symbol, quote currency); a batched download carries no .info to read it from
             indices = {
-                "S&P 500": "^GSPC",
-                "NASDAQ": "^IXIC", 
-                "Dow Jones": "^DJI",
-                "NIFTY 50": "^NSEI",
-                "SENSEX": "^BSESN",
-                "FTSE 100": "^FTSE",
-                "DAX": "^GDAXI",
-                "Nikkei 225": "^N225"
+                "S&P 500": ("^GSPC", "USD"),
+                "NASDAQ": ("^IXIC", "USD"),
+                "Dow Jones": ("^DJI", "USD"),
+                "NIFTY 50": ("^NSEI", "INR"),
+                "SENSEX": ("^BSESN", "INR"),
+                "FTSE 100": ("^FTSE", "GBP"),
+                "DAX": ("^GDAXI", "EUR"),
+                "Nikkei 225": ("^N225", "JPY")
             }
             
+            # One batched download instead of two requests (plus a sleep) per index
+            quotes = self.get_batch_quotes([symbol for symbol, _ in indices.values()])
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
             results = {}
-            for name, symbol in indices.items():
-                try:
-                    data = self.get_global_stock_price(symbol)
-                    if data["success"]:
-                        results[name] = data["data"]
-                    time.sleep(0.1)  # Rate limiting
-                except Exception as e:
-                    print(colored(f"Failed to fetch {name}: {e}", "yellow"))
+            for name, (symbol, currency) in indices.items():
+                if symbol not in quotes.index or pd.isna(quotes.at[symbol, "current_price"]):
+                    print(colored(f"Failed to fetch {name}: no data", "yellow"))
                     continue
+                row = quotes.loc[symbol]
+                
+                def number(column: str) -> Optional[float]:
+                    # NaN is not valid JSON
+                    return float(row[column]) if pd.notna(row[column]) else None
+                
+                # Same fields as get_global_stock_price returns for a symbol
+                results[name] = {
+                    "symbol": symbol,
+                    "company_name": name,
+                    "current_price": number("current_price"),
+                    "previous_close": number("previous_close"),
+                    "change": number("change"),
+                    "change_percent": number("change_percent") or 0.0,
+                    "open": number("open"),
+                    "high": number("high"),
+                    "low": number("low"),
+                    "volume": int(row["volume"]) if pd.notna(row["volume"]) else None,
+                    "market_cap": None,  # Indices have none
+                    "currency": currency,
+                    "timestamp": timestamp
+                }
             
             return {
                 "success": True,
@@ -4,15 +4,30 @@ Enhanced Web Search System for WealthLens
 Provides multiple fallback options when primary search fails
 """
 
+import asyncio
 import requests
+import httpx
 import json
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from termcolor import colored
-import yfinance as yf
 from bs4 import BeautifulSoup
 import re
+from async_utils import run_blocking
+from metrics import provider_span
+from enhanced_financial_tools import enhanced_financial_tools
+from single_flight import search_flights, normalize_query
+from search_cache import search_cache
+from vars import (
+    HTTP_TIMEOUT, SEARCH_STRATEGY, SEARCH_FANOUT_DEADLINE, SEARCH_FANOUT_GRACE, SEARCH_MIN_RESULTS, ENABLE_REQUEST_COALESCING,
+    ENABLE_SEARCH_CACHE, SEARCH_FANOUT_WORKERS
+)
+
+# Provider calls of every sync fan-out search share these threads. Providers never submit to it
+# themselves, so a search waiting on its providers can't starve them; excess calls just queue.
+_fanout_executor = ThreadPoolExecutor(max_workers=max(1, SEARCH_FANOUT_WORKERS), thread_name_prefix="search-fanout")
 
 class EnhancedWebSearch:
     """Enhanced web search with multiple fallback options"""
@@ -27,26 +42,145 @@ class EnhancedWebSearch:
             'https://www.bing.com/search',
             'https://duckduckgo.com/'
         ]
+        self._tavily_clients = {}  # (kind, api_key) -> Tavily client, built once
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        """HTTP client for one async search run (bound to the running event loop)"""
+        return httpx.AsyncClient(
+            headers=dict(self.session.headers),
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+        )
+    
+    def _parse_google_results(self, html: str) -> List[Dict[str, str]]:
+        """Extract results from a Google results page"""
+        soup = BeautifulSoup(html, 'html.parser')
+        results = []
+        
+        # Extract search results (this is basic and may need updates)
+        for result in soup.find_all('div', class_='g')[:5]:
+            title_elem = result.find('h3')
+            link_elem = result.find('a')
+            snippet_elem = result.find('div', class_='VwiC3b')
+            
+            if title_elem and link_elem:
+                title = title_elem.get_text(strip=True)
+                link = link_elem.get('href', '')
+                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
+                
+                if link.startswith('http'):
+                    results.append({
+                        'title': title,
+                        'url': link,
+                        'content': snippet
+                    })
+        return results
+    
+    def _parse_bing_results(self, html: str) -> List[Dict[str, str]]:
+        """Extract results from a Bing results page"""
+        soup = BeautifulSoup(html, 'html.parser')
+        results = []
+        
+        # Extract Bing search results
+        for result in soup.find_all('li', class_='b_algo')[:5]:
+            title_elem = result.find('h2')
+            link_elem = result.find('a')
+            snippet_elem = result.find('p')
+            
+            if title_elem and link_elem:
+                title = title_elem.get_text(strip=True)
+                link = link_elem.get('href', '')
+                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
+                
+                if link.startswith('http'):
+                    results.append({
+                        'title': title,
+                        'url': link,
+                        'content': snippet
+                    })
+        return results
+    
+    def _parse_duckduckgo_results(self, html: str) -> List[Dict[str, str]]:
+        """Extract results from a DuckDuckGo results page"""
+        soup = BeautifulSoup(html, 'html.parser')
+        results = []
+        
+        # Extract DuckDuckGo search results
+        for result in soup.find_all('div', class_='result')[:5]:
+            title_elem = result.find('a', class_='result__a')
+            snippet_elem = result.find('div', class_='result__snippet')
+            
+            if title_elem:
+                title = title_elem.get_text(strip=True)
+                link = title_elem.get('href', '')
+                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
+                
+                if link.startswith('http'):
+                    results.append({
+                        'title': title,
+                        'url': link,
+                        'content': snippet
+                    })
+        return results
+    
+    def _engine_result(self, source: str, results: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """Wrap parsed results in the standard provider response"""
+        if not results:
+            return None
+        return {
+            "success": True,
+            "source": source,
+            "results": results,
+            "message": f"Found {len(results)} results via {source}"
+        }
+    
+    def _tavily_client(self, api_key: str, kind: str = "sync"):
+        """Shared Tavily client per API key (the async one opens an HTTP client per request, so any loop can use it)"""
+        client = self._tavily_clients.get((kind, api_key))
+        if client is None:
+            from tavily import TavilyClient, AsyncTavilyClient
+            client = TavilyClient(api_key=api_key) if kind == "sync" else AsyncTavilyClient(api_key=api_key)
+            self._tavily_clients[(kind, api_key)] = client
+        return client
+    
+    def _cached(self, provider: str, depth: str, query: str, fetch: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Serve a provider call from the search cache (freshness tiers, stale-while-revalidate)"""
+        if not ENABLE_SEARCH_CACHE:
+            return fetch()
+        return search_cache.get_or_fetch(provider, depth, query, fetch)
+    
+    async def _acached(self, provider: str, depth: str, query: str,
+                       fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        if not ENABLE_SEARCH_CACHE:
+            return await fetch()
+        return await search_cache.aget_or_fetch(provider, depth, query, fetch)
     
     def search_with_tavily(self, query: str, api_key: str) -> Optional[Dict[str, Any]]:
-        """Search using Tavily API if available"""
+        """Search using Tavily API if available (cached; shares entries with deep research)"""
         try:
-            from tavily import TavilyClient
-            tavily_client = TavilyClient(api_key=api_key)
-            search_results = tavily_client.search(query=query, search_depth="advanced", max_results=5)
+            tavily_client = self._tavily_client(api_key)
             
-            if search_results and search_results.get("results"):
-                return {
-                    "success": True,
-                    "source": "Tavily",
-                    "results": search_results["results"],
-                    "message": f"Found {len(search_results['results'])} results via Tavily"
-                }
+            def fetch():
+                with provider_span("tavily"):
+                    return tavily_client.search(query=query, search_depth="advanced", max_results=5)
+            
+            return self._tavily_result(self._cached("tavily", "advanced", query, fetch))
         except Exception as e:
             print(colored(f"Tavily search failed: {e}", "yellow"))
         
         return None
     
+    def _tavily_result(self, search_results: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Wrap a raw Tavily response in the standard provider response"""
+        if search_results and search_results.get("results"):
+            return {
+                "success": True,
+                "source": "Tavily",
+                "results": search_results["results"],
+                "message": f"Found {len(search_results['results'])} results via Tavily"
+            }
+        return None
+    
     def search_with_google(self, query: str) -> Optional[Dict[str, Any]]:
         """Fallback search using Google (basic scraping)"""
         try:
@@ -55,37 +189,11 @@ class EnhancedWebSearch:
                 'num': 5
             }
             
-            response = self.session.get(self.search_engines[0], params=params, timeout=10)
+            with provider_span("google"):
+                response = self.session.get(self.search_engines[0], params=params, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            results = []
-            
-            # Extract search results (this is basic and may need updates)
-            for result in soup.find_all('div', class_='g')[:5]:
-                title_elem = result.find('h3')
-                link_elem = result.find('a')
-                snippet_elem = result.find('div', class_='VwiC3b')
-                
-                if title_elem and link_elem:
-                    title = title_elem.get_text(strip=True)
-                    link = link_elem.get('href', '')
-                    snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
-                    
-                    if link.startswith('http'):
-                        results.append({
-                            'title': title,
-                            'url': link,
-                            'content': snippet
-                        })
-            
-            if results:
-                return {
-                    "success": True,
-                    "source": "Google",
-                    "results": results,
-                    "message": f"Found {len(results)} results via Google"
-                }
+            return self._engine_result("Google", self._parse_google_results(response.text))
                 
         except Exception as e:
             print(colored(f"Google search failed: {e}", "yellow"))
@@ -100,37 +208,11 @@ class EnhancedWebSearch:
                 'count': 5
             }
             
-            response = self.session.get(self.search_engines[1], params=params, timeout=10)
+            with provider_span("bing"):
+                response = self.session.get(self.search_engines[1], params=params, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            results = []
-            
-            # Extract Bing search results
-            for result in soup.find_all('li', class_='b_algo')[:5]:
-                title_elem = result.find('h2')
-                link_elem = result.find('a')
-                snippet_elem = result.find('p')
-                
-                if title_elem and link_elem:
-                    title = title_elem.get_text(strip=True)
-                    link = link_elem.get('href', '')
-                    snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
-                    
-                    if link.startswith('http'):
-                        results.append({
-                            'title': title,
-                            'url': link,
-                            'content': snippet
-                        })
-            
-            if results:
-                return {
-                    "success": True,
-                    "source": "Bing",
-                    "results": results,
-                    "message": f"Found {len(results)} results via Bing"
-                }
+            return self._engine_result("Bing", self._parse_bing_results(response.text))
                 
         except Exception as e:
             print(colored(f"Bing search failed: {e}", "yellow"))
@@ -146,36 +228,11 @@ class EnhancedWebSearch:
                 'ia': 'web'
             }
             
-            response = self.session.get(self.search_engines[2], params=params, timeout=10)
+            with provider_span("duckduckgo"):
+                response = self.session.get(self.search_engines[2], params=params, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            results = []
-            
-            # Extract DuckDuckGo search results
-            for result in soup.find_all('div', class_='result')[:5]:
-                title_elem = result.find('a', class_='result__a')
-                snippet_elem = result.find('div', class_='result__snippet')
-                
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                    link = title_elem.get('href', '')
-                    snippet = snippet_elem.get_text(strip=True) if snippet_elem else ''
-                    
-                    if link.startswith('http'):
-                        results.append({
-                            'title': title,
-                            'url': link,
-                            'content': snippet
-                        })
-            
-            if results:
-                return {
-                    "success": True,
-                    "source": "DuckDuckGo",
-                    "results": results,
-                    "message": f"Found {len(results)} results via DuckDuckGo"
-                }
+            return self._engine_result("DuckDuckGo", self._parse_duckduckgo_results(response.text))
                 
         except Exception as e:
             print(colored(f"DuckDuckGo search failed: {e}", "yellow"))
@@ -201,19 +258,16 @@ class EnhancedWebSearch:
                     'NIFTY': '^NSEI'
                 }
                 
+                # One batched download for all indices (shared cache with the financial tools)
+                quotes = enhanced_financial_tools.get_batch_quotes(list(indices.values()))
                 for name, symbol in indices.items():
-                    try:
-                        ticker = yf.Ticker(symbol)
-                        info = ticker.info
-                        if info and 'regularMarketPrice' in info:
-                            results.append({
-                                'title': f'{name} Market Data',
-                                'url': f'https://finance.yahoo.com/quote/{symbol}',
-                                'content': f'Current {name} price: ${info["regularMarketPrice"]:.2f}'
-                            })
-                        time.sleep(0.1)  # Rate limiting
-                    except:
-                        continue
+                    price = quotes["current_price"].get(symbol)
+                    if price is not None and price == price:  # skip missing / NaN
+                        results.append({
+                            'title': f'{name} Market Data',
+                            'url': f'https://finance.yahoo.com/quote/{symbol}',
+                            'content': f'Current {name} price: ${price:.2f}'
+                        })
                 
                 if results:
                     return {
@@ -249,61 +303,128 @@ class EnhancedWebSearch:
         
         return None
     
-    def comprehensive_search(self, query: str, tavily_api_key: str = None) -> Dict[str, Any]:
-        """Perform comprehensive search using multiple sources"""
-        print(colored(f"🔍 Performing comprehensive search for: {query}", "blue"))
-        
-        search_results = []
-        sources_used = []
-        
-        # Try Tavily first (if available)
-        if tavily_api_key:
-            result = self.search_with_tavily(query, tavily_api_key)
-            if result and result["success"]:
-                search_results.extend(result["results"])
-                sources_used.append(result["source"])
-                print(colored(f"✅ {result['message']}", "green"))
+    def comprehensive_search(self, query: str, tavily_api_key: str = None, strategy: str = None) -> Dict[str, Any]:
+        """
+        Perform comprehensive search using multiple sources
+        strategy: "sequential" tries providers one after another in priority order until
+        there are enough results; "fanout" queries them concurrently under a global deadline.
+        Defaults to SEARCH_STRATEGY. Concurrent identical searches share one run.
+        """
+        strategy = strategy or SEARCH_STRATEGY
+        if not ENABLE_REQUEST_COALESCING:
+            return self._comprehensive_search(query, tavily_api_key, strategy)
+        key = ("comprehensive", strategy, normalize_query(query))
+        return search_flights.do(key, lambda: self._comprehensive_search(query, tavily_api_key, strategy))
+    
+    def _comprehensive_search(self, query: str, tavily_api_key: str, strategy: str) -> Dict[str, Any]:
+        print(colored(f"🔍 Performing comprehensive search for: {query} ({strategy})", "blue"))
         
-        # Try financial APIs for financial queries
-        if not search_results or len(search_results) < 3:
-            result = self.search_with_financial_apis(query)
-            if result and result["success"]:
-                search_results.extend(result["results"])
-                sources_used.append(result["source"])
-                print(colored(f"✅ {result['message']}", "green"))
+        providers = self._search_providers(query, tavily_api_key)
+        if strategy == "fanout":
+            provider_results = self._fanout_search(providers)
+        else:
+            provider_results = self._sequential_search(providers)
         
-        # Try Google search
-        if not search_results or len(search_results) < 3:
-            result = self.search_with_google(query)
-            if result and result["success"]:
-                search_results.extend(result["results"])
-                sources_used.append(result["source"])
-                print(colored(f"✅ {result['message']}", "green"))
+        search_results, sources_used = self._collect_results(provider_results)
         
-        # Try Bing search
-        if not search_results or len(search_results) < 3:
-            result = self.search_with_bing(query)
-            if result and result["success"]:
-                search_results.extend(result["results"])
-                sources_used.append(result["source"])
-                print(colored(f"✅ {result['message']}", "green"))
+        # Try news APIs (last-resort placeholder, never raced against real providers)
+        if len(search_results) < SEARCH_MIN_RESULTS:
+            self._accumulate(self.search_with_news_apis(query), search_results, sources_used)
         
-        # Try DuckDuckGo search
-        if not search_results or len(search_results) < 3:
-            result = self.search_with_duckduckgo(query)
-            if result and result["success"]:
-                search_results.extend(result["results"])
-                sources_used.append(result["source"])
-                print(colored(f"✅ {result['message']}", "green"))
-        
-        # Try news APIs
-        if not search_results or len(search_results) < 3:
-            result = self.search_with_news_apis(query)
+        return self._merge_results(search_results, sources_used)
+    
+    def _search_providers(self, query: str, tavily_api_key: str = None) -> List[Callable[[], Optional[Dict[str, Any]]]]:
+        """Primary search providers in priority order"""
+        providers = []
+        # Try Tavily first (if available)
+        if tavily_api_key:
+            providers.append(lambda: self.search_with_tavily(query, tavily_api_key))
+        providers.extend([
+            lambda: self.search_with_financial_apis(query),  # Financial data for market queries (quote cache)
+            lambda: self._cached("google", "html", query, lambda: self.search_with_google(query)),
+            lambda: self._cached("bing", "html", query, lambda: self.search_with_bing(query)),
+            lambda: self._cached("duckduckgo", "html", query, lambda: self.search_with_duckduckgo(query)),
+        ])
+        return providers
+    
+    def _sequential_search(self, providers: List[Callable[[], Optional[Dict[str, Any]]]]) -> List[Optional[Dict[str, Any]]]:
+        """Try providers one after another until enough results are collected"""
+        provider_results = []
+        total = 0
+        for provider in providers:
+            if total >= SEARCH_MIN_RESULTS:
+                break
+            result = provider()
+            provider_results.append(result)
             if result and result["success"]:
-                search_results.extend(result["results"])
-                sources_used.append(result["source"])
-                print(colored(f"✅ {result['message']}", "green"))
-        
+                total += len(result["results"])
+        return provider_results
+    
+    def _fanout_search(self, providers: List[Callable[[], Optional[Dict[str, Any]]]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Query all providers concurrently. Stops waiting once enough unique results have
+        arrived and the first-priority provider (Tavily, the best results) has answered, or
+        SEARCH_FANOUT_GRACE after that if it is still running, or at the global deadline;
+        stragglers are cancelled/abandoned.
+        Returns one slot per provider in priority order (None if missing).
+        """
+        provider_results = [None] * len(providers)
+        futures = {_fanout_executor.submit(provider): i for i, provider in enumerate(providers)}
+        preferred = next(iter(futures), None)
+        pending = set(futures)
+        seen_urls = set()
+        deadline = time.monotonic() + SEARCH_FANOUT_DEADLINE
+        try:
+            while pending:
+                if len(seen_urls) >= SEARCH_MIN_RESULTS:
+                    if preferred not in pending:
+                        break
+                    deadline = min(deadline, time.monotonic() + SEARCH_FANOUT_GRACE)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if len(seen_urls) >= SEARCH_MIN_RESULTS:
+                        print(colored(f"⏱️ First-priority provider still running after {SEARCH_FANOUT_GRACE}s grace", "yellow"))
+                    else:
+                        print(colored(f"⏱️ Search deadline ({SEARCH_FANOUT_DEADLINE}s) reached", "yellow"))
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures[future]
+                    try:
+                        provider_results[index] = future.result()
+                    except Exception as e:
+                        print(colored(f"Search provider failed: {e}", "yellow"))
+                    seen_urls.update(self._result_urls(provider_results[index]))
+        finally:
+            # Running threads can't be interrupted (HTTP_TIMEOUT bounds them); cancel anything not started
+            for future in pending:
+                future.cancel()
+        if pending:
+            print(colored(f"Cancelled {len(pending)} straggling search provider(s)", "yellow"))
+        return provider_results
+    
+    def _result_urls(self, result: Optional[Dict[str, Any]]) -> List[str]:
+        if result and result.get("success"):
+            return [r['url'] for r in result["results"]]
+        return []
+    
+    def _accumulate(self, result: Optional[Dict[str, Any]], search_results: List[Dict[str, Any]], sources_used: List[str]) -> None:
+        """Add one provider's results to the running collection"""
+        if result and result["success"]:
+            search_results.extend(result["results"])
+            sources_used.append(result["source"])
+            print(colored(f"✅ {result['message']}", "green"))
+    
+    def _collect_results(self, provider_results: List[Optional[Dict[str, Any]]]):
+        """Flatten provider results in priority order"""
+        search_results = []
+        sources_used = []
+        for result in provider_results:
+            self._accumulate(result, search_results, sources_used)
+        return search_results, sources_used
+    
+    def _merge_results(self, search_results: List[Dict[str, Any]], sources_used: List[str]) -> Dict[str, Any]:
+        """Deduplicate collected results and build the comprehensive search response"""
         # Remove duplicates based on URL
         seen_urls = set()
         unique_results = []
@@ -331,6 +452,154 @@ class EnhancedWebSearch:
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
     
+    # --- Async variants (used by the async /query pipeline) ---
+    
+    async def asearch_with_tavily(self, query: str, api_key: str) -> Optional[Dict[str, Any]]:
+        """Async search using Tavily API if available (cached; shares entries with deep research)"""
+        try:
+            tavily_client = self._tavily_client(api_key, kind="async")
+            
+            async def fetch():
+                with provider_span("tavily"):
+                    return await tavily_client.search(query=query, search_depth="advanced", max_results=5)
+            
+            return self._tavily_result(await self._acached("tavily", "advanced", query, fetch))
+        except Exception as e:
+            print(colored(f"Tavily search failed: {e}", "yellow"))
+        
+        return None
+    
+    async def asearch_with_google(self, query: str, client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+        """Async fallback search using Google (basic scraping)"""
+        try:
+            with provider_span("google"):
+                response = await client.get(self.search_engines[0], params={'q': query, 'num': 5})
+            response.raise_for_status()
+            
+            return self._engine_result("Google", self._parse_google_results(response.text))
+        except Exception as e:
+            print(colored(f"Google search failed: {e}", "yellow"))
+        
+        return None
+    
+    async def asearch_with_bing(self, query: str, client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+        """Async fallback search using Bing"""
+        try:
+            with provider_span("bing"):
+                response = await client.get(self.search_engines[1], params={'q': query, 'count': 5})
+            response.raise_for_status()
+            
+            return self._engine_result("Bing", self._parse_bing_results(response.text))
+        except Exception as e:
+            print(colored(f"Bing search failed: {e}", "yellow"))
+        
+        return None
+    
+    async def asearch_with_duckduckgo(self, query: str, client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+        """Async fallback search using DuckDuckGo"""
+        try:
+            with provider_span("duckduckgo"):
+                response = await client.get(self.search_engines[2], params={'q': query, 't': 'h_', 'ia': 'web'})
+            response.raise_for_status()
+            
+            return self._engine_result("DuckDuckGo", self._parse_duckduckgo_results(response.text))
+        except Exception as e:
+            print(colored(f"DuckDuckGo search failed: {e}", "yellow"))
+        
+        return None
+    
+    async def _ascrape(self, search: Callable[..., Awaitable[Optional[Dict[str, Any]]]], query: str,
+                       client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+        """Run a scraper on the search run's client, or on a new one for a cache refresh that outlives it"""
+        if not client.is_closed:
+            return await search(query, client)
+        async with self._async_client() as fresh_client:
+            return await search(query, fresh_client)
+    
+    async def asearch_with_news_apis(self, query: str) -> Optional[Dict[str, Any]]:
+        """Async news fallback (no network I/O yet, kept for provider parity)"""
+        return self.search_with_news_apis(query)
+    
+    async def acomprehensive_search(self, query: str, tavily_api_key: str = None, strategy: str = None) -> Dict[str, Any]:
+        """Async comprehensive search: same providers, order, strategies and coalescing as comprehensive_search, non-blocking I/O"""
+        strategy = strategy or SEARCH_STRATEGY
+        if not ENABLE_REQUEST_COALESCING:
+            return await self._acomprehensive_search(query, tavily_api_key, strategy)
+        key = ("comprehensive", strategy, normalize_query(query))
+        return await search_flights.ado(key, lambda: self._acomprehensive_search(query, tavily_api_key, strategy))
+    
+    async def _acomprehensive_search(self, query: str, tavily_api_key: str, strategy: str) -> Dict[str, Any]:
+        print(colored(f"🔍 Performing comprehensive search for: {query} ({strategy})", "blue"))
+        
+        async with self._async_client() as client:
+            providers = []
+            if tavily_api_key:
+                providers.append(lambda: self.asearch_with_tavily(query, tavily_api_key))
+            providers.extend([
+                # yfinance has no async API, keep it off the event loop
+                lambda: run_blocking(self.search_with_financial_apis, query),
+                lambda: self._acached("google", "html", query, lambda: self._ascrape(self.asearch_with_google, query, client)),
+                lambda: self._acached("bing", "html", query, lambda: self._ascrape(self.asearch_with_bing, query, client)),
+                lambda: self._acached("duckduckgo", "html", query,
+                                      lambda: self._ascrape(self.asearch_with_duckduckgo, query, client)),
+            ])
+            
+            if strategy == "fanout":
+                provider_results = await self._afanout_search(providers)
+            else:
+                provider_results = []
+                total = 0
+                for provider in providers:
+                    # Same fallback rule as the sync path: stop once we have enough results
+                    if total >= SEARCH_MIN_RESULTS:
+                        break
+                    result = await provider()
+                    provider_results.append(result)
+                    if result and result["success"]:
+                        total += len(result["results"])
+        
+        search_results, sources_used = self._collect_results(provider_results)
+        if len(search_results) < SEARCH_MIN_RESULTS:
+            self._accumulate(await self.asearch_with_news_apis(query), search_results, sources_used)
+        
+        return self._merge_results(search_results, sources_used)
+    
+    async def _afanout_search(self, providers: List[Callable[[], Awaitable[Optional[Dict[str, Any]]]]]) -> List[Optional[Dict[str, Any]]]:
+        """Async counterpart of _fanout_search (same grace for the first provider); stragglers are cancelled outright"""
+        provider_results = [None] * len(providers)
+        tasks = {asyncio.ensure_future(provider()): i for i, provider in enumerate(providers)}
+        preferred = next(iter(tasks), None)
+        pending = set(tasks)
+        seen_urls = set()
+        deadline = time.monotonic() + SEARCH_FANOUT_DEADLINE
+        try:
+            while pending:
+                if len(seen_urls) >= SEARCH_MIN_RESULTS:
+                    if preferred not in pending:
+                        break
+                    deadline = min(deadline, time.monotonic() + SEARCH_FANOUT_GRACE)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if len(seen_urls) >= SEARCH_MIN_RESULTS:
+                        print(colored(f"⏱️ First-priority provider still running after {SEARCH_FANOUT_GRACE}s grace", "yellow"))
+                    else:
+                        print(colored(f"⏱️ Search deadline ({SEARCH_FANOUT_DEADLINE}s) reached", "yellow"))
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks[task]
+                    try:
+                        provider_results[index] = task.result()
+                    except Exception as e:
+                        print(colored(f"Search provider failed: {e}", "yellow"))
+                    seen_urls.update(self._result_urls(provider_results[index]))
+        finally:
+            for task in pending:
+                task.cancel()
+        if pending:
+            print(colored(f"Cancelled {len(pending)} straggling search provider(s)", "yellow"))
+        return provider_results
+    
     def format_search_results(self, search_data: Dict[str, Any]) -> str:
         """Format search results into a readable response"""
         if not search_data.get("success"):
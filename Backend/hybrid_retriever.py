@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Hybrid Retrieval for WealthLens
+On-disk BM25 inverted index fused with Chroma similarity search (reciprocal rank fusion)
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from termcolor import colored
+
+from vars import BM25_INDEX_PATH, RETRIEVAL_K, RETRIEVAL_FETCH_K, RRF_K
+
+# Tickers (^NSEI, BRK.B), ISINs (INE002A01018), figures (12.5%, 3,400) survive as single tokens
+TOKEN_PATTERN = re.compile(r"\d+(?:,\d+)+(?:\.\d+)?%?|[a-z0-9^$][a-z0-9.&%$-]*[a-z0-9%]|[a-z0-9]")
+TOKENIZER_VERSION = 2  # Bump when tokenize() changes; older indexes are re-tokenized on load
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was "
+    "what when where which who why will with".split()
+)
+
+
+def content_id(text: str) -> str:
+    """Chunk id shared by the vector store and the BM25 index: hash of the chunk text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if "," in token:
+            # Grouped figures also match their plain spelling: "3,400" and "3400"
+            tokens.append(token.replace(",", ""))
+        elif any(c in token for c in ".&-"):
+            # Also index the parts so "brk" matches "brk.b"
+            tokens.extend(part for part in re.split(r"[.&-]", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk ids. Postings, document lengths and chunk texts are persisted as one
+    JSON file; searchers reload it when the ingestion process rewrites it.
+    """
+
+    def __init__(self, path: str = BM25_INDEX_PATH, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._clear()
+        self._load()
+
+    def _clear(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.total_len = 0
+
+    # --- persistence ---
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(colored(f"Could not load BM25 index {self.path}: {e}", "yellow"))
+            return
+        self._mtime = mtime
+        if data.get("tokenizer") != TOKENIZER_VERSION:
+            # Postings from another tokenizer would miss query terms: rebuild them from the chunk texts
+            print(colored(f"Re-tokenizing BM25 index {self.path} ({len(data['docs'])} chunks)", "yellow"))
+            self._clear()
+            for doc_id, doc in data["docs"].items():
+                self.add(doc_id, doc["text"], doc["metadata"])
+            return
+        self.postings = data["postings"]
+        self.doc_len = data["doc_len"]
+        self.docs = data["docs"]
+        self.total_len = sum(self.doc_len.values())
+
+    def _maybe_reload(self):
+        """Pick up an index rewritten by another process. Caller holds the lock."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"tokenizer": TOKENIZER_VERSION, "postings": self.postings,
+                           "doc_len": self.doc_len, "docs": self.docs}, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+
+    # --- updates ---
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            if doc_id in self.docs:
+                return
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self.doc_len[doc_id] = length
+            self.total_len += length
+            self.docs[doc_id] = {"text": text, "metadata": metadata or {}}
+
+    def add_documents(self, docs: List[Document], ids: Optional[List[str]] = None):
+        ids = ids or [content_id(doc.page_content) for doc in docs]
+        with self._lock:
+            for doc_id, doc in zip(ids, docs):
+                self.add(doc_id, doc.page_content, doc.metadata)
+
+    def remove(self, doc_ids: List[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                doc = self.docs.pop(doc_id, None)
+                if doc is None:
+                    continue
+                for term in set(tokenize(doc["text"])):
+                    posting = self.postings.get(term)
+                    if posting is not None:
+                        posting.pop(doc_id, None)
+                        if not posting:
+                            del self.postings[term]
+                self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def rebuild_from_store(self, vector_store):
+        """Backfill the index from every chunk already in the Chroma collection"""
+        data = vector_store.get(include=["documents", "metadatas"])
+        with self._lock:
+            self._clear()
+            for text, metadata in zip(data["documents"], data["metadatas"]):
+                if text:
+                    self.add(content_id(text), text, metadata)
+            self.save()
+        print(colored(f"BM25 index rebuilt from vector store: {len(self.docs)} chunks", "green"))
+
+    # --- search ---
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query: str, k: int = RETRIEVAL_FETCH_K) -> List[Tuple[str, float]]:
+        with self._lock:
+            self._maybe_reload()
+            n = len(self.docs)
+            if not n:
+                return []
+            avgdl = self.total_len / n
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+    def document(self, doc_id: str) -> Document:
+        with self._lock:
+            doc = self.docs[doc_id]
+        return Document(page_content=doc["text"], metadata=doc["metadata"])
+
+
+# Shared with ingestion, which keeps it in sync with the vector store
+bm25_index = BM25Index()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (rrf_k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense (Chroma) + sparse (BM25) candidates fused with RRF, optionally reranked locally"""
+
+    vector_store: Any
+    bm25: Any
+    k: int = RETRIEVAL_K
+    fetch_k: int = RETRIEVAL_FETCH_K
+    rrf_k: int = RRF_K
+    reranker: Optional[Any] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # Relevance scores (0-1) ride along in metadata for the local grader
+        dense_hits = self.vector_store.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+        candidates: Dict[str, Document] = {}
+        dense_ids = []
+        for doc, relevance in dense_hits:
+            doc_id = content_id(doc.page_content)
+            dense_ids.append(doc_id)
+            if doc_id not in candidates:
+                doc.metadata = {**doc.metadata, "relevance_score": round(float(relevance), 4)}
+                candidates[doc_id] = doc
+        sparse_hits = self.bm25.search(query, k=self.fetch_k)
+        sparse_ids = [doc_id for doc_id, _ in sparse_hits]
+        # Relative to this query's best BM25 hit: raw scores have no fixed scale, and a theoretical
+        # maximum (every query term, saturated tf) is out of reach for a chunk with one exact match
+        best = sparse_hits[0][1] if sparse_hits else 1.0
+        bm25_scores = {doc_id: round(score / best, 4) for doc_id, score in sparse_hits}
+
+        fused = reciprocal_rank_fusion([dense_ids, sparse_ids], self.rrf_k)
+        # The reranker sees a wider slice of the fused list than it returns
+        top_n = self.fetch_k if self.reranker is not None else self.k
+        docs = []
+        for doc_id, score in fused[:top_n]:
+            doc = candidates.get(doc_id) or self.bm25.document(doc_id)
+            doc.metadata = {**doc.metadata, "rrf_score": round(score, 5)}
+            if doc_id in bm25_scores:
+                doc.metadata["bm25_score"] = bm25_scores[doc_id]
+            docs.append(doc)
+        if self.reranker is not None:
+            docs = self.reranker.rerank(query, docs, self.k)
+        return docs
+
+
+def build_retriever(vector_store, mode: str, reranker=None):
+    """Knowledge base retriever for the configured mode ("hybrid" or "dense")"""
+    if mode != "hybrid":
+        return vector_store.as_retriever(search_kwargs={'k': RETRIEVAL_K})
+    if not len(bm25_index):
+        # Stores ingested before the BM25 index existed
+        bm25_index.rebuild_from_store(vector_store)
+    return HybridRetriever(vector_store=vector_store, bm25=bm25_index, reranker=reranker)
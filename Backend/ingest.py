@@ -1,11 +1,28 @@
 import os
+import json
 import time
+import queue
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from uuid import uuid4
+from langchain_core.documents import Document
 from models import Models
+from hybrid_retriever import bm25_index, content_id
+
+# inotify/FSEvents/ReadDirectoryChangesW based change detection; polling is the fallback
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
 
 load_dotenv()
 
@@ -18,7 +35,13 @@ llm = models.model_ollama
 data_folder = "data"
 chunk_size = 1000
 chunk_overlap = 50
-check_interval = 10
+check_interval = 10  # Polling interval, only used when watchdog is not installed
+parse_workers = max(1, (os.cpu_count() or 2) - 1)  # Processes for PDF parsing + splitting
+embed_workers = 4  # Concurrent embedding / vector store write requests
+embed_batch_size = 64  # Chunks per embedding request
+queue_size = 8  # Files waiting to be parsed; producers block when full (backpressure)
+settle_time = 1.0  # Seconds a new file's size must stay unchanged before it is ingested
+manifest_path = "./db/ingest_manifest.json"  # Ingested files, their hashes and chunk ids
 
 # Chroma vector store
 vector_store = Chroma(
@@ -26,16 +49,15 @@ vector_store = Chroma(
     embedding_function=embeddings,
     persist_directory="./db/chroma_langchain_db",  # Where to save data locally
 )
-# Ingest a file
 
 
-def ingest_file(file_path: str):
-    print(f"Ingesting file: {file_path}")
-    # Skip non-PDF files
-    if not file_path.lower().endswith('.pdf'):
-        print(f"Skipping non-PDF file: {file_path}")
-        return
-    print(f"Starting to ingest file: {file_path}")
+def is_pending(file_name: str) -> bool:
+    """Files not yet renamed to ingested_* still need to be ingested"""
+    return not file_name.startswith("ingested_") and not file_name.startswith(".")
+
+
+def load_and_split(file_path: str) -> Tuple[List[Document], int]:
+    """Parse a PDF and split it into chunks. Runs in a worker process. Returns (chunks, pages)."""
     # Editor wallah - next generain physicswallah
     loader = PyPDFLoader(file_path=file_path)
     loaded_documents = loader.load()
@@ -43,26 +65,335 @@ def ingest_file(file_path: str):
         chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=[
             "\n", ","]
     )
+    return text_splitter.split_documents(loaded_documents), len(loaded_documents)
+
+
+# --- Content-addressed chunks and ingest manifest ---
+# Chunk ids are hashes of the chunk text, so identical chunks (re-dropped or renamed files,
+# shared boilerplate) map to one vector. The manifest records which file owns which chunks.
+_manifest_lock = threading.Lock()
+_inflight_chunks: Counter = Counter()  # Chunk ids being added right now, never treated as stale
+
+
+def file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(doc: Document) -> str:
+    return content_id(doc.page_content)
+
+
+def document_name(file_path: str) -> str:
+    """Manifest key: the file name without the ingested_ prefix"""
+    name = os.path.basename(file_path)
+    return name[len("ingested_"):] if name.startswith("ingested_") else name
+
+
+def load_manifest() -> Dict[str, Any]:
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+
+
+def save_manifest(manifest: Dict[str, Any]):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)  # Atomic: readers never see a half-written manifest
+
+
+def unique_chunks(docs: List[Document]) -> Tuple[List[Document], List[str]]:
+    """Drop duplicate chunks within a document, returning (docs, ids) in order"""
+    seen = set()
+    unique_docs, ids = [], []
+    for doc in docs:
+        doc_id = chunk_id(doc)
+        if doc_id not in seen:
+            seen.add(doc_id)
+            unique_docs.append(doc)
+            ids.append(doc_id)
+    return unique_docs, ids
+
+
+def existing_ids(ids: List[str]) -> set:
+    """Which of these chunk ids are already in the vector store"""
+    found = set()
+    for i in range(0, len(ids), embed_batch_size * 8):
+        found.update(vector_store.get(ids=ids[i:i + embed_batch_size * 8], include=[])["ids"])
+    return found
+
+
+def embed_documents(docs: List[Document], ids: List[str], embed_pool: Optional[ThreadPoolExecutor] = None):
+    """Embed and store chunks in batches, concurrently when a pool is given"""
+    batches = [(docs[i:i + embed_batch_size], ids[i:i + embed_batch_size]) for i in range(0, len(docs), embed_batch_size)]
+
+    def add_batch(batch: Tuple[List[Document], List[str]]):
+        vector_store.add_documents(documents=batch[0], ids=batch[1])
+
+    if embed_pool is None:
+        for batch in batches:
+            add_batch(batch)
+        return
+    futures = [embed_pool.submit(add_batch, batch) for batch in batches]
+    wait(futures)
+    for future in futures:
+        future.result()  # Surface the first batch error
+
+
+# Ingest a file
+def ingest_file(file_path: str, parse_pool: Optional[ProcessPoolExecutor] = None,
+                embed_pool: Optional[ThreadPoolExecutor] = None) -> int:
+    """Ingest one file and return its page count (0 when skipped)"""
+    print(f"Ingesting file: {file_path}")
+    # Skip non-PDF files
+    if not file_path.lower().endswith('.pdf'):
+        print(f"Skipping non-PDF file: {file_path}")
+        return 0
+    print(f"Starting to ingest file: {file_path}")
+    start = time.perf_counter()
+    name = document_name(file_path)
+    digest = file_hash(file_path)
+    with _manifest_lock:
+        manifest = load_manifest()
+    previous = manifest["files"].get(name)
+    if previous and previous["sha256"] == digest:
+        print(f"Unchanged since last ingest, skipping: {file_path}")
+        return 0
+    for other_name, other in manifest["files"].items():
+        if other["sha256"] == digest:
+            # Same bytes under a new name: reuse the stored chunks, nothing to embed
+            print(f"Identical to already ingested {other_name}, recording without re-embedding: {file_path}")
+            with _manifest_lock:
+                manifest = load_manifest()
+                manifest["files"][name] = {**other, "ingested_at": datetime.now().isoformat(timespec="seconds")}
+                if _remove_stale(manifest, previous["chunk_ids"] if previous else []):
+                    bm25_index.save()
+                save_manifest(manifest)
+            return 0
+
+    if parse_pool is None:
+        docs, pages = load_and_split(file_path)
+    else:
+        docs, pages = parse_pool.submit(load_and_split, file_path).result()
+    docs, ids = unique_chunks(docs)
+    print(f"Loaded {len(docs)} documents ({pages} pages) from {file_path}")
+
+    with _manifest_lock:
+        _inflight_chunks.update(ids)  # Registered before the existence check, see _remove_stale
+    try:
+        present = existing_ids(ids)
+        new_docs = [doc for doc, doc_id in zip(docs, ids) if doc_id not in present]
+        new_ids = [doc_id for doc_id in ids if doc_id not in present]
+        embed_documents(new_docs, new_ids, embed_pool)
+        with _manifest_lock:
+            bm25_index.add_documents(docs, ids)  # No-op for chunks it already has
+            manifest = load_manifest()
+            manifest["files"][name] = {
+                "sha256": digest,
+                "pages": pages,
+                "chunk_ids": ids,
+                "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            stale = _remove_stale(manifest, previous["chunk_ids"] if previous else [])
+            save_manifest(manifest)
+            bm25_index.save()
+    finally:
+        with _manifest_lock:
+            _inflight_chunks.subtract(ids)
+            for doc_id in ids:
+                if _inflight_chunks[doc_id] <= 0:
+                    del _inflight_chunks[doc_id]
+    elapsed = time.perf_counter() - start
+    print(f"Added {len(new_docs)} new documents to the vector store ({len(docs) - len(new_docs)} already stored, {stale} stale removed)")
+    print(f"Finished ingesting file: {file_path} in {elapsed:.1f}s ({pages / max(elapsed, 1e-6):.2f} pages/s)")
+    return pages
+
+
+def _remove_stale(manifest: Dict[str, Any], old_ids: List[str]) -> int:
+    """
+    Delete chunks of a file's previous version that nothing references any more.
+    Caller holds _manifest_lock; chunks another file is adding concurrently are kept.
+    """
+    referenced = set()
+    for entry in manifest["files"].values():
+        referenced.update(entry["chunk_ids"])
+    stale = [doc_id for doc_id in set(old_ids) if doc_id not in referenced and doc_id not in _inflight_chunks]
+    if stale:
+        vector_store.delete(ids=stale)
+        bm25_index.remove(stale)
+    return len(stale)
+
+
+def mark_ingested(file_path: str):
+    """Rename a processed file to ingested_<name> so it is not picked up again"""
+    folder, file = os.path.split(file_path)
+    # Replace the previous version of an updated document
+    os.replace(file_path, os.path.join(folder, "ingested_" + file))
+
+
+class _NewFileHandler(FileSystemEventHandler):
+    """Forwards created / moved-in files to the ingestion service"""
+
+    def __init__(self, service: "IngestionService"):
+        self.service = service
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.service.enqueue(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.service.enqueue(event.dest_path)
+
+
+class IngestionService:
+    """
+    Event-driven ingestion: a watcher feeds a bounded queue, consumer threads parse files
+    on a process pool and embed their chunks in concurrent batches.
+    """
+
+    def __init__(self, folder: str = data_folder, num_parse_workers: int = parse_workers,
+                 num_embed_workers: int = embed_workers, max_queued: int = queue_size):
+        self.folder = folder
+        self.num_parse_workers = num_parse_workers
+        self.num_embed_workers = num_embed_workers
+        self.queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_queued)
+        self._queued = set()  # Paths queued or in progress, so duplicate events are ignored
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
+        self.embed_pool: Optional[ThreadPoolExecutor] = None
+        self.files_ingested = 0
+        self.files_failed = 0
+        self.pages_ingested = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+
+    def enqueue(self, file_path: str):
+        """Queue a file for ingestion. Blocks while the queue is full (backpressure on the watcher)."""
+        if not is_pending(os.path.basename(file_path)):
+            return
+        with self._lock:
+            if file_path in self._queued:
+                return
+            self._queued.add(file_path)
+        self.queue.put(file_path)
+        print(f"Queued {file_path} ({self.queue.qsize()} waiting)")
+
+    def _wait_until_stable(self, file_path: str) -> bool:
+        """Wait for a file that is still being copied in to reach its final size"""
+        last_size = -1
+        while not self._stop.is_set():
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                return False  # Removed before we got to it
+            if size == last_size:
+                return True
+            last_size = size
+            time.sleep(settle_time)
+        return False
+
+    def _consume(self):
+        while True:
+            file_path = self.queue.get()
+            try:
+                if file_path is None:
+                    return
+                if not self._wait_until_stable(file_path):
+                    continue
+                start = time.perf_counter()
+                try:
+                    pages = ingest_file(file_path, self.parse_pool, self.embed_pool)
+                    mark_ingested(file_path)
+                except Exception as e:
+                    with self._lock:
+                        self.files_failed += 1
+                    print(f"Failed to ingest {file_path}: {e}")
+                    continue
+                with self._lock:
+                    self.files_ingested += 1
+                    self.pages_ingested += pages
+                    self.busy_seconds += time.perf_counter() - start
+                self.report()
+            finally:
+                if file_path is not None:
+                    with self._lock:
+                        self._queued.discard(file_path)
+                self.queue.task_done()
+
+    def scan(self):
+        """Queue every pending file currently in the folder"""
+        for entry in sorted(os.scandir(self.folder), key=lambda e: e.name):
+            if entry.is_file():
+                self.enqueue(entry.path)
+
+    def start(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.started_at = time.perf_counter()
+        self.parse_pool = ProcessPoolExecutor(max_workers=self.num_parse_workers)
+        self.embed_pool = ThreadPoolExecutor(max_workers=self.num_embed_workers, thread_name_prefix="ingest-embed")
+        # One consumer per parse process keeps the pool busy while other files are embedding
+        for i in range(self.num_parse_workers):
+            thread = threading.Thread(target=self._consume, name=f"ingest-consumer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_NewFileHandler(self), self.folder, recursive=False)
+            self._observer.start()
+            print(f"Watching {self.folder} for new files")
+        else:
+            print(f"watchdog not installed, polling {self.folder} every {check_interval}s")
+        self.scan()  # Files dropped while the service was down
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                if self._observer is None:
+                    self.scan()
+                self._stop.wait(check_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.embed_pool.shutdown(wait=True)
+        self.parse_pool.shutdown(wait=True)
+        self.report()
 
-    docs = text_splitter.split_documents(loaded_documents)
-    print(f"Loaded {len(docs)} documents from {file_path}")
-    uuids = [str(uuid4()) for _ in range(len(docs))]
-    vector_store.add_documents(documents=docs, ids=uuids)
-    print(f"Added {len(docs)} documents to the vector store")
-    print(f"Finished ingesting file: {file_path}")
+    def report(self):
+        """Print progress and throughput (pages/s over wall time and over time spent ingesting)"""
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        print(
+            f"Ingestion progress: {self.files_ingested} files, {self.pages_ingested} pages, "
+            f"{self.files_failed} failed, {self.queue.qsize()} queued | "
+            f"{self.pages_ingested / max(elapsed, 1e-6):.2f} pages/s overall, "
+            f"{self.pages_ingested / max(self.busy_seconds, 1e-6):.2f} pages/s per consumer"
+        )
 
 
 def main():
-    while True:
-        files = os.listdir(data_folder)
-        for file in files:
-            if not file.startswith("ingested_"):
-                file_path = os.path.join(data_folder, file)
-                ingest_file(file_path)
-                new_file = "ingested_" + file
-                new_file_path = os.path.join(data_folder, new_file)
-                os.rename(file_path, new_file_path)
-        time.sleep(check_interval)
+    IngestionService().run_forever()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+LLM Scheduler for WealthLens
+Process-wide, rate-limit aware admission for LLM API calls: per-model token buckets, priority queues, jittered retries
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+from termcolor import colored
+
+import metrics
+from vars import (
+    LLM_RATE_LIMITS, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+    LLM_COMPLETION_TOKEN_ESTIMATE, LLM_QUEUE_TIMEOUT, SERVER_WORKERS
+)
+
+# Lower runs first. Interactive: the answer a user is waiting on (routing, grading, synthesis).
+PRIORITIES = {"interactive": 0, "normal": 1, "background": 2}
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_llm_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default="interactive")
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Run the LLM calls made inside this block (and in contexts copied from it) at `priority`"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority {priority!r}, expected one of {list(PRIORITIES)}")
+    token = _llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        _llm_priority.reset(token)
+
+
+class TokenBucket:
+    """`capacity` units, refilled continuously at `rate` per second; the level may go negative (debt)"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.refill(now)
+        amount = min(amount, self.capacity)  # A request larger than the bucket waits for a full one
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "event", "loop")
+
+    def __init__(self, priority: int, seq: int, tokens: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class ModelBudget:
+    """Request and token buckets of one model, plus its queue of waiting calls"""
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = TokenBucket(rpm, rpm / 60)
+        self.tokens = TokenBucket(tpm, tpm / 60)
+        self.queue: List[_Waiter] = []
+        self.paused_until = 0.0  # Set from 429 retry-after
+        self.stats = {"granted": 0, "rate_limited": 0, "retries": 0, "queue_timeouts": 0}
+
+
+class LLMScheduler:
+    """
+    Every call to the LLM API passes acquire() before it is sent. A call goes out when it is at
+    the head of its model's queue (priority, then arrival order) and both the request and token
+    buckets can pay for it; otherwise it waits, without holding a thread for async callers.
+    Budgets follow the rate-limit headers of each response, and retryable failures (429, 5xx,
+    connection errors) are retried with full-jitter exponential backoff, honouring retry-after.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]] = LLM_RATE_LIMITS, workers: int = SERVER_WORKERS):
+        self.limits = limits
+        # Each worker process schedules alone, so it gets its share of the account's limits
+        self.workers = max(int(workers), 1)
+        self._budgets: Dict[str, ModelBudget] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _budget(self, model: str) -> ModelBudget:
+        """Caller holds the lock"""
+        budget = self._budgets.get(model)
+        if budget is None:
+            limits = self.limits.get(model) or self.limits["default"]
+            budget = self._budgets[model] = ModelBudget(
+                model, limits["rpm"] / self.workers, limits["tpm"] / self.workers)
+        return budget
+
+    # --- admission ---
+
+    def _try_grant(self, budget: ModelBudget, waiter: _Waiter) -> Optional[float]:
+        """0 when granted, seconds to wait when at the head, None when others are ahead. Caller holds the lock."""
+        if budget.queue[0] is not waiter:
+            return None
+        now = time.monotonic()
+        wait = max(budget.paused_until - now, budget.requests.wait_time(1, now),
+                   budget.tokens.wait_time(waiter.tokens, now))
+        if wait > 0:
+            return wait
+        heapq.heappop(budget.queue)
+        budget.requests.level -= 1
+        budget.tokens.level -= waiter.tokens
+        budget.stats["granted"] += 1
+        if budget.queue:
+            budget.queue[0].wake()
+        return 0.0
+
+    def _enqueue(self, model: str, priority: str, tokens: int, loop) -> Tuple[ModelBudget, _Waiter]:
+        with self._lock:
+            budget = self._budget(model)
+            waiter = _Waiter(PRIORITIES[priority], next(self._seq), tokens, loop)
+            heapq.heappush(budget.queue, waiter)
+        metrics.llm_queue_depth.inc(model=model, priority=priority)
+        return budget, waiter
+
+    def _leave(self, budget: ModelBudget, waiter: _Waiter, priority: str, granted: bool, start: float):
+        metrics.llm_queue_depth.dec(model=budget.model, priority=priority)
+        if granted:
+            metrics.record_llm_queue_wait(budget.model, priority, time.monotonic() - start)
+            return
+        with self._lock:
+            budget.stats["queue_timeouts"] += 1
+            if waiter in budget.queue:
+                budget.queue.remove(waiter)
+                heapq.heapify(budget.queue)
+            if budget.queue:
+                budget.queue[0].wake()
+
+    def acquire(self, model: str, tokens: int, priority: str) -> None:
+        budget, waiter = self._enqueue(model, priority, tokens, None)
+        start = time.monotonic()
+        granted = False
+        try:
+            while not granted:
+                waiter.event.clear()
+                with self._lock:
+                    wait = self._try_grant(budget, waiter)
+                if wait == 0:
+                    granted = True
+                    break
+                if time.monotonic() - start > LLM_QUEUE_TIMEOUT:
+                    raise httpx.PoolTimeout(f"Waited over {LLM_QUEUE_TIMEOUT}s for an LLM budget slot ({model})")
+                waiter.event.wait(timeout=min(wait or 1.0, 1.0))
+        finally:
+            self._leave(budget, waiter, priority, granted, start)
+
+    async def aacquire(self, model: str, tokens: int, priority: str) -> None:
+        budget, waiter = self._enqueue(model, priority, tokens, asyncio.get_running_loop())
+        start = time.monotonic()
+        granted = False
+        try:
+            while not granted:
+                waiter.event.clear()
+                with self._lock:
+                    wait = self._try_grant(budget, waiter)
+                if wait == 0:
+                    granted = True
+                    break
+                if time.monotonic() - start > LLM_QUEUE_TIMEOUT:
+                    raise httpx.PoolTimeout(f"Waited over {LLM_QUEUE_TIMEOUT}s for an LLM budget slot ({model})")
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=min(wait or 1.0, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._leave(budget, waiter, priority, granted, start)
+
+    # --- feedback from responses ---
+
+    def settle(self, model: str, estimated: int, response: httpx.Response) -> Optional[float]:
+        """Reconcile budgets with the response; returns the retry-after delay of a 429, if any"""
+        headers = response.headers
+        with self._lock:
+            budget = self._budget(model)
+            now = time.monotonic()
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            if remaining is not None:
+                try:
+                    # The server's view wins when it is tighter than ours (other clients on the account)
+                    budget.tokens.refill(now)
+                    budget.tokens.level = min(budget.tokens.level, float(remaining) / self.workers)
+                except ValueError:
+                    pass
+            used = self._usage_tokens(response)
+            if used is not None:
+                budget.tokens.level += estimated - used  # Refund (or charge) the estimate error
+            if response.status_code != 429:
+                return None
+            budget.stats["rate_limited"] += 1
+            retry_after = _retry_after(headers)
+            budget.paused_until = max(budget.paused_until, now + (retry_after or 0.0))
+            return retry_after
+
+    @staticmethod
+    def _usage_tokens(response: httpx.Response) -> Optional[int]:
+        if "json" not in response.headers.get("content-type", "") or not hasattr(response, "_content"):
+            return None
+        try:
+            return int(json.loads(response.content)["usage"]["total_tokens"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def backoff(self, model: str, attempt: int, reason: str, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's retry-after"""
+        with self._lock:
+            self._budget(model).stats["retries"] += 1
+        metrics.llm_retries.inc(model=model, reason=reason)
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            snapshot = {}
+            for model, budget in self._budgets.items():
+                budget.requests.refill(now)
+                budget.tokens.refill(now)
+                depth: Dict[str, int] = {}
+                for waiter in budget.queue:
+                    name = next(k for k, v in PRIORITIES.items() if v == waiter.priority)
+                    depth[name] = depth.get(name, 0) + 1
+                snapshot[model] = {
+                    "queue_depth": depth,
+                    "requests_available": round(budget.requests.level, 2),
+                    "tokens_available": round(budget.tokens.level),
+                    "paused_for": round(max(budget.paused_until - now, 0.0), 2),
+                    **budget.stats,
+                }
+            return snapshot
+
+
+def _retry_after(headers) -> Optional[float]:
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _request_cost(request: httpx.Request) -> Optional[Dict[str, Any]]:
+    """{"model", "tokens" (prompt chars / 4 + completion allowance)} of a chat completion, None for anything else"""
+    if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+        return None
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return None
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or LLM_COMPLETION_TOKEN_ESTIMATE
+    return {"model": body.get("model", "default"), "tokens": prompt_chars // 4 + 1 + int(completion)}
+
+
+class ScheduledTransport(httpx.HTTPTransport):
+    """httpx transport of the shared sync LLM client: admission, budget feedback and retries"""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        cost = _request_cost(request)
+        if cost is None:
+            return super().handle_request(request)
+        model, priority = cost["model"], _llm_priority.get()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            llm_scheduler.acquire(model, cost["tokens"], priority)
+            try:
+                response = super().handle_request(request)
+            except httpx.TransportError as e:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                time.sleep(llm_scheduler.backoff(model, attempt, type(e).__name__))
+                continue
+            if "json" in response.headers.get("content-type", ""):
+                response.read()
+            retry_after = llm_scheduler.settle(model, cost["tokens"], response)
+            if response.status_code not in RETRY_STATUSES or attempt == LLM_MAX_RETRIES:
+                return response
+            response.close()
+            time.sleep(llm_scheduler.backoff(model, attempt, str(response.status_code), retry_after))
+        return response
+
+
+class AsyncScheduledTransport(httpx.AsyncHTTPTransport):
+    """httpx transport of the shared async LLM client: admission, budget feedback and retries"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        cost = _request_cost(request)
+        if cost is None:
+            return await super().handle_async_request(request)
+        model, priority = cost["model"], _llm_priority.get()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await llm_scheduler.aacquire(model, cost["tokens"], priority)
+            try:
+                response = await super().handle_async_request(request)
+            except httpx.TransportError as e:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(llm_scheduler.backoff(model, attempt, type(e).__name__))
+                continue
+            if "json" in response.headers.get("content-type", ""):
+                await response.aread()
+            retry_after = llm_scheduler.settle(model, cost["tokens"], response)
+            if response.status_code not in RETRY_STATUSES or attempt == LLM_MAX_RETRIES:
+                return response
+            await response.aclose()
+            await asyncio.sleep(llm_scheduler.backoff(model, attempt, str(response.status_code), retry_after))
+        return response
+
+
+# Create a global instance
+llm_scheduler = LLMScheduler()
+
+
+if __name__ == "__main__":
+    # Example usage: 3 requests/min budget, a background call queued behind an interactive one
+    scheduler = LLMScheduler(limits={"default": {"rpm": 3, "tpm": 100000}}, workers=1)
+
+    def call(name: str, priority: str):
+        start = time.monotonic()
+        scheduler.acquire("demo-model", 500, priority)
+        print(colored(f"{name:<12} ({priority}) admitted after {time.monotonic() - start:.1f}s", "cyan"))
+
+    for i in range(3):
+        call(f"warmup-{i}", "interactive")  # Drains the bucket
+    threads = [threading.Thread(target=call, args=("research", "background"))]
+    threads[0].start()
+    time.sleep(0.1)
+    threads.append(threading.Thread(target=call, args=("synthesis", "interactive")))
+    threads[1].start()
+    for thread in threads:
+        thread.join()  # synthesis is admitted ~20s in, research ~20s after it
+    print(scheduler.stats())
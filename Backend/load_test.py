@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Load Test for WealthLens
+Step load against /query (closed-loop users or open-loop arrival rates) with /health probing; reports saturation, queueing delay and error rate
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+import httpx
+from termcolor import colored
+
+from benchmark_replay import DEFAULT_QUERIES, percentile
+
+
+class StepResult:
+    def __init__(self):
+        self.latencies: List[float] = []  # Seconds, successful /query calls
+        self.queueing: List[float] = []  # Seconds spent outside the pipeline (client latency - server total)
+        self.health: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.sent = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, step: Dict[str, Any], wall: float) -> Dict[str, Any]:
+        ok = sorted(self.latencies) or [0.0]
+        queueing = sorted(self.queueing) or [0.0]
+        health = sorted(self.health) or [0.0]
+        failed = sum(self.errors.values())
+        return {
+            **step,
+            "sent": self.sent,
+            "completed": len(self.latencies),
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / wall, 3),
+            "p50_ms": round(percentile(ok, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(ok, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(ok, 0.99) * 1000, 1),
+            "queue_p50_ms": round(percentile(queueing, 0.50) * 1000, 1),
+            "queue_p95_ms": round(percentile(queueing, 0.95) * 1000, 1),
+            "health_p95_ms": round(percentile(health, 0.95) * 1000, 1),
+            "peak_inflight": self.peak_inflight,
+        }
+
+
+async def send_query(client: httpx.AsyncClient, result: StepResult, query: str, session_id: str, deep_search: bool):
+    result.sent += 1
+    result.inflight += 1
+    result.peak_inflight = max(result.peak_inflight, result.inflight)
+    start = time.perf_counter()
+    try:
+        response = await client.post("/query", json={
+            "query": query, "session_id": session_id, "deep_search": deep_search, "include_timings": True})
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            result.error(f"http_{response.status_code}")
+            return
+        result.latencies.append(elapsed)
+        server_ms = response.json().get("timings", {}).get("stages", {}).get("total")
+        if server_ms is not None:
+            result.queueing.append(max(elapsed - server_ms / 1000, 0.0))
+    except httpx.TimeoutException:
+        result.error("timeout")
+    except httpx.HTTPError as e:
+        result.error(type(e).__name__)
+    finally:
+        result.inflight -= 1
+
+
+async def probe_health(client: httpx.AsyncClient, result: StepResult, deadline: float, interval: float):
+    """/health does no work, so its latency is the server's own queueing (event loop lag, accept backlog)"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get("/health")
+            if response.status_code == 200:
+                result.health.append(time.perf_counter() - start)
+            else:
+                result.error("health_http_%d" % response.status_code)
+        except httpx.HTTPError:
+            result.error("health_failed")
+        await asyncio.sleep(interval)
+
+
+def pick_query(queries: List[str], n: int, unique: bool) -> str:
+    query = queries[n % len(queries)]
+    # A unique suffix keeps the semantic answer cache from turning the test into cache hits
+    return f"{query} (load test {n})" if unique else query
+
+
+async def closed_step(client, queries, users: int, duration: float, args) -> Dict[str, Any]:
+    """`users` clients, each sending its next query as soon as the previous answer arrives"""
+    result = StepResult()
+    deadline = time.perf_counter() + duration
+    counter = iter(range(10 ** 9))
+
+    async def user():
+        session_id = uuid.uuid4().hex
+        while time.perf_counter() < deadline:
+            await send_query(client, result, pick_query(queries, next(counter), args.unique), session_id, args.deep_search)
+
+    start = time.perf_counter()
+    await asyncio.gather(probe_health(client, result, deadline, args.health_interval), *(user() for _ in range(users)))
+    return result.report({"mode": "closed", "users": users}, time.perf_counter() - start)
+
+
+async def open_step(client, queries, rate: float, duration: float, args) -> Dict[str, Any]:
+    """Poisson arrivals at `rate` requests/s regardless of how fast answers come back"""
+    result = StepResult()
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + duration
+    tasks = []
+    n = 0
+    start = time.perf_counter()
+    prober = asyncio.create_task(probe_health(client, result, deadline, args.health_interval))
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(
+            send_query(client, result, pick_query(queries, n, args.unique), uuid.uuid4().hex, args.deep_search)))
+        n += 1
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(prober, *tasks)
+    return result.report({"mode": "open", "offered_rps": rate}, time.perf_counter() - start)
+
+
+def saturated(report: Dict[str, Any], previous: Optional[Dict[str, Any]], args) -> Optional[str]:
+    """Why this step is past the saturation point, or None"""
+    if report["error_rate"] > args.max_error_rate:
+        return f"error rate {report['error_rate']:.1%} > {args.max_error_rate:.1%}"
+    if args.slo_ms and report["p95_ms"] > args.slo_ms:
+        return f"p95 {report['p95_ms']:.0f} ms > SLO {args.slo_ms:.0f} ms"
+    if report["mode"] == "open" and report["throughput_rps"] < 0.9 * report["offered_rps"]:
+        return f"throughput {report['throughput_rps']} rps < 90% of offered {report['offered_rps']} rps"
+    if report["mode"] == "closed" and previous and report["throughput_rps"] < previous["throughput_rps"] * 1.05:
+        return f"throughput flat ({previous['throughput_rps']} -> {report['throughput_rps']} rps) while users grew"
+    return None
+
+
+async def run(args):
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = DEFAULT_QUERIES
+    steps = [float(s) for s in (args.rates if args.mode == "open" else args.levels).split(",")]
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        health = await client.get("/health")
+        print(colored(f"Target {args.url}: {health.json()}", "cyan"))
+        # Wait for warmup so the first step does not measure cold subsystems
+        for _ in range(int(args.warmup_wait)):
+            if health.json().get("subsystems", {}).get("warmup") != "running":
+                break
+            await asyncio.sleep(1)
+            health = await client.get("/health")
+
+        reports, previous, saturation = [], None, None
+        for step in steps:
+            if args.mode == "open":
+                report = await open_step(client, queries, step, args.duration, args)
+            else:
+                report = await closed_step(client, queries, int(step), args.duration, args)
+            reports.append(report)
+            print(json.dumps(report))
+            reason = saturated(report, previous, args)
+            if reason:
+                saturation = {"saturated_at": report.get("users", report.get("offered_rps")), "reason": reason,
+                              "last_good": previous and previous.get("users", previous.get("offered_rps")),
+                              "max_throughput_rps": max(r["throughput_rps"] for r in reports)}
+                if not args.keep_going:
+                    break
+            previous = report
+
+    if saturation:
+        print(colored(f"Saturation: {json.dumps(saturation)}", "yellow", attrs=["bold"]))
+    else:
+        print(colored(f"No saturation up to {steps[-1]:g}; peak throughput "
+                      f"{max(r['throughput_rps'] for r in reports)} rps", "green", attrs=["bold"]))
+    baseline = reports[0]["p50_ms"]
+    print(colored(f"p50 grew {baseline:.0f} -> {reports[-1]['p50_ms']:.0f} ms; "
+                  f"median queueing at the last step {reports[-1]['queue_p50_ms']:.0f} ms "
+                  f"(mean over steps {statistics.mean(r['queue_p50_ms'] for r in reports):.0f} ms)", "cyan"))
+    if args.output:
+        with open(args.output, "w") as f:
+            for report in reports:
+                f.write(json.dumps(report) + "\n")
+            f.write(json.dumps({"summary": saturation or {"saturated_at": None}}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the WealthLens /query endpoint (start mock_providers.py and the backend with "
+                    "MOCK_PROVIDERS_URL to keep real providers out of it)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64", help="Concurrent users per step (closed mode)")
+    parser.add_argument("--rates", default="0.5,1,2,4,8,16", help="Offered requests/s per step (open mode)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per step")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout, seconds")
+    parser.add_argument("--slo-ms", type=float, default=0, help="p95 latency beyond which a step counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument("--keep-going", action="store_true", help="Run every step even after saturation")
+    parser.add_argument("--health-interval", type=float, default=0.25)
+    parser.add_argument("--warmup-wait", type=float, default=60, help="Max seconds to wait for backend warmup")
+    parser.add_argument("--queries", help="Text file, one query per line")
+    parser.add_argument("--no-unique", dest="unique", action="store_false", help="Allow answer cache hits")
+    parser.add_argument("--deep-search", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write step reports as JSON lines")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
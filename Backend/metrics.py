@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Metrics for WealthLens
+Per-stage timing spans, provider latencies and LLM token counts,
+exposed as Prometheus text-format histograms/counters and as a per-request breakdown
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple, Iterable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+SIZE_BUCKETS = (500, 1000, 2500, 5000, 10000, 20000, 40000, 80000, 160000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels (Prometheus semantics)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            base = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            for bound, count in zip(self.buckets, series):
+                bucket_labels = ",".join(base + ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            inf_labels = ",".join(base + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{inf_labels}}} {series[-1]}")
+            label_str = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{label_str} {series[-2]}")
+            lines.append(f"{self.name}_count{label_str} {series[-1]}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            labels = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(self.labelnames, key))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return "\n".join(lines)
+
+
+class Gauge(Counter):
+    """Value that goes up and down (queue depths), with labels"""
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> str:
+        return super().render().replace(f"# TYPE {self.name} counter", f"# TYPE {self.name} gauge", 1)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# --- Registry ---
+stage_duration = Histogram(
+    "wealthlens_stage_duration_seconds", "Duration of query pipeline and deep research stages", ("stage",))
+provider_latency = Histogram(
+    "wealthlens_provider_latency_seconds", "Latency of external provider calls (search engines, market data)", ("provider",))
+llm_latency = Histogram(
+    "wealthlens_llm_request_duration_seconds", "Latency of LLM calls", ("model", "framework"))
+llm_tokens = Counter(
+    "wealthlens_llm_tokens_total", "LLM tokens consumed", ("model", "kind"))
+prompt_size = Histogram(
+    "wealthlens_synthesis_prompt_chars", "Size of the synthesis prompt in characters", (), SIZE_BUCKETS)
+llm_queue_depth = Gauge(
+    "wealthlens_llm_queue_depth", "LLM calls waiting for a rate-limit budget", ("model", "priority"))
+llm_queue_wait = Histogram(
+    "wealthlens_llm_queue_wait_seconds", "Time LLM calls waited for a rate-limit budget", ("model", "priority"))
+llm_retries = Counter(
+    "wealthlens_llm_retries_total", "LLM calls retried by the scheduler", ("model", "reason"))
+router_calls_saved = Counter(
+    "wealthlens_router_llm_calls_saved_total", "Classifier LLM calls the query router avoided", ("source",))
+router_latency_saved = Counter(
+    "wealthlens_router_latency_saved_seconds_total",
+    "Estimated latency the query router saved versus the sequential classifier calls", ("source",))
+
+REGISTRY = [stage_duration, provider_latency, llm_latency, llm_tokens, prompt_size,
+            llm_queue_depth, llm_queue_wait, llm_retries, router_calls_saved, router_latency_saved]
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of every registered metric"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# --- Per-request breakdown ---
+# The dict is shared by every context copied from the request (asyncio tasks,
+# run_blocking executor calls, deep research threads), so spans anywhere land in it.
+_request_timings: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def _new_breakdown() -> Dict[str, Any]:
+    return {"stages": {}, "providers": {},
+            "llm": {"calls": 0, "seconds": 0.0, "queue_seconds": 0.0, "input_tokens": 0, "output_tokens": 0},
+            "router": {"llm_calls_saved": 0, "latency_saved_ms": 0.0}}
+
+
+@contextmanager
+def request_timings():
+    """Collect a timing breakdown for everything run inside this block (including the total)"""
+    breakdown = _new_breakdown()
+    token = _request_timings.set(breakdown)
+    start = time.perf_counter()
+    try:
+        yield breakdown
+    finally:
+        elapsed = time.perf_counter() - start
+        breakdown["stages"]["total"] = round(elapsed * 1000, 1)
+        stage_duration.observe(elapsed, stage="total")
+        _request_timings.reset(token)
+
+
+def _add(section: str, name: str, seconds: float) -> None:
+    breakdown = _request_timings.get()
+    if breakdown is not None:
+        # Stages that repeat (deep research steps, parallel branches) accumulate
+        breakdown[section][name] = round(breakdown[section].get(name, 0.0) + seconds * 1000, 1)
+
+
+@contextmanager
+def stage_span(stage: str):
+    """Time a pipeline / deep research stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage)
+        _add("stages", stage, elapsed)
+
+
+@contextmanager
+def provider_span(provider: str):
+    """Time an external provider call"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        provider_latency.observe(elapsed, provider=provider)
+        _add("providers", provider, elapsed)
+
+
+def record_llm_call(model: str, framework: str, seconds: float, input_tokens: int = 0, output_tokens: int = 0) -> None:
+    """Record one LLM round trip"""
+    llm_latency.observe(seconds, model=model, framework=framework)
+    if input_tokens:
+        llm_tokens.inc(input_tokens, model=model, kind="input")
+    if output_tokens:
+        llm_tokens.inc(output_tokens, model=model, kind="output")
+    breakdown = _request_timings.get()
+    if breakdown is not None:
+        llm = breakdown["llm"]
+        llm["calls"] += 1
+        llm["seconds"] = round(llm["seconds"] + seconds, 3)
+        llm["input_tokens"] += input_tokens
+        llm["output_tokens"] += output_tokens
+
+
+def record_llm_queue_wait(model: str, priority: str, seconds: float) -> None:
+    """Record how long one LLM call waited in the scheduler queue"""
+    llm_queue_wait.observe(seconds, model=model, priority=priority)
+    breakdown = _request_timings.get()
+    if breakdown is not None:
+        llm = breakdown["llm"]
+        llm["queue_seconds"] = round(llm["queue_seconds"] + seconds, 3)
+
+
+def record_router_savings(source: str, calls_saved: int, seconds_saved: float) -> None:
+    """Record the classifier calls (and their estimated latency) one routing decision avoided"""
+    router_calls_saved.inc(calls_saved, source=source)
+    router_latency_saved.inc(seconds_saved, source=source)
+    breakdown = _request_timings.get()
+    if breakdown is not None:
+        router = breakdown["router"]
+        router["llm_calls_saved"] += calls_saved
+        router["latency_saved_ms"] = round(router["latency_saved_ms"] + seconds_saved * 1000, 1)
+
+
+def _sum_metric(value) -> int:
+    """Agno reports per-message metrics as lists; LangChain as ints"""
+    if isinstance(value, (list, tuple)):
+        return int(sum(v for v in value if isinstance(v, (int, float))))
+    return int(value) if isinstance(value, (int, float)) else 0
+
+
+def record_agno_run(model: str, seconds: float, run_response) -> None:
+    """Record an Agno agent run from its RunResponse (metrics dict with token lists)"""
+    metrics = getattr(run_response, "metrics", None) or {}
+    record_llm_call(
+        model, "agno", seconds,
+        input_tokens=_sum_metric(metrics.get("input_tokens", metrics.get("prompt_tokens", 0))),
+        output_tokens=_sum_metric(metrics.get("output_tokens", metrics.get("completion_tokens", 0))),
+    )
+
+
+@lru_cache(maxsize=None)
+def _llm_metrics_callback_class():
+    # langchain_core is imported on first LLM client build, not when metrics is imported
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsCallback(BaseCallbackHandler):
+        """LangChain callback timing every chat model call and counting its tokens"""
+
+        def __init__(self, model: str):
+            self.model = model
+            self._starts: Dict[Any, float] = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._starts[run_id] = time.perf_counter()
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._starts[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            start = self._starts.pop(run_id, None)
+            seconds = time.perf_counter() - start if start is not None else 0.0
+            usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+            if not usage:
+                # Fall back to usage_metadata on the generated message
+                for generations in getattr(response, "generations", []) or []:
+                    for generation in generations:
+                        meta = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                        input_tokens += meta.get("input_tokens", 0)
+                        output_tokens += meta.get("output_tokens", 0)
+            record_llm_call(self.model, "langchain", seconds, _sum_metric(input_tokens), _sum_metric(output_tokens))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            start = self._starts.pop(run_id, None)
+            if start is not None:
+                record_llm_call(self.model, "langchain", time.perf_counter() - start)
+
+    return LLMMetricsCallback
+
+
+def llm_metrics_callback(model: str):
+    """LangChain callback handler timing every chat model call of `model` and counting its tokens"""
+    return _llm_metrics_callback_class()(model)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Mock Providers for WealthLens
+Local stand-in for the Groq chat-completions, Tavily search and Yahoo Finance APIs with tunable latency and error rates
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from termcolor import colored
+
+from provider_replay import PROVIDERS, provider_for, parse_provider_values
+
+DEFAULT_PORT = 9100
+DEFAULT_LATENCY = {"llm": 0.8, "embeddings": 0.02, "tavily": 1.0, "yfinance": 0.25, "search": 0.5, "http": 0.2}
+EMBEDDING_DIM = 768  # nomic-embed-text, so mock vectors fit the existing Chroma collection
+
+_redirect_lock = threading.Lock()
+_redirected_to: Optional[str] = None
+
+
+class MockConfig:
+    """Latency (seconds), jitter and error rate per provider; changeable at runtime via /mock/config"""
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, error_rate: Optional[Dict[str, float]] = None,
+                 jitter: float = 0.2, seed: int = 7):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.error_rate = {provider: 0.0 for provider in PROVIDERS}
+        self.error_rate.update(error_rate or {})
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._inflight = 0
+        self._peak_inflight = 0
+
+    def update(self, data: Dict[str, Any]):
+        with self._lock:
+            self.latency.update(data.get("latency", {}))
+            self.error_rate.update(data.get("error_rate", {}))
+            self.jitter = data.get("jitter", self.jitter)
+
+    async def simulate(self, provider: str) -> Optional[int]:
+        """Sleep for the provider's latency; returns an HTTP error status to inject, or None"""
+        with self._lock:
+            delay = self.latency.get(provider, 0.0) * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.error_rate.get(provider, 0.0)
+            status = self._rng.choice((429, 500, 503)) if failed else None
+            self._stats[provider]["requests"] += 1
+            if status:
+                self._stats[provider][f"errors_{status}"] += 1
+            self._inflight += 1
+            self._peak_inflight = max(self._peak_inflight, self._inflight)
+        try:
+            await asyncio.sleep(max(delay, 0.0))
+        finally:
+            with self._lock:
+                self._inflight -= 1
+        return status
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"latency": dict(self.latency), "error_rate": dict(self.error_rate), "jitter": self.jitter,
+                    "inflight": self._inflight, "peak_inflight": self._peak_inflight,
+                    "requests": {provider: dict(counts) for provider, counts in self._stats.items()}}
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+
+
+def _price(symbol: str) -> float:
+    return round(50 + _seed(symbol) % 4000 + (_seed(symbol) % 100) / 100, 2)
+
+
+# --- Canned payloads ---
+
+def chat_completion_text(messages: List[Dict[str, Any]]) -> str:
+    """Plausible content for the prompts the pipeline sends: JSON when JSON is asked for, prose otherwise"""
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    lowered = prompt.lower()
+    if "json" in lowered:
+        if "subquestion" in lowered or "sub-question" in lowered:
+            return json.dumps({"subquestions": ["What is the latest price?", "What are the key risks?", "What do analysts expect?"]})
+        return json.dumps({"score": "yes", "small_talk": False, "needs_realtime": True, "intent": "market_data",
+                           "relevant": True})
+    if "yes or no" in lowered or "answer yes" in lowered:
+        return "YES"
+    return ("**Summary (mock provider)**\n\n- The requested instrument trades near its 52-week average.\n"
+            "- Volume is in line with the 30-day mean.\n- No material news in the last session.\n")
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    content = chat_completion_text(body.get("messages", []))
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4 + 1
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop",
+                     "logprobs": None}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+        "system_fingerprint": "mock",
+    }
+
+
+def chat_completion_chunks(completion: Dict[str, Any], words_per_chunk: int = 4):
+    """Server-sent events of a streamed completion, usage on the last chunk as Groq does (x_groq)"""
+    words = completion["choices"][0]["message"]["content"].split(" ")
+    base = {k: completion[k] for k in ("id", "created", "model", "system_fingerprint")}
+    base["object"] = "chat.completion.chunk"
+    for i in range(0, len(words), words_per_chunk):
+        delta = {"content": " ".join(words[i:i + words_per_chunk]) + " "}
+        if i == 0:
+            delta["role"] = "assistant"
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+    last = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"id": completion["id"], "usage": completion["usage"]}}
+    yield f"data: {json.dumps(last)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def tavily_search(body: Dict[str, Any]) -> Dict[str, Any]:
+    query = body.get("query", "")
+    results = [{
+        "title": f"{query} - market update {i + 1}",
+        "url": f"https://example.com/markets/{_seed(query + str(i)) % 100000}",
+        "content": f"Mock coverage of {query}: prices were steady, analysts kept their targets unchanged.",
+        "score": round(0.95 - i * 0.07, 2), "raw_content": None,
+    } for i in range(min(int(body.get("max_results", 5)), 10))]
+    return {"query": query, "answer": None, "images": [], "results": results,
+            "response_time": 0.0, "follow_up_questions": None}
+
+
+def yahoo_chart(symbol: str) -> Dict[str, Any]:
+    price = _price(symbol)
+    now = int(time.time()) // 86400 * 86400
+    timestamps = [now - 86400 * d for d in range(4, -1, -1)]
+    closes = [round(price * (1 + (d - 2) * 0.004), 2) for d in range(5)]
+    return {"chart": {"result": [{
+        "meta": {"currency": "USD", "symbol": symbol, "exchangeName": "MOCK", "instrumentType": "EQUITY",
+                 "regularMarketPrice": price, "chartPreviousClose": closes[-2], "previousClose": closes[-2],
+                 "regularMarketTime": timestamps[-1], "gmtoffset": 0, "timezone": "UTC",
+                 "exchangeTimezoneName": "UTC", "dataGranularity": "1d", "range": "5d",
+                 "validRanges": ["1d", "5d", "1mo", "3mo", "6mo", "1y"]},
+        "timestamp": timestamps,
+        "indicators": {"quote": [{"open": closes, "high": [c * 1.01 for c in closes], "low": [c * 0.99 for c in closes],
+                                  "close": closes, "volume": [1_000_000 + _seed(symbol) % 500_000] * 5}],
+                       "adjclose": [{"adjclose": closes}]},
+    }], "error": None}}
+
+
+def yahoo_quote(symbols: List[str]) -> Dict[str, Any]:
+    return {"quoteResponse": {"result": [{
+        "symbol": s, "shortName": f"{s} Mock Corp", "longName": f"{s} Mock Corporation", "currency": "USD",
+        "regularMarketPrice": _price(s), "regularMarketPreviousClose": round(_price(s) * 0.995, 2),
+        "regularMarketChangePercent": 0.5, "marketCap": _price(s) * 1e9, "trailingPE": 20 + _seed(s) % 15,
+        "quoteType": "EQUITY", "exchange": "MOCK",
+    } for s in symbols], "error": None}}
+
+
+def yahoo_quote_summary(symbol: str) -> Dict[str, Any]:
+    price = _price(symbol)
+
+    def raw(value):
+        return {"raw": value, "fmt": f"{value:,.2f}"}
+    return {"quoteSummary": {"result": [{
+        "price": {"symbol": symbol, "shortName": f"{symbol} Mock Corp", "longName": f"{symbol} Mock Corporation",
+                  "currency": "USD", "regularMarketPrice": raw(price), "regularMarketPreviousClose": raw(price * 0.995),
+                  "marketCap": raw(price * 1e9), "quoteType": "EQUITY"},
+        "summaryDetail": {"previousClose": raw(price * 0.995), "trailingPE": raw(20 + _seed(symbol) % 15),
+                          "fiftyTwoWeekHigh": raw(price * 1.2), "fiftyTwoWeekLow": raw(price * 0.8)},
+        "assetProfile": {"sector": "Technology", "industry": "Software", "country": "United States",
+                         "longBusinessSummary": f"{symbol} Mock Corporation is a stand-in used for load testing."},
+        "financialData": {"currentPrice": raw(price), "recommendationKey": "hold"},
+    }], "error": None}}
+
+
+def search_page(query: str) -> str:
+    items = "".join(
+        f'<div class="result"><a class="result__a" href="https://example.com/{i}">{query} result {i}</a>'
+        f'<a class="result__snippet">Mock snippet {i} about {query}.</a></div>'
+        for i in range(5)
+    )
+    return f"<html><body>{items}</body></html>"
+
+
+def create_mock_app(config: MockConfig):
+    """FastAPI app serving every provider under /<provider>/... (see install_redirect)"""
+    from fastapi import FastAPI, Request
+    from starlette.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
+
+    app = FastAPI(title="WealthLens Mock Providers")
+
+    def error_response(status: int):
+        headers = {"retry-after": "1"} if status == 429 else {}
+        return JSONResponse({"error": {"message": f"Injected {status} from mock provider", "type": "mock_error"}},
+                            status_code=status, headers=headers)
+
+    @app.post("/llm/openai/v1/chat/completions")
+    async def groq_chat_completions(request: Request):
+        body = await request.json()
+        status = await config.simulate("llm")
+        if status:
+            return error_response(status)
+        completion = chat_completion(body)
+        if body.get("stream"):
+            return StreamingResponse(chat_completion_chunks(completion), media_type="text/event-stream")
+        return completion
+
+    @app.post("/tavily/search")
+    async def tavily(request: Request):
+        body = await request.json()
+        status = await config.simulate("tavily")
+        return error_response(status) if status else tavily_search(body)
+
+    @app.post("/embeddings/api/embed")
+    async def ollama_embed(request: Request):
+        body = await request.json()
+        status = await config.simulate("embeddings")
+        if status:
+            return error_response(status)
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        vectors = []
+        for text in inputs:
+            rng = random.Random(_seed(text))
+            vectors.append([rng.uniform(-1, 1) for _ in range(EMBEDDING_DIM)])
+        return {"model": body.get("model", "mock"), "embeddings": vectors}
+
+    @app.get("/yfinance/{path:path}")
+    async def yahoo(path: str, request: Request):
+        status = await config.simulate("yfinance")
+        if status:
+            return error_response(status)
+        if "getcrumb" in path:
+            return PlainTextResponse("mockcrumb")
+        parts = path.strip("/").split("/")
+        if "chart" in parts:
+            return yahoo_chart(parts[-1])
+        if "quoteSummary" in parts:
+            return yahoo_quote_summary(parts[-1])
+        if "quote" in parts:
+            return yahoo_quote(request.query_params.get("symbols", "").split(","))
+        return PlainTextResponse("")  # Cookie / consent pages
+
+    @app.api_route("/search/{path:path}", methods=["GET", "POST"])
+    async def search_engine(path: str, request: Request):
+        status = await config.simulate("search")
+        return error_response(status) if status else HTMLResponse(search_page(request.query_params.get("q", "")))
+
+    @app.get("/mock/config")
+    async def get_config():
+        return config.snapshot()
+
+    @app.post("/mock/config")
+    async def set_config(request: Request):
+        config.update(await request.json())
+        return config.snapshot()
+
+    return app
+
+
+# --- Client-side redirection (runs inside the backend under test) ---
+
+def redirect_url(url: str, base_url: str) -> str:
+    """https://api.groq.com/openai/v1/... -> <base_url>/llm/openai/v1/...; unknown hosts are left alone"""
+    provider = provider_for(url)
+    if provider == "http":
+        return url
+    parts = urlsplit(url)
+    base = urlsplit(base_url)
+    return urlunsplit((base.scheme, base.netloc, f"/{provider}{parts.path}", parts.query, ""))
+
+
+def install_redirect(base_url: str):
+    """Send every Groq / Tavily / Yahoo / search-engine / Ollama request of this process to the mock server"""
+    global _redirected_to
+    import httpx
+    import requests
+
+    with _redirect_lock:
+        if _redirected_to is not None:
+            return  # Already patched (create_app called twice)
+        _redirected_to = base_url
+
+    original_send = httpx.Client.send
+    original_asend = httpx.AsyncClient.send
+    original_requests_send = requests.Session.send
+
+    def rewrite(request):
+        url = redirect_url(str(request.url), base_url)
+        if url != str(request.url):
+            request.url = httpx.URL(url)
+            request.headers["Host"] = request.url.netloc.decode()
+        return request
+
+    def send(client, request, **kwargs):
+        return original_send(client, rewrite(request), **kwargs)
+
+    async def asend(client, request, **kwargs):
+        return await original_asend(client, rewrite(request), **kwargs)
+
+    def requests_send(session, request, **kwargs):
+        request.url = redirect_url(request.url, base_url)
+        return original_requests_send(session, request, **kwargs)
+
+    httpx.Client.send = send
+    httpx.AsyncClient.send = asend
+    requests.Session.send = requests_send
+
+    try:  # Newer yfinance talks to Yahoo through curl_cffi
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        curl_requests = None
+    if curl_requests is not None:
+        original_curl_request = curl_requests.Session.request
+
+        def curl_request(session, method, url, *args, **kwargs):
+            return original_curl_request(session, method, redirect_url(url, base_url), *args, **kwargs)
+        curl_requests.Session.request = curl_request
+
+    print(colored(f"Provider calls redirected to mock server {base_url}", "yellow"))
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve mock Groq, Tavily, Yahoo and search-engine APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="", help="Seconds per provider, e.g. llm=1.2,tavily=0.8,yfinance=0.3")
+    parser.add_argument("--error-rate", default="", help="Failure fraction per provider, e.g. llm=0.02,tavily=0.05")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of random latency jitter")
+    args = parser.parse_args()
+
+    config = MockConfig(parse_provider_values(args.latency), parse_provider_values(args.error_rate), args.jitter)
+    print(colored(f"Mock providers on http://{args.host}:{args.port} "
+                  f"(start the backend with MOCK_PROVIDERS_URL=http://{args.host}:{args.port})", "cyan"))
+    print(colored(json.dumps(config.snapshot()), "cyan"))
+    uvicorn.run(create_mock_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os 
 from langchain_ollama import OllamaEmbeddings, ChatOllama
+from embedding_cache import cached_embeddings
+from vars import ENABLE_EMBEDDING_CACHE
 #  from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
 class Models:
     def __init__(self):
@@ -7,6 +9,9 @@ class Models:
         self.embeddings_ollama = OllamaEmbeddings(
             model="nomic-embed-text"
         )
+        if ENABLE_EMBEDDING_CACHE:
+            # Shared, persistent cache: repeated queries and re-ingested chunks skip the model
+            self.embeddings_ollama = cached_embeddings(self.embeddings_ollama, "nomic-embed-text")
         #ollama pull llama3.2
         self.model_ollama = ChatOllama(
             model="llama3.2:latest",
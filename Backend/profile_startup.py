@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Startup Profiler for WealthLens
+Import-time breakdown of run.py and time until the app answers /health
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+from termcolor import colored
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every import, from `python -X importtime` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    if result.returncode != 0:
+        print(colored(f"import {module} failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}", "red"))
+    return rows
+
+
+def time_to_health() -> Tuple[float, float]:
+    """Seconds to import run.py and build the app, then to serve the first /health response"""
+    from fastapi.testclient import TestClient
+
+    start = time.perf_counter()
+    import run
+    imported = time.perf_counter() - start
+    # Entering the client runs the lifespan, which starts the background warmup
+    with TestClient(run.create_app()) as client:
+        response = client.get("/health")
+        response.raise_for_status()
+        first_health = time.perf_counter() - start
+        print(colored(f"/health: {response.json()['subsystems']}", "cyan"))
+    return imported, first_health
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile WealthLens backend startup")
+    parser.add_argument("--module", default="run")
+    parser.add_argument("--top", type=int, default=25, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    if rows:
+        print(colored(f"Slowest imports under {args.module} (cumulative):", "cyan"))
+        for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+            print(f"  {cumulative_us / 1000:9.1f} ms  (self {self_us / 1000:7.1f} ms)  {name}")
+        top_level = next((r for r in rows if r[0] == args.module), None)
+        if top_level:
+            print(colored(f"Total import time of {args.module}: {top_level[2] / 1000:.1f} ms", "green"))
+
+    if args.module == "run":
+        imported, first_health = time_to_health()
+        print(colored(f"Imported in {imported:.2f}s, first /health after {first_health:.2f}s", "green"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Provider Replay for WealthLens
+Record LLM, Tavily, yfinance and search-engine responses to a fixture file once, replay them offline with injected latency
+"""
+
+import asyncio
+import base64
+import hashlib
+import ipaddress
+import itertools
+import json
+import os
+import pickle
+import random
+import re
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from termcolor import colored
+
+DEFAULT_FIXTURES_PATH = "./fixtures/provider_replay.json"
+
+# Host suffix -> provider class, used for latency injection and the per-provider report
+PROVIDER_HOSTS = (
+    ("api.groq.com", "llm"),
+    ("localhost:11434", "embeddings"),  # Ollama
+    ("127.0.0.1:11434", "embeddings"),
+    ("api.tavily.com", "tavily"),
+    ("yahoo.com", "yfinance"),
+    ("google.com", "search"),
+    ("bing.com", "search"),
+    ("duckduckgo.com", "search"),
+)
+PROVIDERS = ("llm", "embeddings", "tavily", "yfinance", "search", "http")
+
+# Never written to fixtures
+SECRET_FIELDS = frozenset({"api_key", "apikey", "key", "token", "access_token", "crumb"})
+# Dropped from stored response headers: the body is stored decoded and whole
+HOP_HEADERS = frozenset({"content-encoding", "transfer-encoding", "content-length", "connection", "set-cookie"})
+DIGITS = re.compile(r"\d+")
+WHITESPACE = re.compile(r"\s+")
+
+
+class ReplayMiss(ConnectionError):
+    """A request with no recorded response; surfaces like a network failure to the caller"""
+
+
+def provider_for(url: str) -> str:
+    netloc = urlsplit(url).netloc.lower()
+    for suffix, provider in PROVIDER_HOSTS:
+        if netloc.endswith(suffix):
+            return provider
+    return "http"
+
+
+def _normalize_url(url: str) -> Tuple[str, str]:
+    """(url without secrets, method-less endpoint host+path)"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_FIELDS]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query)))), parts.netloc + parts.path
+
+
+def _normalize_body(body: Optional[bytes]) -> str:
+    if not body:
+        return ""
+    text = body.decode("utf-8", errors="replace")
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k.lower() not in SECRET_FIELDS}
+    return json.dumps(data, sort_keys=True)
+
+
+def _request_keys(method: str, url: str, body: Optional[bytes]) -> Tuple[str, str, str, str]:
+    """(exact key, fuzzy key, endpoint, url without secrets). Fuzzy ignores digits (dates, timestamps) and spacing."""
+    clean_url, endpoint = _normalize_url(url)
+    normalized = f"{method.upper()} {clean_url}\n{_normalize_body(body)}"
+    fuzzy = WHITESPACE.sub(" ", DIGITS.sub("0", normalized))
+    return (hashlib.sha256(normalized.encode()).hexdigest(), hashlib.sha256(fuzzy.encode()).hexdigest(),
+            f"{method.upper()} {endpoint}", clean_url)
+
+
+def _encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(body).decode()}
+
+
+def _decode_body(stored: Dict[str, str]) -> bytes:
+    return stored["text"].encode("utf-8") if "text" in stored else base64.b64decode(stored["b64"])
+
+
+FAST_INFO_FIELDS = ("last_price", "previous_close", "open", "day_high", "day_low", "last_volume",
+                    "market_cap", "currency", "exchange", "year_high", "year_low")
+
+
+class FastInfoSnapshot(dict):
+    """Recorded Ticker.fast_info: attribute and key access like the real object"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _encode_value(name: str, value: Any) -> Dict[str, Any]:
+    if name == "fast_info":
+        snapshot = {}
+        for field in FAST_INFO_FIELDS:
+            try:
+                snapshot[field] = getattr(value, field)
+            except Exception:
+                snapshot[field] = None
+        return {"kind": "fast_info", "data": snapshot}
+    try:
+        return {"kind": "json", "data": json.loads(json.dumps(value))}
+    except (TypeError, ValueError):
+        # DataFrames (history, download, recommendations): pickled, so only replay fixtures you recorded
+        return {"kind": "pickle", "data": base64.b64encode(pickle.dumps(value)).decode()}
+
+
+def _decode_value(stored: Dict[str, Any]) -> Any:
+    if stored["kind"] == "fast_info":
+        return FastInfoSnapshot(stored["data"])
+    if stored["kind"] == "pickle":
+        return pickle.loads(base64.b64decode(stored["data"]))
+    return stored["data"]
+
+
+class ProviderReplay:
+    """
+    Patches the provider boundaries process-wide: httpx Client/AsyncClient.send (Groq SDK,
+    Ollama, async search engines), requests.Session.send (Tavily, scrapers, yfinance on
+    requests) and yfinance.Ticker / yfinance.download (yfinance on curl_cffi).
+
+    record: real calls go out and every response is stored with its latency.
+    replay: responses come from the fixtures, matched exactly, then ignoring digits and spacing
+    (dates in prompts), then round-robin over the same endpoint. Each one is delayed by its
+    recorded latency or the configured per-provider latency. Outbound sockets are blocked so
+    nothing leaks to the network.
+    """
+
+    def __init__(self, path: str = DEFAULT_FIXTURES_PATH, mode: str = "replay",
+                 latency: Optional[Dict[str, float]] = None, latency_scale: float = 1.0,
+                 jitter: float = 0.0, seed: int = 7):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.latency = latency  # None: use each fixture's recorded latency
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._http: List[Dict[str, Any]] = []
+        self._yfinance: List[Dict[str, Any]] = []
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._originals: Dict[str, Any] = {}
+        self._cycles: Dict[Tuple[str, str], Any] = {}
+        if mode == "replay":
+            self._load()
+
+    # --- fixtures ---
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No fixtures at {self.path}: record them first (benchmark_replay.py --record)")
+        self._http = data.get("http", [])
+        self._yfinance = data.get("yfinance", [])
+        self._index: Dict[str, Dict[str, List[Dict[str, Any]]]] = {"exact": {}, "fuzzy": {}, "endpoint": {}}
+        for entry in self._http:
+            for level in ("exact", "fuzzy", "endpoint"):
+                self._index[level].setdefault(entry[level], []).append(entry)
+        self._yf_index: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in self._yfinance:
+            self._yf_index.setdefault(entry["key"], []).append(entry)
+        print(colored(f"Loaded {len(self._http)} HTTP and {len(self._yfinance)} yfinance fixtures from {self.path}", "cyan"))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            data = {"version": 1, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "http": self._http, "yfinance": self._yfinance}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        print(colored(f"Saved {len(self._http)} HTTP and {len(self._yfinance)} yfinance fixtures to {self.path}", "green"))
+
+    def _next(self, level: str, key: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Identical requests recorded several times replay their responses in turn"""
+        with self._lock:
+            cycle = self._cycles.get((level, key))
+            if cycle is None:
+                cycle = self._cycles[(level, key)] = itertools.cycle(entries)
+            return next(cycle)
+
+    def _match_http(self, method: str, url: str, body: Optional[bytes]) -> Tuple[str, Dict[str, Any]]:
+        exact, fuzzy, endpoint, _ = _request_keys(method, url, body)
+        provider = provider_for(url)
+        for level, key in (("exact", exact), ("fuzzy", fuzzy), ("endpoint", endpoint)):
+            entries = self._index[level].get(key)
+            if entries:
+                self._count(provider, level)
+                return provider, self._next(level, key, entries)
+        self._count(provider, "miss")
+        raise ReplayMiss(f"No recorded response for {method} {_normalize_url(url)[0]}")
+
+    def _record_http(self, method: str, url: str, body: Optional[bytes], status: int,
+                     headers: List[Tuple[str, str]], content: bytes, elapsed: float):
+        exact, fuzzy, endpoint, clean_url = _request_keys(method, url, body)
+        provider = provider_for(url)
+        entry = {
+            "provider": provider, "method": method.upper(), "url": clean_url,
+            "exact": exact, "fuzzy": fuzzy, "endpoint": endpoint,
+            "status": status, "headers": [[k, v] for k, v in headers if k.lower() not in HOP_HEADERS],
+            "body": _encode_body(content), "elapsed": round(elapsed, 4),
+        }
+        with self._lock:
+            self._http.append(entry)
+        self._count(provider, "recorded")
+
+    def _count(self, provider: str, outcome: str):
+        with self._lock:
+            self._stats[provider][outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {provider: dict(counts) for provider, counts in self._stats.items()}
+
+    # --- latency ---
+
+    def delay_for(self, provider: str, entry: Dict[str, Any]) -> float:
+        base = entry.get("elapsed", 0.0) if self.latency is None else self.latency.get(provider, 0.0)
+        if self.jitter:
+            with self._lock:
+                base *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(base * self.latency_scale, 0.0)
+
+    # --- install / uninstall ---
+
+    def install(self):
+        import httpx
+        import requests
+        replay = self
+
+        original_send = self._originals["httpx.send"] = httpx.Client.send
+        original_asend = self._originals["httpx.asend"] = httpx.AsyncClient.send
+        original_requests_send = self._originals["requests.send"] = requests.Session.send
+
+        def httpx_response(entry, request):
+            return httpx.Response(entry["status"], headers=entry["headers"], content=_decode_body(entry["body"]), request=request)
+
+        def send(client, request, **kwargs):
+            body = request.read()
+            if replay.mode == "replay":
+                provider, entry = replay._match_http(request.method, str(request.url), body)
+                time.sleep(replay.delay_for(provider, entry))
+                return httpx_response(entry, request)
+            start = time.perf_counter()
+            response = original_send(client, request, **kwargs)
+            response.read()
+            replay._record_http(request.method, str(request.url), body, response.status_code,
+                                list(response.headers.items()), response.content, time.perf_counter() - start)
+            return response
+
+        async def asend(client, request, **kwargs):
+            body = await request.aread()
+            if replay.mode == "replay":
+                provider, entry = replay._match_http(request.method, str(request.url), body)
+                await asyncio.sleep(replay.delay_for(provider, entry))
+                return httpx_response(entry, request)
+            start = time.perf_counter()
+            response = await original_asend(client, request, **kwargs)
+            await response.aread()
+            replay._record_http(request.method, str(request.url), body, response.status_code,
+                                list(response.headers.items()), response.content, time.perf_counter() - start)
+            return response
+
+        def requests_send(session, request, **kwargs):
+            body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+            if replay.mode == "replay":
+                try:
+                    provider, entry = replay._match_http(request.method, request.url, body)
+                except ReplayMiss as e:
+                    raise requests.ConnectionError(str(e), request=request)
+                time.sleep(replay.delay_for(provider, entry))
+                response = requests.Response()
+                response.status_code = entry["status"]
+                response.headers = requests.structures.CaseInsensitiveDict(entry["headers"])
+                response._content = _decode_body(entry["body"])
+                response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+                response.url = request.url
+                response.request = request
+                response.reason = "Replayed"
+                return response
+            start = time.perf_counter()
+            response = original_requests_send(session, request, **kwargs)
+            replay._record_http(request.method, request.url, body, response.status_code,
+                                list(response.headers.items()), response.content, time.perf_counter() - start)
+            return response
+
+        httpx.Client.send = send
+        httpx.AsyncClient.send = asend
+        requests.Session.send = requests_send
+        self._install_yfinance()
+        if self.mode == "replay":
+            self._block_network()
+        print(colored(f"Provider {self.mode} installed", "cyan"))
+
+    def uninstall(self):
+        import httpx
+        import requests
+        httpx.Client.send = self._originals.pop("httpx.send", httpx.Client.send)
+        httpx.AsyncClient.send = self._originals.pop("httpx.asend", httpx.AsyncClient.send)
+        requests.Session.send = self._originals.pop("requests.send", requests.Session.send)
+        if "socket.connect" in self._originals:
+            socket.socket.connect = self._originals.pop("socket.connect")
+            socket.socket.connect_ex = self._originals.pop("socket.connect_ex")
+        if "yf.Ticker" in self._originals:
+            import yfinance as yf
+            yf.Ticker = self._originals.pop("yf.Ticker")
+            yf.download = self._originals.pop("yf.download")
+
+    def _block_network(self):
+        replay = self
+        original_connect = self._originals["socket.connect"] = socket.socket.connect
+        original_connect_ex = self._originals["socket.connect_ex"] = socket.socket.connect_ex
+
+        def check(sock, address):
+            if sock.family not in (socket.AF_INET, socket.AF_INET6):
+                return
+            host = address[0]
+            try:
+                loopback = ipaddress.ip_address(host).is_loopback
+            except ValueError:
+                loopback = host == "localhost"
+            if not loopback:
+                replay._count("network", "blocked")
+                raise ReplayMiss(f"Network access blocked during replay: {host}")
+
+        def connect(sock, address):
+            check(sock, address)
+            return original_connect(sock, address)
+
+        def connect_ex(sock, address):
+            check(sock, address)
+            return original_connect_ex(sock, address)
+
+        socket.socket.connect = connect
+        socket.socket.connect_ex = connect_ex
+
+    # --- yfinance ---
+
+    def _yf_record(self, key: str, name: str, value: Any, elapsed: float):
+        entry = {"key": key, "value": _encode_value(name, value), "elapsed": round(elapsed, 4)}
+        with self._lock:
+            self._yfinance.append(entry)
+        self._count("yfinance", "recorded")
+
+    def _yf_replay(self, key: str) -> Any:
+        entries = self._yf_index.get(key)
+        if not entries:
+            self._count("yfinance", "miss")
+            raise ReplayMiss(f"No recorded yfinance response for {key}")
+        self._count("yfinance", "exact")
+        entry = self._next("yfinance", key, entries)
+        time.sleep(self.delay_for("yfinance", entry))
+        return _decode_value(entry["value"])
+
+    def _install_yfinance(self):
+        try:
+            import yfinance as yf
+        except ImportError:
+            return
+        replay = self
+        real_ticker = self._originals["yf.Ticker"] = yf.Ticker
+        real_download = self._originals["yf.download"] = yf.download
+
+        def call_key(prefix: str, args, kwargs) -> str:
+            return prefix + json.dumps([list(args), kwargs], sort_keys=True, default=str)
+
+        class RecordingTicker:
+            def __init__(self, ticker, *args, **kwargs):
+                self.ticker = ticker
+                self._real = real_ticker(ticker, *args, **kwargs)
+
+            def __getattr__(self, name):
+                prefix = f"Ticker({self.ticker}).{name}"
+                start = time.perf_counter()
+                value = getattr(self._real, name)
+                if not callable(value):
+                    replay._yf_record(prefix, name, value, time.perf_counter() - start)
+                    return value
+
+                def call(*args, **kwargs):
+                    call_start = time.perf_counter()
+                    result = value(*args, **kwargs)
+                    replay._yf_record(call_key(prefix, args, kwargs), name, result, time.perf_counter() - call_start)
+                    return result
+                return call
+
+        class ReplayTicker:
+            def __init__(self, ticker, *args, **kwargs):
+                self.ticker = ticker
+
+            def __getattr__(self, name):
+                prefix = f"Ticker({self.ticker}).{name}"
+                if any(key.startswith(prefix + "[") for key in replay._yf_index):
+                    return lambda *args, **kwargs: replay._yf_replay(call_key(prefix, args, kwargs))
+                return replay._yf_replay(prefix)
+
+        def download(*args, **kwargs):
+            key = call_key("download", args, kwargs)
+            if replay.mode == "replay":
+                return replay._yf_replay(key)
+            start = time.perf_counter()
+            result = real_download(*args, **kwargs)
+            replay._yf_record(key, "download", result, time.perf_counter() - start)
+            return result
+
+        yf.Ticker = ReplayTicker if self.mode == "replay" else RecordingTicker
+        yf.download = download
+
+
+def parse_provider_values(spec: str) -> Dict[str, float]:
+    """"llm=0.8,tavily=1.2" -> {"llm": 0.8, "tavily": 1.2}"""
+    values = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        provider, _, value = part.partition("=")
+        if provider.strip() not in PROVIDERS:
+            raise ValueError(f"Unknown provider {provider!r}, expected one of {PROVIDERS}")
+        values[provider.strip()] = float(value)
+    return values
+
+
+def parse_latency(spec: str) -> Optional[Dict[str, float]]:
+    """"recorded" -> None (use recorded latencies), else seconds per provider"""
+    if not spec or spec == "recorded":
+        return None
+    return parse_provider_values(spec)
+
+
+if __name__ == "__main__":
+    # Example usage: record one Groq-free request, then replay it offline
+    import requests
+
+    recorder = ProviderReplay(path="./fixtures/example_replay.json", mode="record")
+    recorder.install()
+    live = requests.get("https://duckduckgo.com/html/?q=nifty+50", timeout=10)
+    recorder.uninstall()
+    recorder.save()
+
+    player = ProviderReplay(path="./fixtures/example_replay.json", mode="replay", latency={"search": 0.25})
+    player.install()
+    start = time.perf_counter()
+    replayed = requests.get("https://duckduckgo.com/html/?q=nifty+50", timeout=10)
+    player.uninstall()
+    print(live.status_code, replayed.status_code, replayed.content == live.content,
+          f"{time.perf_counter() - start:.2f}s", player.stats())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Query Router for WealthLens
+Decides small talk, real-time need and intent for a query in a single step:
+a local keyword/regex pre-classifier for obvious cases, one structured LLM call otherwise
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from langchain.prompts import PromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+from termcolor import colored
+
+from metrics import record_router_savings
+from vars import get_llm_id, get_llm_provider, ENABLE_LOCAL_ROUTER, ROUTER_LLM_LATENCY_PRIOR
+
+INTENTS = ["small_talk", "market_data", "news", "concept", "advice", "research", "other"]
+
+# Whole-message greetings / pleasantries / filler
+SMALL_TALK_PATTERN = re.compile(
+    r"^\s*(hi+|hello+|hey+|hiya|yo|namaste|good\s+(morning|afternoon|evening|night)|"
+    r"thanks?( you)?( so much| a lot)?|thank u|thx|ty|ok(ay)?|cool|great|nice|got it|"
+    r"bye|goodbye|see you|how are you( doing)?|who are you|what can you do|"
+    r"what is your name|what's your name)\s*(there|buddy|bot)?\s*[!.?]*\s*$",
+    re.IGNORECASE,
+)
+
+# Markers of current / time-sensitive information
+REALTIME_PATTERN = re.compile(
+    r"\b(today|tonight|latest|live|real[- ]?time|breaking|"
+    r"this (week|month|morning)|yesterday|recent(ly)?|price of|share price|stock price|"
+    r"trading at|news|headlines|sensex|nifty|nasdaq|dow jones|s&p)\b",
+    re.IGNORECASE,
+)
+# "current" / "now" only ask for live data next to a price word ("current price", "trading now")
+# or a ticker (see TICKER_PATTERN); "current ratio" and "current account deficit" are concepts
+NOW_PATTERN = re.compile(r"\b(current(ly)?|now)\b", re.IGNORECASE)
+LIVE_PRICE_PATTERN = re.compile(
+    r"\b(current(ly)?|now)\s+(\w+\s+)?(price|quote|rate|value|level|nav|market\s+cap|trading|valuation)s?\b|"
+    r"\b(price|quote|rate|value|level|nav|trading|valued)s?\s+(\w+\s+){0,2}(now|currently)\b",
+    re.IGNORECASE,
+)
+NEWS_PATTERN = re.compile(r"\b(news|headlines|breaking|announce(d|ment)?|latest)\b", re.IGNORECASE)
+
+# Evergreen "explain a concept" questions
+CONCEPT_PATTERN = re.compile(
+    r"^\s*(what\s+(is|are|does)|what's|explain|define|definition of|meaning of|"
+    r"how\s+(does|do|is)|difference between|why\s+(is|are|do|does))\b",
+    re.IGNORECASE,
+)
+
+# Signals that a "what is ..." question asks for a company's figures, not a definition
+# TCS, INFY.NS, $AAPL, Reliance's - but not the acronyms of the concepts themselves (ETF, SIP, ...)
+TICKER_PATTERN = re.compile(
+    r"\$[A-Za-z]{1,5}\b|\b[A-Z][\w&.-]*'s\b|"
+    r"\b(?!(ETF|IRA|SIP|IPO|GDP|EMI|PPF|NPS|ELSS|REIT|CAGR|ROI|ROE|APR|APY|FD|MF)s?\b)[A-Z]{2,5}(\.(NS|BO))?\b"
+)
+METRIC_PATTERN = re.compile(
+    r"\b(market\s+cap(italization|italisation)?|m-?cap|price|valuation|p/?e|pe\s+ratio|eps|revenue|sales|"
+    r"profit|net\s+income|dividend|yield|52[- ]week|volume|nav|returns?|earnings|debt|shares?|stock)\b",
+    re.IGNORECASE,
+)
+
+router_prompt = PromptTemplate(
+    template="""You are routing a user message for a financial assistant. Classify it in one step.
+
+    Return ONLY a JSON object with exactly these keys:
+    - "small_talk": true if the message is a greeting, pleasantry, thanks or conversational filler, else false
+    - "needs_realtime": true if answering needs CURRENT, up-to-the-minute information (stock prices, breaking news, live market status), else false
+    - "intent": one of {intents}
+
+    Message: {question}""",
+    input_variables=["question"],
+    partial_variables={"intents": ", ".join(INTENTS)},
+)
+
+
+class QueryRouter:
+    """Single-call query router with a local pre-classifier and latency accounting"""
+
+    def __init__(self, llm=None, enable_local: bool = ENABLE_LOCAL_ROUTER):
+        self.llm = llm or get_llm_provider(get_llm_id("remote"), framework="langchain")
+        self.chain = router_prompt | self.llm | JsonOutputParser()
+        self.enable_local = enable_local
+        self._lock = threading.Lock()
+        self._avg_llm_latency = None # EWMA of classifier round trips, seconds
+        self._stats = {"requests": 0, "local": 0, "llm": 0, "errors": 0, "llm_calls_saved": 0, "latency_saved": 0.0}
+
+    def pre_classify(self, query: str) -> Optional[Dict[str, Any]]:
+        """Classify obvious queries locally. Returns None when the LLM should decide."""
+        text = query.strip()
+        if not text:
+            return None
+
+        if SMALL_TALK_PATTERN.match(text):
+            return {"small_talk": True, "needs_realtime": False, "intent": "small_talk"}
+
+        live_price = LIVE_PRICE_PATTERN.search(text) or (NOW_PATTERN.search(text) and TICKER_PATTERN.search(text))
+        if REALTIME_PATTERN.search(text) or live_price:
+            intent = "news" if NEWS_PATTERN.search(text) else "market_data"
+            return {"small_talk": False, "needs_realtime": True, "intent": intent}
+
+        concept = CONCEPT_PATTERN.match(text)
+        if concept:
+            subject = text[concept.end():]
+            has_ticker, has_metric = TICKER_PATTERN.search(subject), METRIC_PATTERN.search(subject)
+            if has_ticker and has_metric:
+                # "What is Reliance's market cap" is a data question dressed as a definition
+                return {"small_talk": False, "needs_realtime": True, "intent": "market_data"}
+            if not has_ticker and not has_metric:
+                return {"small_talk": False, "needs_realtime": False, "intent": "concept"}
+            # "What is a P/E ratio" vs "what is the dividend of Infosys": the LLM decides
+
+        return None
+
+    def _normalize(self, raw: Any) -> Dict[str, Any]:
+        """Coerce an LLM JSON answer into a routing decision (safe defaults on bad output)"""
+        def as_bool(value, default):
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, str):
+                return value.strip().lower() in ("true", "yes", "1")
+            if isinstance(value, (int, float)):
+                return bool(value)
+            return default
+
+        if not isinstance(raw, dict):
+            raise ValueError(f"Router did not return a JSON object: {raw!r}")
+        intent = str(raw.get("intent", "other")).strip().lower()
+        return {
+            # Same defaults as the old separate checks: not small talk, real-time needed
+            "small_talk": as_bool(raw.get("small_talk"), False),
+            "needs_realtime": as_bool(raw.get("needs_realtime"), True),
+            "intent": intent if intent in INTENTS else "other",
+        }
+
+    def _account(self, decision: Dict[str, Any], llm_calls: int, llm_latency: Optional[float]) -> Dict[str, Any]:
+        """Record stats and estimate the latency saved versus the old sequential classifiers"""
+        with self._lock:
+            if llm_latency is not None:
+                self._avg_llm_latency = llm_latency if self._avg_llm_latency is None else 0.8 * self._avg_llm_latency + 0.2 * llm_latency
+            per_call = self._avg_llm_latency if self._avg_llm_latency is not None else ROUTER_LLM_LATENCY_PRIOR
+
+            # Old flow: small-talk check, then (if not small talk) a real-time check
+            legacy_calls = 1 if decision["small_talk"] else 2
+            calls_saved = max(0, legacy_calls - llm_calls)
+            saved = calls_saved * per_call
+
+            self._stats["requests"] += 1
+            self._stats[decision["source"]] += 1
+            self._stats["llm_calls_saved"] += calls_saved
+            self._stats["latency_saved"] += saved
+        record_router_savings(decision["source"], calls_saved, saved)
+
+        decision["llm_calls_saved"] = calls_saved
+        decision["latency_saved_ms"] = round(saved * 1000, 1)
+        print(colored(
+            f"Route: {decision['intent']} (small_talk={decision['small_talk']}, needs_realtime={decision['needs_realtime']}, "
+            f"via {decision['source']}) - saved {calls_saved} LLM call(s), ~{decision['latency_saved_ms']:.0f} ms",
+            "magenta"
+        ))
+        return decision
+
+    def _fallback(self, error: Exception) -> Dict[str, Any]:
+        print(colored(f"Error during query routing: {error}", "red"))
+        print(colored("Assuming not small talk and real-time data IS needed.", "yellow"))
+        with self._lock:
+            self._stats["errors"] += 1
+        return {"small_talk": False, "needs_realtime": True, "intent": "other", "source": "llm"}
+
+    def route(self, query: str) -> Dict[str, Any]:
+        """Route a query (sync)"""
+        if self.enable_local:
+            decision = self.pre_classify(query)
+            if decision:
+                decision["source"] = "local"
+                return self._account(decision, llm_calls=0, llm_latency=None)
+
+        start = time.perf_counter()
+        try:
+            decision = self._normalize(self.chain.invoke({"question": query}))
+            decision["source"] = "llm"
+        except Exception as e:
+            decision = self._fallback(e)
+        return self._account(decision, llm_calls=1, llm_latency=time.perf_counter() - start)
+
+    async def aroute(self, query: str) -> Dict[str, Any]:
+        """Route a query (async)"""
+        if self.enable_local:
+            decision = self.pre_classify(query)
+            if decision:
+                decision["source"] = "local"
+                return self._account(decision, llm_calls=0, llm_latency=None)
+
+        start = time.perf_counter()
+        try:
+            decision = self._normalize(await self.chain.ainvoke({"question": query}))
+            decision["source"] = "llm"
+        except Exception as e:
+            decision = self._fallback(e)
+        return self._account(decision, llm_calls=1, llm_latency=time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing counters, including the average latency saved per request"""
+        with self._lock:
+            stats = dict(self._stats)
+            avg_llm_latency = self._avg_llm_latency
+        requests = stats["requests"] or 1
+        stats["latency_saved"] = round(stats["latency_saved"], 3)
+        stats["avg_latency_saved_ms"] = round(stats["latency_saved"] / requests * 1000, 1)
+        stats["local_hit_rate"] = round(stats["local"] / requests, 3)
+        stats["avg_llm_latency_ms"] = round(avg_llm_latency * 1000, 1) if avg_llm_latency is not None else None
+        return stats
+
+
+# Create a global instance
+query_router = QueryRouter()
+
+# Example usage
+if __name__ == "__main__":
+    for q in ["hello!", "What is the nifty today?", "What is a Roth IRA?", "What is Reliance's market cap?",
+              "Should I rebalance my portfolio into bonds?"]:
+        print(q, "->", query_router.route(q))
+    print(query_router.stats())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Quote Cache for WealthLens
+Shared, TTL-bounded yfinance cache with LRU eviction and request coalescing
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, List
+
+import pandas as pd
+import yfinance as yf
+from termcolor import colored
+
+from metrics import provider_span
+from single_flight import SingleFlight
+from vars import ENABLE_QUOTE_CACHE, QUOTE_CACHE_MAX_SYMBOLS, QUOTE_PRICE_TTL, QUOTE_PROFILE_TTL, QUOTE_HISTORY_TTL
+
+# .info fields that move with the market; everything else in .info is treated as profile data
+PRICE_FIELDS = {
+    "regularMarketPrice", "currentPrice", "previousClose", "regularMarketPreviousClose",
+    "regularMarketOpen", "regularMarketDayHigh", "regularMarketDayLow", "regularMarketVolume",
+    "regularMarketChange", "regularMarketChangePercent", "bid", "ask",
+}
+
+
+class _QuoteEntry:
+    """Cached data for one symbol"""
+    __slots__ = ("info", "price_expires", "profile_expires", "history")
+
+    def __init__(self):
+        self.info: Dict[str, Any] = {}
+        self.price_expires = 0.0
+        self.profile_expires = 0.0
+        self.history: Dict[str, Any] = {}  # period -> (DataFrame, expires_at, last_bar_expires_at)
+
+
+class QuoteCache:
+    """Per-symbol quote cache shared by all users of EnhancedFinancialTools"""
+
+    def __init__(self, max_symbols: int = QUOTE_CACHE_MAX_SYMBOLS, price_ttl: float = QUOTE_PRICE_TTL,
+                 profile_ttl: float = QUOTE_PROFILE_TTL, history_ttl: float = QUOTE_HISTORY_TTL,
+                 enabled: bool = ENABLE_QUOTE_CACHE):
+        self.enabled = enabled  # Off: every call goes straight to yfinance, uncached and uncoalesced
+        self.max_symbols = max_symbols
+        self.price_ttl = price_ttl
+        self.profile_ttl = profile_ttl
+        self.history_ttl = history_ttl
+        self._entries: "OrderedDict[str, _QuoteEntry]" = OrderedDict()
+        self._downloads: "OrderedDict[Hashable, Any]" = OrderedDict()  # (symbols, period) -> (DataFrame, expires_at)
+        self._flights = SingleFlight("quotes")
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "price_refreshes": 0, "evictions": 0}
+
+    # --- internals ---
+
+    def _entry(self, symbol: str) -> _QuoteEntry:
+        """Get (or create) an entry and mark it most recently used. Caller holds the lock."""
+        entry = self._entries.get(symbol)
+        if entry is None:
+            entry = self._entries[symbol] = _QuoteEntry()
+            while len(self._entries) > self.max_symbols:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        else:
+            self._entries.move_to_end(symbol)
+        return entry
+
+    def _single_flight(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Run fetch once per key; concurrent callers with the same key wait for that result"""
+        return self._flights.do(key, fetch)
+
+    @staticmethod
+    def _download(symbols: List[str], period: str):
+        with provider_span("yfinance"):
+            return yf.download(
+                tickers=symbols, period=period, group_by="column",
+                auto_adjust=False, threads=True, progress=False,
+            )
+
+    def _fetch_info(self, symbol: str) -> Dict[str, Any]:
+        """Full .info fetch: refreshes both price and profile fields"""
+        with provider_span("yfinance"):
+            info = yf.Ticker(symbol).info or {}
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(symbol)
+            entry.info = dict(info)
+            entry.price_expires = now + self.price_ttl
+            entry.profile_expires = now + self.profile_ttl
+            return dict(entry.info)
+
+    def _refresh_price(self, symbol: str) -> Dict[str, Any]:
+        """Light refresh of the price fields only (fast_info), keeping cached profile fields"""
+        try:
+            with provider_span("yfinance"):
+                fast = yf.Ticker(symbol).fast_info
+                price = {"regularMarketPrice": fast.last_price, "previousClose": fast.previous_close}
+            # A None would replace a usable value; callers compute the change from both fields
+            missing = [field for field, value in price.items() if value is None]
+            if missing:
+                raise ValueError(f"fast_info returned no {', '.join(missing)}")
+        except Exception as e:
+            print(colored(f"Quick price refresh failed for {symbol} ({e}), fetching full info", "yellow"))
+            return self._fetch_info(symbol)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(symbol)
+            # Drop stale market fields we could not refresh rather than serve them
+            entry.info = {k: v for k, v in entry.info.items() if k not in PRICE_FIELDS}
+            entry.info.update(price)
+            entry.price_expires = now + self.price_ttl
+            return dict(entry.info)
+
+    # --- public API ---
+
+    def get_info(self, symbol: str) -> Dict[str, Any]:
+        """Ticker .info for a symbol, served from cache while fresh"""
+        if not self.enabled:
+            with provider_span("yfinance"):
+                return dict(yf.Ticker(symbol).info or {})
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(symbol)
+            profile_fresh = entry.profile_expires > now
+            price_fresh = entry.price_expires > now
+            if profile_fresh and price_fresh:
+                self._stats["hits"] += 1
+                return dict(entry.info)
+            # Symbols yfinance knows nothing about: only the full fetch can tell us more
+            price_only = profile_fresh and "regularMarketPrice" in entry.info
+            self._stats["price_refreshes" if price_only else "misses"] += 1
+
+        if price_only:
+            return self._single_flight((symbol, "price"), lambda: self._refresh_price(symbol))
+        return self._single_flight((symbol, "info"), lambda: self._fetch_info(symbol))
+
+    def get_history(self, symbol: str, period: str = "5d"):
+        """
+        Ticker .history(period) for a symbol, served from cache while fresh. A period always
+        ends with the current session, whose bar moves with the price: closed bars are kept
+        for the history TTL, the last bar is refetched once it is older than the price TTL.
+        """
+        if not self.enabled:
+            with provider_span("yfinance"):
+                return yf.Ticker(symbol).history(period=period)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entry(symbol).history.get(period)
+            if cached and cached[1] > now and cached[2] > now:
+                self._stats["hits"] += 1
+                return cached[0]
+            tail_only = bool(cached) and cached[1] > now and not cached[0].empty
+            self._stats["price_refreshes" if tail_only else "misses"] += 1
+
+        def fetch():
+            with provider_span("yfinance"):
+                hist = yf.Ticker(symbol).history(period=period)
+            now = time.monotonic()
+            with self._lock:
+                self._entry(symbol).history[period] = (hist, now + self.history_ttl, now + self.price_ttl)
+            return hist
+
+        def refresh_last_bar():
+            hist, expires = cached[0], cached[1]
+            with provider_span("yfinance"):
+                # A few sessions back, so a bar cached mid-session is replaced by its final version
+                latest = yf.Ticker(symbol).history(period="5d")
+            if not latest.empty:
+                # The cached last bar and anything newer (new sessions) come from the fresh fetch
+                last = hist.index[-1]
+                hist = pd.concat([hist[hist.index < last], latest[latest.index >= last]])
+            with self._lock:
+                self._entry(symbol).history[period] = (hist, expires, time.monotonic() + self.price_ttl)
+            return hist
+
+        if tail_only:
+            return self._single_flight((symbol, "history_tail", period), refresh_last_bar)
+        return self._single_flight((symbol, "history", period), fetch)
+
+    def get_download(self, symbols: List[str], period: str = "5d"):
+        """
+        One vectorized yf.download() for many symbols (columns: (field, symbol)).
+        Cached per symbol set with the price TTL since it carries the latest prices.
+        """
+        key = (tuple(sorted(set(symbols))), period)
+        if not self.enabled:
+            return self._download(list(key[0]), period)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._downloads.get(key)
+            if cached and cached[1] > now:
+                self._downloads.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached[0]
+            self._stats["misses"] += 1
+
+        def fetch():
+            data = self._download(list(key[0]), period)
+            with self._lock:
+                self._downloads[key] = (data, time.monotonic() + self.price_ttl)
+                while len(self._downloads) > self.max_symbols:
+                    self._downloads.popitem(last=False)
+                    self._stats["evictions"] += 1
+            return data
+
+        return self._single_flight(("download",) + key, fetch)
+
+    def invalidate(self, symbol: str = None) -> None:
+        """Drop one symbol, or everything when no symbol is given"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                self._downloads.clear()
+            else:
+                self._entries.pop(symbol, None)
+                for key in [k for k in self._downloads if symbol in k[0]]:
+                    del self._downloads[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["symbols"] = len(self._entries)
+        flights = self._flights.stats()
+        stats["coalesced"], stats["errors"] = flights["coalesced"], flights["errors"]
+        lookups = stats["hits"] + stats["misses"] + stats["price_refreshes"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Create a global instance
+quote_cache = QuoteCache()
+
+# Example usage
+if __name__ == "__main__":
+    for _ in range(3):
+        info = quote_cache.get_info("AAPL")
+        print(info.get("longName"), info.get("regularMarketPrice"))
+    print(quote_cache.stats())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Local Reranker for WealthLens
+Small CPU cross-encoder that scores (query, chunk) pairs; optional sentence-transformers dependency
+"""
+
+import threading
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from termcolor import colored
+
+from vars import RERANKER_MODEL
+
+
+class CrossEncoderReranker:
+    """Lazily loaded cross-encoder. `available` is False when sentence-transformers is missing."""
+
+    def __init__(self, model_name: str = RERANKER_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None and not self._failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    print(colored(f"✅ Reranker loaded: {self.model_name}", "green"))
+                except Exception as e:
+                    self._failed = True
+                    print(colored(f"⚠️ Reranker unavailable ({e}), keeping retrieval order", "yellow"))
+        return self._model
+
+    @property
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def score(self, query: str, texts: List[str]) -> Optional[List[float]]:
+        """Relevance logits for each text, or None when no model is available"""
+        model = self._load()
+        if model is None or not texts:
+            return None
+        return [float(s) for s in model.predict([(query, text) for text in texts])]
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        """Reorder documents by cross-encoder score; unchanged order when unavailable"""
+        scores = self.score(query, [doc.page_content for doc in docs])
+        if scores is None:
+            return docs[:top_n]
+        for doc, score in zip(docs, scores):
+            doc.metadata = {**doc.metadata, "rerank_score": round(score, 4)}  # Reused by the local grader
+        ranked = sorted(zip(scores, range(len(docs))), key=lambda pair: -pair[0])
+        return [docs[i] for _, i in ranked[:top_n]]
+
+
+# Create a global instance
+reranker = CrossEncoderReranker()
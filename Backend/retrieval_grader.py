@@ -1,12 +1,18 @@
 # retrieval_grader.py
 
-from typing import Dict
+import math
+from typing import Dict, Any, List, Optional, Tuple
 from langchain.prompts import PromptTemplate
 # Using Langchain's ChatGroq/ChatOllama for consistency if preferred
 # from langchain_community.chat_models import ChatOllama
 # from langchain_groq import ChatGroq
 from langchain_core.output_parsers import JsonOutputParser
-from vars import get_llm_id, get_llm_provider  # Use centralized provider
+from langchain_core.documents import Document
+from vars import (
+    get_llm_id, get_llm_provider,  # Use centralized provider
+    LOCAL_GRADE_THRESHOLD, LOCAL_GRADE_BM25_THRESHOLD, CROSS_ENCODER_THRESHOLD, RETRIEVAL_FETCH_K
+)
+from hybrid_retriever import content_id
 import os
 from dotenv import load_dotenv
 
@@ -49,6 +55,73 @@ prompt_for_retrieval_grading = PromptTemplate(
 
 retrieval_grader = prompt_for_retrieval_grading | grading_llm | JsonOutputParser()
 
+# --- Local Retrieval Grader (no LLM call) ---
+# Grades every chunk on its own from scores that retrieval already produced:
+#   cross-encoder score (when enabled) > Chroma relevance score > BM25 score relative to the best hit
+
+
+class LocalRetrievalGrader:
+    def __init__(self, vector_store=None, cross_encoder=None, threshold: float = LOCAL_GRADE_THRESHOLD,
+                 bm25_threshold: float = LOCAL_GRADE_BM25_THRESHOLD,
+                 cross_encoder_threshold: float = CROSS_ENCODER_THRESHOLD, fetch_k: int = RETRIEVAL_FETCH_K):
+        self.vector_store = vector_store
+        self.cross_encoder = cross_encoder
+        self.threshold = threshold
+        self.bm25_threshold = bm25_threshold
+        self.cross_encoder_threshold = cross_encoder_threshold
+        self.fetch_k = fetch_k
+
+    def _fill_relevance_scores(self, query: str, docs: List[Document]) -> None:
+        """Chunks from a plain dense retriever carry no score: look them up in one Chroma query"""
+        missing = [doc for doc in docs if "relevance_score" not in doc.metadata and "bm25_score" not in doc.metadata]
+        if not missing or self.vector_store is None:
+            return
+        scored = {
+            content_id(doc.page_content): float(score)
+            for doc, score in self.vector_store.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+        }
+        for doc in missing:
+            score = scored.get(content_id(doc.page_content))
+            if score is not None:
+                doc.metadata = {**doc.metadata, "relevance_score": round(score, 4)}
+
+    def _cross_encoder_scores(self, query: str, docs: List[Document]) -> List[Optional[float]]:
+        """sigmoid(logit) per chunk, reusing scores a reranking retriever already attached"""
+        if self.cross_encoder is None:
+            return [None] * len(docs)
+        logits = [doc.metadata.get("rerank_score") for doc in docs]
+        todo = [i for i, logit in enumerate(logits) if logit is None]
+        if todo:
+            fresh = self.cross_encoder.score(query, [docs[i].page_content for i in todo])
+            if fresh is None:  # Model unavailable
+                return [None] * len(docs)
+            for i, logit in zip(todo, fresh):
+                logits[i] = logit
+        return [1 / (1 + math.exp(-logit)) for logit in logits]
+
+    def grade(self, query: str, docs: List[Document]) -> Tuple[List[Document], List[Dict[str, Any]]]:
+        """Returns (relevant chunks in retrieval order, per-chunk grades)"""
+        self._fill_relevance_scores(query, docs)
+        cross_scores = self._cross_encoder_scores(query, docs)
+        relevant, grades = [], []
+        for doc, cross_score in zip(docs, cross_scores):
+            if cross_score is not None:
+                signal, score, threshold = "cross_encoder", cross_score, self.cross_encoder_threshold
+            elif "relevance_score" in doc.metadata:
+                signal, score, threshold = "dense", doc.metadata["relevance_score"], self.threshold
+            elif "bm25_score" in doc.metadata:
+                signal, score, threshold = "bm25", doc.metadata["bm25_score"], self.bm25_threshold
+            else:
+                signal, score, threshold = "none", 0.0, 1.0
+            is_relevant = score >= threshold
+            grades.append({
+                "source": doc.metadata.get("source"), "page": doc.metadata.get("page"),
+                "signal": signal, "score": round(score, 4), "relevant": is_relevant,
+            })
+            if is_relevant:
+                relevant.append(doc)
+        return relevant, grades
+
 # --- Small Talk Grader (NEW) ---
 # This helps identify queries that don't need complex processing.
 
@@ -1,92 +1,48 @@
 # run.py
 
-# Assuming this initializes and returns a Chroma/FAISS etc. vector store
-from ingest import vector_store
-from agno.agent import Agent
-from agno.knowledge.langchain import LangChainKnowledgeBase
-# Use centralized LLM providers
+import time
+_import_started = time.perf_counter() # For the startup report at the end of this module
+
+# Heavy dependencies (vector store, agno, langchain, yfinance, tavily, LLM clients) are created
+# lazily by `subsystems` on first use, or by the background warmup started with the app.
+from subsystems import subsystems
 from vars import (
-    get_llm_id, get_llm_provider,
-    MAX_SEARCH_CALLS, MAX_DEPTH
+    CONCURRENT_RETRIEVAL_AND_SEARCH, ENABLE_ANSWER_CACHE, GRADING_MODE, WARMUP_ON_STARTUP, MEMORY_MODE,
+    MOCK_PROVIDERS_URL, ENABLE_LLM_SCHEDULER, ENABLE_REQUEST_COALESCING
 )
-from agno.tools.yfinance import YFinanceTools
-from deep_research import DeepResearch
 # from summarizer import summarize # Not currently used for final synthesis
-from tavily import TavilyClient
 
 import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from rich.console import Console
 from termcolor import colored
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain.output_parsers import BooleanOutputParser
 from datetime import datetime
-from typing import Optional
-
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple, TYPE_CHECKING
 import traceback
-from fastapi import FastAPI, HTTPException
+import hashlib
+import json
+import uuid
+from fastapi import APIRouter, BackgroundTasks, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
-
-load_dotenv()
-console = Console()
-
-# --- Initialize Tools ---
-tavily_api_key = os.environ.get("TAVILY_API_KEY")
-if tavily_api_key:
-    tavily_client = TavilyClient(api_key=tavily_api_key)
-    print(colored("✅ Tavily client initialized", "green"))
-else:
-    tavily_client = None
-    print(colored("⚠️ TAVILY_API_KEY not found - web search will be limited", "yellow"))
-
-# Initialize enhanced financial tools
-from enhanced_financial_tools import enhanced_financial_tools
-print(colored("✅ Enhanced Financial Tools initialized", "green"))
-
-# Initialize enhanced web search
-from enhanced_web_search import enhanced_web_search
-print(colored("✅ Enhanced Web Search initialized", "green"))
-
-yf_tool = YFinanceTools(
-    stock_price=True,
-    analyst_recommendations=True,
-    stock_fundamentals=True,
-    company_info=True,
-)
-if not hasattr(yf_tool, 'name'):
-    yf_tool.name = "YFinanceTools"
-if tavily_client and not hasattr(tavily_client, 'name'):
-    tavily_client.name = "TavilySearch"
-
-researcher = DeepResearch(
-    max_search_calls=MAX_SEARCH_CALLS, max_depth=MAX_DEPTH)
+from starlette.responses import FileResponse, StreamingResponse, PlainTextResponse
 
+# Bounded executor for the blocking parts of the async pipeline
+from async_utils import run_blocking
+from single_flight import query_flights, search_flights, normalize_query
 
-# --- Initialize Knowledge Base ---
-try:
-    retriever = vector_store.as_retriever(search_kwargs={'k': 3})
-except Exception as e:
-    print(colored(f"Error initializing vector store/retriever: {e}", "red"))
-    print(colored("Knowledge base retrieval will be unavailable.", "yellow"))
-    retriever = None
+# Per-stage latency spans, provider latencies and LLM token counts (/metrics)
+import metrics
 
-knowledge_base = LangChainKnowledgeBase(
-    retriever=retriever) if retriever else None
+if TYPE_CHECKING:
+    from agno.agent import Agent
+    from langchain.memory import ConversationBufferMemory
+    from langchain_core.messages import BaseMessage
 
-# --- Initialize LLMs ---
-# Ensure framework="langchain" is specified when Langchain specific features like parsers are used
-main_llm_langchain = get_llm_provider(get_llm_id("remote"), framework="langchain")
-tool_llm_langchain = get_llm_provider(get_llm_id("tool"), framework="langchain")
-
-# Keep Agno-compatible LLMs if needed for Agno Agents
-main_llm_agno = get_llm_provider(get_llm_id("remote"))
-tool_llm_agno = get_llm_provider(get_llm_id("tool"))
+load_dotenv()
 
 
 # --- Helper Function for Tool Call Display (Keep if needed) ---
@@ -99,6 +55,7 @@ def handle_financial_query(query: str) -> Optional[str]:
     Handle financial queries like stock prices, market data, etc.
     Returns formatted response if it's a financial query, None otherwise.
     """
+    enhanced_financial_tools = subsystems.enhanced_financial_tools
     query_lower = query.lower()
     
     # Check for stock price queries
@@ -191,73 +148,63 @@ def handle_financial_query(query: str) -> Optional[str]:
     return None
 
 
-# --- Core Processing Function ---
-def process_query_flow(
-    query: str,
-    memory: ConversationBufferMemory,
-    deep_search: bool = False,
-    stream_callback: Optional[Callable[[str], None]] = None
-) -> Dict[str, Any]:
-    print(colored(f"\nProcessing Query: '{query}' (Deep Search: {deep_search})", "white", attrs=["bold"]))
-    
-    # === 0. Financial Query Check ===
-    print(colored("Checking if this is a financial query...", "cyan"))
-    financial_response = handle_financial_query(query)
-    if financial_response:
-        print(colored("Financial query detected, returning direct response.", "green"))
-        return {"answer": financial_response, "deep_research_log": ""}
-    
-    final_answer = ""
-    rag_context = ""
-    web_research_context = ""
-    research_debug_log = ""
+# --- Streaming Helpers ---
+# event_callback(event, data) receives structured pipeline events:
+#   "stage" -> {"stage": <name>}  when a pipeline stage starts
+#   "token" -> {"text": <chunk>}  for each synthesized answer chunk
+EventCallback = Callable[[str, Dict[str, Any]], None]
 
-    # === 1. Small Talk Check (Using BooleanOutputParser) ===
-    try:
-        print(colored("Checking for small talk...", "cyan"))
-        # Use Langchain compatible LLM
-        small_talk_llm = main_llm_langchain
-        # Updated prompt for BooleanOutputParser (often works better with true/false but tries yes/no)
-        small_talk_prompt = PromptTemplate(
-            template="Is the following a simple greeting, pleasantry, or conversational filler (small talk)? Answer ONLY with 'YES' or 'NO'.\n\nQuestion: {question}",
-            input_variables=["question"]
-        )
-        # Use BooleanOutputParser
-        small_talk_parser = BooleanOutputParser()
-        small_talk_chain = small_talk_prompt | small_talk_llm | small_talk_parser
 
-        # Invoke the chain
-        is_small_talk = small_talk_chain.invoke({"question": query})
-        print(colored(f"Small talk check result: {is_small_talk}", "magenta"))
+def _emit_stage(event_callback: Optional[EventCallback], stage: str) -> None:
+    """Notify the event callback that a pipeline stage has started."""
+    if event_callback:
+        try:
+            event_callback("stage", {"stage": stage})
+        except Exception as e:
+            print(colored(f"--- EVENT CALLBACK ERROR: {e} ---", "red"))
+
+
+async def _run_agent(agent: "Agent", prompt: str, event_callback: Optional[EventCallback] = None, **kwargs) -> str:
+    """Run an Agno agent, streaming content chunks as "token" events when a callback is set."""
+    model_id = getattr(agent.model, "id", "unknown")
+    start = time.perf_counter()
+    if not event_callback:
+        response = await agent.arun(prompt, **kwargs)
+        metrics.record_agno_run(model_id, time.perf_counter() - start, response)
+        return response.content
+
+    chunks = []
+    response_stream = await agent.arun(prompt, stream=True, **kwargs)
+    async for chunk in response_stream:
+        text = getattr(chunk, "content", None)
+        if isinstance(text, str) and text:
+            chunks.append(text)
+            try:
+                event_callback("token", {"text": text})
+            except Exception as e:
+                print(colored(f"--- EVENT CALLBACK ERROR: {e} ---", "red"))
+    # Streaming runs accumulate their metrics on the agent's run_response
+    metrics.record_agno_run(model_id, time.perf_counter() - start, getattr(agent, "run_response", None))
+    return "".join(chunks)
 
-        if is_small_talk: # BooleanOutputParser returns True or False
-            print(colored("Query identified as small talk.", "yellow"))
-            # Use Agno compatible LLM for the Agno Agent
-            conv_agent = Agent(
-                model=main_llm_agno,
-                description="You are a friendly assistant.",
-                memory=memory
-            )
-            history = memory.load_memory_variables({})["chat_history"]
-            response = conv_agent.run(f"Respond conversationally to: {query}", chat_history=history)
-            return {"answer": response.content, "deep_research_log": ""}
-    except Exception as e:
-        # Catch potential OutputParserException here too
-        print(colored(f"Error during small talk check: {e}", "red"))
-        if "Invalid" in str(e) or "OutputParserException" in str(e):
-             print(colored("Attempting to proceed assuming it's not small talk...", "yellow"))
-        else:
-             traceback.print_exc() # Print full trace for unexpected errors
-        # Proceed assuming it's not small talk on error
 
+# --- Pipeline Branches ---
+async def _rag_branch(query: str, event_callback: Optional[EventCallback] = None) -> Tuple[str, int]:
+    """Knowledge base branch: retrieve and grade. Returns (rag_context, grade)."""
+    rag_context = ""
 
     # === 2. RAG Retrieval ===
     retrieved_docs_content = "No documents found or knowledge base unavailable."
     retrieved_docs = None
+    retriever = await subsystems.aget("retriever")
+    knowledge_base = await subsystems.aget("knowledge_base")
     if knowledge_base and retriever:
         try:
+            _emit_stage(event_callback, "retrieval")
             print(colored("Attempting RAG retrieval...", "cyan"))
-            retrieved_docs = retriever.invoke(query) # Langchain LCEL standard invoke
+            # Chroma + Ollama embedding lookup is blocking, keep it off the event loop
+            with metrics.stage_span("retrieval"):
+                retrieved_docs = await run_blocking(retriever.invoke, query)
 
             if retrieved_docs:
                 retrieved_docs_content = "\n\n".join([doc.page_content for doc in retrieved_docs])
@@ -276,10 +223,30 @@ def process_query_flow(
 
     # === 3. Relevance Grading (Using JsonOutputParser with Markdown Fence Instruction) ===
     grade = 0 # Default to not relevant
-    if retrieved_docs:
+    if retrieved_docs and GRADING_MODE == "local":
         try:
+            _emit_stage(event_callback, "grading")
+            print(colored("Grading retrieved chunks locally...", "cyan"))
+            local_grader = await subsystems.aget("local_grader")
+            with metrics.stage_span("grading"):
+                relevant_docs, chunk_grades = await run_blocking(local_grader.grade, query, retrieved_docs)
+            for chunk_grade in chunk_grades:
+                print(colored(f"  {chunk_grade}", "magenta" if chunk_grade["relevant"] else "grey"))
+            grade = 1 if relevant_docs else 0
+            print(colored(f"Retrieval grade: {len(relevant_docs)}/{len(retrieved_docs)} chunks relevant", 'magenta'))
+            # Only the relevant chunks reach synthesis
+            rag_context = "\n\n".join(doc.page_content for doc in relevant_docs)
+        except Exception as e:
+            print(colored(f"Error during local retrieval grading: {e}", "red"))
+            traceback.print_exc()
+            rag_context = "" # Discard context on error
+    elif retrieved_docs:
+        try:
+            _emit_stage(event_callback, "grading")
             print(colored("Grading retrieved documents...", "cyan"))
-            grading_llm = main_llm_langchain
+            from langchain.prompts import PromptTemplate
+            from langchain_core.output_parsers import JsonOutputParser
+            grading_llm = await subsystems.aget("main_llm_langchain")
             # Updated prompt asking for JSON within markdown fences
             grading_prompt = PromptTemplate(
                  template="""Evaluate the relevance of the retrieved documents to the user's question. Give a binary score: 1 if relevant, 0 if not.\n
@@ -297,7 +264,8 @@ def process_query_flow(
             grading_parser = JsonOutputParser()
             grading_chain = grading_prompt | grading_llm | grading_parser
 
-            grade_result = grading_chain.invoke({"question": query, "documents": retrieved_docs_content})
+            with metrics.stage_span("grading"):
+                grade_result = await grading_chain.ainvoke({"question": query, "documents": retrieved_docs_content})
             # Check the type/content of grade_result
             print(f"DEBUG: Raw grade_result: {grade_result} (type: {type(grade_result)})")
             if isinstance(grade_result, dict):
@@ -322,90 +290,228 @@ def process_query_flow(
                  traceback.print_exc() # Show full trace for unexpected errors
             rag_context = "" # Discard context on error
 
+    return rag_context, grade
+
+
+async def _web_branch(
+    query: str,
+    deep_search: bool,
+    stream_callback: Optional[Callable[[str], None]] = None,
+    event_callback: Optional[EventCallback] = None
+) -> Tuple[str, str]:
+    """Web branch: enhanced web search / deep research. Returns (web_research_context, research_debug_log)."""
+    web_research_context = ""
+    research_debug_log = ""
+    enhanced_web_search = await subsystems.aget("enhanced_web_search")
 
     # === 4. Web Search / Deep Research ===
-    # Check for real-time need (Using BooleanOutputParser)
-    needs_realtime = True # Default assumption
-    try:
-        print(colored("Checking for real-time data need...", "cyan"))
-        realtime_check_llm = main_llm_langchain
-        # Updated prompt for BooleanOutputParser
-        realtime_check_prompt = PromptTemplate(
-            template="""Does the question below strongly imply a need for CURRENT, up-to-the-minute information like stock prices, breaking news, or live market status? Answer ONLY with 'YES' or 'NO'.\n\nQuestion: {question}""",
-            input_variables=["question"]
-        )
-        realtime_check_parser = BooleanOutputParser()
-        realtime_check_chain = realtime_check_prompt | realtime_check_llm | realtime_check_parser
+    _emit_stage(event_callback, "deep_research" if deep_search else "web_search")
+    if deep_search:
+        # --- Enhanced Deep Research Path ---
+        print(colored("Initiating Enhanced Deep Research...", 'magenta'))
+        if stream_callback: stream_callback("Initiating Enhanced Deep Research...\n")
+        try:
+            # Use enhanced web search instead of complex deep research
+            tavily_api_key = os.environ.get("TAVILY_API_KEY")
+            with metrics.stage_span("deep_research"):
+                search_result = await enhanced_web_search.acomprehensive_search(query, tavily_api_key)
+
+            if search_result["success"]:
+                web_research_context = enhanced_web_search.format_search_results(search_result)
+                research_debug_log = f"Enhanced web search successful using: {', '.join(search_result['sources_used'])}"
+                print(colored("Enhanced Deep Research completed successfully.", "green"))
+                if stream_callback: stream_callback("Enhanced Deep Research completed successfully.\n")
+            else:
+                web_research_context = f"Enhanced web search failed: {search_result['message']}"
+                research_debug_log = "Enhanced web search failed"
+                print(colored("Enhanced Deep Research failed.", "red"))
+                if stream_callback: stream_callback("Enhanced Deep Research failed.\n")
 
-        # BooleanOutputParser returns True/False
-        needs_realtime = realtime_check_chain.invoke({"question": query})
+        except Exception as e:
+            error_msg = f"Error during Enhanced Deep Research: {e}"
+            print(colored(error_msg, "red"))
+            traceback.print_exc()
+            web_research_context = f"Enhanced deep research encountered an error: {str(e)}"
+            research_debug_log = f"Enhanced deep research error: {str(e)}"
+            if stream_callback:
+                stream_callback(f"--- ENHANCED DEEP RESEARCH ERROR: {e} ---\n")
+    else:
+        # --- Enhanced Standard Web Search Path ---
+        print(colored("Initiating Enhanced Standard Web Search...", 'magenta'))
+        try:
+            # Use enhanced web search for standard queries too
+            tavily_api_key = os.environ.get("TAVILY_API_KEY")
+            with metrics.stage_span("web_search"):
+                search_result = await enhanced_web_search.acomprehensive_search(query, tavily_api_key)
+
+            if search_result["success"]:
+                web_research_context = enhanced_web_search.format_search_results(search_result)
+                print(colored(f"Enhanced Standard Web Search successful using: {', '.join(search_result['sources_used'])}", "green"))
+            else:
+                web_research_context = f"Enhanced web search failed: {search_result['message']}"
+                print(colored("Enhanced Standard Web Search failed.", "red"))
 
-        print(colored(f"Needs real-time data check result: {'Yes' if needs_realtime else 'No'}", "cyan"))
-    except Exception as e:
-        print(colored(f"Error checking for real-time need: {e}", "red"))
-        if "Invalid" in str(e) or "OutputParserException" in str(e):
-            print(colored("Failed to parse real-time need. Assuming real-time IS needed.", "yellow"))
-        else:
+        except Exception as e:
+            error_msg = f"Error during Enhanced Standard Web Search: {str(e)}"
+            print(colored(error_msg, "red"))
             traceback.print_exc()
-        needs_realtime = True # Default to True on error
-
-    # Decide whether to perform web step
-    perform_web_step = True
-    if grade == 1 and not needs_realtime:
-        print(colored("Relevant RAG found and no immediate real-time data need identified. Proceeding with web search for verification/augmentation.", "green"))
-        # perform_web_step = False # Uncomment to skip web step in this case
-
-    if perform_web_step:
-        if deep_search:
-            # --- Enhanced Deep Research Path ---
-            print(colored("Initiating Enhanced Deep Research...", 'magenta'))
-            if stream_callback: stream_callback("Initiating Enhanced Deep Research...\n")
-            try:
-                # Use enhanced web search instead of complex deep research
-                tavily_api_key = os.environ.get("TAVILY_API_KEY")
-                search_result = enhanced_web_search.comprehensive_search(query, tavily_api_key)
-                
-                if search_result["success"]:
-                    web_research_context = enhanced_web_search.format_search_results(search_result)
-                    research_debug_log = f"Enhanced web search successful using: {', '.join(search_result['sources_used'])}"
-                    print(colored("Enhanced Deep Research completed successfully.", "green"))
-                    if stream_callback: stream_callback("Enhanced Deep Research completed successfully.\n")
-                else:
-                    web_research_context = f"Enhanced web search failed: {search_result['message']}"
-                    research_debug_log = "Enhanced web search failed"
-                    print(colored("Enhanced Deep Research failed.", "red"))
-                    if stream_callback: stream_callback("Enhanced Deep Research failed.\n")
+            web_research_context = f"Enhanced standard web search encountered an error: {str(e)}"
 
-            except Exception as e:
-                error_msg = f"Error during Enhanced Deep Research: {e}"
-                print(colored(error_msg, "red"))
-                traceback.print_exc()
-                web_research_context = f"Enhanced deep research encountered an error: {str(e)}"
-                research_debug_log = f"Enhanced deep research error: {str(e)}"
-                if stream_callback:
-                    stream_callback(f"--- ENHANCED DEEP RESEARCH ERROR: {e} ---\n")
-        else:
-            # --- Enhanced Standard Web Search Path ---
-            print(colored("Initiating Enhanced Standard Web Search...", 'magenta'))
-            try:
-                # Use enhanced web search for standard queries too
-                tavily_api_key = os.environ.get("TAVILY_API_KEY")
-                search_result = enhanced_web_search.comprehensive_search(query, tavily_api_key)
-                
-                if search_result["success"]:
-                    web_research_context = enhanced_web_search.format_search_results(search_result)
-                    print(colored(f"Enhanced Standard Web Search successful using: {', '.join(search_result['sources_used'])}", "green"))
-                else:
-                    web_research_context = f"Enhanced web search failed: {search_result['message']}"
-                    print(colored("Enhanced Standard Web Search failed.", "red"))
+    return web_research_context, research_debug_log
 
-            except Exception as e:
-                error_msg = f"Error during Enhanced Standard Web Search: {str(e)}"
-                print(colored(error_msg, "red"))
-                traceback.print_exc()
-                web_research_context = f"Enhanced standard web search encountered an error: {str(e)}"
+
+# --- Core Processing Function ---
+def process_query_flow(
+    query: str,
+    memory: "ConversationBufferMemory",
+    deep_search: bool = False,
+    stream_callback: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    """
+    Synchronous entry point (Streamlit frontend, scripts).
+    Runs the async pipeline on a private event loop; must not be called from async code.
+    """
+    return asyncio.run(aprocess_query_flow(
+        query, memory, deep_search=deep_search, stream_callback=stream_callback
+    ))
+
+
+async def aprocess_query_flow(
+    query: str,
+    memory: "ConversationBufferMemory",
+    deep_search: bool = False,
+    stream_callback: Optional[Callable[[str], None]] = None,
+    event_callback: Optional[EventCallback] = None
+) -> Dict[str, Any]:
+    """
+    Async query pipeline, coalesced: while a question is being answered, identical ones wait for
+    that run instead of repeating its yfinance, search and LLM work. Identical means same
+    normalized text and mode and no session history; questions with history only coalesce with
+    the same session and history (double submits), since the answer is synthesized from it.
+    Only the first asker's callbacks see progress, the others get a "coalesced" stage.
+    """
+    history = (await run_blocking(memory.load_memory_variables, {}))["chat_history"]
+
+    def run():
+        return _aprocess_query_flow(query, memory, deep_search, stream_callback, event_callback, history=history)
+
+    if not ENABLE_REQUEST_COALESCING:
+        return await run()
+    key = ("deep" if deep_search else "standard", normalize_query(query))
+    if history:
+        session_id = getattr(memory.chat_memory, "session_id", id(memory))
+        key += (session_id, _history_digest(history))
+    response = await query_flights.ado(key, run, on_join=lambda: _emit_stage(event_callback, "coalesced"))
+    return dict(response)  # Callers add their own fields (session_id, timings)
+
+
+def _history_digest(history: List["BaseMessage"]) -> str:
+    return hashlib.sha256("\n".join(f"{m.type}: {m.content}" for m in history).encode("utf-8")).hexdigest()[:16]
+
+
+async def _aprocess_query_flow(
+    query: str,
+    memory: "ConversationBufferMemory",
+    deep_search: bool = False,
+    stream_callback: Optional[Callable[[str], None]] = None,
+    event_callback: Optional[EventCallback] = None,
+    history: Optional[List["BaseMessage"]] = None
+) -> Dict[str, Any]:
+    """
+    Async query pipeline. LLM chains and agents use ainvoke/arun, web search uses an
+    async HTTP client, and blocking work (yfinance, Chroma) runs on the bounded executor,
+    so a slow query never blocks the event loop.
+
+    stream_callback receives progress/log lines; event_callback (optional) receives
+    structured stage and answer-token events for streaming clients. history is the session's
+    chat history when the caller already loaded it.
+    """
+    print(colored(f"\nProcessing Query: '{query}' (Deep Search: {deep_search})", "white", attrs=["bold"]))
+    
+    # === 0. Financial Query Check ===
+    _emit_stage(event_callback, "financial_check")
+    print(colored("Checking if this is a financial query...", "cyan"))
+    with metrics.stage_span("financial_check"):
+        financial_response = await run_blocking(handle_financial_query, query)
+    if financial_response:
+        print(colored("Financial query detected, returning direct response.", "green"))
+        return {"answer": financial_response, "deep_research_log": ""}
+    
+    # === 0b. Semantic Answer Cache ===
+    if history is None:
+        history = (await run_blocking(memory.load_memory_variables, {}))["chat_history"]
+    cache_mode = "deep" if deep_search else "standard"
+    query_vector = None
+    # Answers are keyed by the question alone: a follow-up ("what about its P/E?") depends on this
+    # session's history, so only questions without history are looked up and stored
+    use_answer_cache = ENABLE_ANSWER_CACHE and not history
+    if use_answer_cache:
+        answer_cache = await subsystems.aget("answer_cache")
+        with metrics.stage_span("answer_cache"):
+            cached_response, query_vector = await answer_cache.alookup(query, mode=cache_mode)
+        if cached_response:
+            _emit_stage(event_callback, "cache_hit")
+            return cached_response
+    
+    final_answer = ""
+    rag_context = ""
+    web_research_context = ""
+    research_debug_log = ""
+
+    # === 1. Query Routing (small talk / real-time need / intent in one step) ===
+    _emit_stage(event_callback, "routing")
+    print(colored("Routing query...", "cyan"))
+    query_router = await subsystems.aget("query_router")
+    with metrics.stage_span("routing"):
+        route = await query_router.aroute(query) # Never raises; falls back to safe defaults
+    needs_realtime = route["needs_realtime"]
+    from agno.agent import Agent
+    main_llm_agno = await subsystems.aget("main_llm_agno")
+
+    if route["small_talk"]:
+        try:
+            print(colored("Query identified as small talk.", "yellow"))
+            # Use Agno compatible LLM for the Agno Agent
+            conv_agent = Agent(
+                model=main_llm_agno,
+                description="You are a friendly assistant.",
+                memory=memory
+            )
+            with metrics.stage_span("small_talk"):
+                answer = await _run_agent(conv_agent, f"Respond conversationally to: {query}", event_callback, chat_history=history)
+            return {"answer": answer, "deep_research_log": ""}
+        except Exception as e:
+            print(colored(f"Error responding to small talk: {e}", "red"))
+            traceback.print_exc()
+            # Proceed with the full pipeline on error
+
+
+    # === 2-4. Knowledge Base (Retrieval + Grading) and Web Search / Deep Research ===
+    # Real-time need was decided by the router in step 1
+    print(colored(f"Needs real-time data: {'Yes' if needs_realtime else 'No'}", "cyan"))
+
+    if CONCURRENT_RETRIEVAL_AND_SEARCH:
+        # The web step never depends on the grading result, so both branches start now and
+        # are joined only at synthesis: the critical path is the slower branch, not the sum.
+        print(colored("Running knowledge base and web search branches concurrently...", "cyan"))
+        (rag_context, grade), (web_research_context, research_debug_log) = await asyncio.gather(
+            _rag_branch(query, event_callback),
+            _web_branch(query, deep_search, stream_callback, event_callback),
+        )
+    else:
+        rag_context, grade = await _rag_branch(query, event_callback)
+
+        # Decide whether to perform web step
+        perform_web_step = True
+        if grade == 1 and not needs_realtime:
+            print(colored("Relevant RAG found and no immediate real-time data need identified. Proceeding with web search for verification/augmentation.", "green"))
+            # perform_web_step = False # Uncomment to skip web step in this case
+
+        if perform_web_step:
+            web_research_context, research_debug_log = await _web_branch(query, deep_search, stream_callback, event_callback)
 
     # === 5. Synthesis ===
+    _emit_stage(event_callback, "synthesis")
     print(colored("Synthesizing final answer...", "cyan"))
     # Use Agno compatible LLM for Agno Agent
     synthesis_agent = Agent(
@@ -428,22 +534,28 @@ def process_query_flow(
         Synthesize the above information to answer the original query comprehensively and accurately. Structure the response clearly using Markdown. If conflicting information exists, highlight it or prioritize the most recent/reliable source (often the web context for current data). Respond directly to the user.
         """
         print(colored(f"SYNTHESIS PROMPT INPUT LENGTH: {len(synthesis_prompt_input)} chars", "grey"))
+        metrics.prompt_size.observe(len(synthesis_prompt_input))
 
-        history = memory.load_memory_variables({})["chat_history"]
-        final_response = synthesis_agent.run(synthesis_prompt_input, chat_history=history)
-        final_answer = final_response.content
+        with metrics.stage_span("synthesis"):
+            final_answer = await _run_agent(synthesis_agent, synthesis_prompt_input, event_callback, chat_history=history)
+        synthesis_ok = True
 
     except Exception as e:
         print(colored(f"Error during final synthesis: {e}", "red"))
         traceback.print_exc()
         final_answer = f"Sorry, I encountered an error while synthesizing the final answer: {str(e)}"
+        synthesis_ok = False
 
     print(colored("Processing complete.", "white", attrs=["bold"]))
 
-    return {
+    response = {
         "answer": final_answer,
         "deep_research_log": research_debug_log
         }
+    if use_answer_cache and synthesis_ok:
+        # Real-time questions expire within a minute, evergreen ones last hours
+        await answer_cache.astore(query, response, realtime=needs_realtime, mode=cache_mode, vector=query_vector)
+    return response
 
 # Remove the entire testing block below
 # Remove the entire testing block below
@@ -475,71 +587,87 @@ def process_query_flow(
 # --- Pydantic Model for Request Body ---
 class QueryRequest(BaseModel):
     query: str
+    session_id: Optional[str] = None # Client-chosen conversation id; a new one is issued (and returned) when missing
     deep_search: bool = False # Default to False if not provided
+    include_timings: bool = False # Add a per-stage latency breakdown to the response
+
+# --- API Routes (registered on the app by create_app) ---
+router = APIRouter()
+
+# --- Conversation memory ---
+# History lives in the shared session store (SQLite WAL / Redis, see SESSION_BACKEND), not in this
+# process, so any worker can serve any turn of a conversation.
+async def get_or_create_memory(session_id: str) -> "ConversationBufferMemory":
+    """Memory over the stored history of a session (bounded window, idle sessions evicted)."""
+    session_store = await subsystems.aget("session_store")
+    if MEMORY_MODE == "summary":
+        # Recent turns verbatim + rolling summary, a fixed token budget per prompt
+        from conversation_memory import SummarizingMemory
+        return SummarizingMemory(session_store, session_id)
+    from langchain.memory import ConversationBufferMemory
+    from session_store import SessionChatMessageHistory
+    return ConversationBufferMemory(
+        chat_memory=SessionChatMessageHistory(session_store, session_id),
+        memory_key="chat_history",
+        return_messages=True # Important for Langchain chains expecting message objects
+    )
 
-# --- FastAPI App Setup ---
-app = FastAPI(
-    title="Financial Assistant API",
-    description="API endpoint for the AI Financial Assistant",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000", 
-        "http://localhost:8000",
-        "http://localhost:19006",  # Expo web
-        "http://localhost:19000",  # Expo dev server
-        "exp://localhost:19000",   # Expo Go app
-        "exp://192.168.21.247:19000",  # Expo Go on mobile (replace with your IP)
-        "*"  # Allow all origins for development
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# --- In-memory storage for conversation memory ---
-# For production, consider a more robust session management solution
-conversation_memory_store = {}
-
-def get_or_create_memory(session_id: str = "default_session") -> ConversationBufferMemory:
-    """Gets or creates a memory buffer for a session."""
-    if session_id not in conversation_memory_store:
-        conversation_memory_store[session_id] = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True # Important for Langchain chains expecting message objects
-        )
-    return conversation_memory_store[session_id]
+async def save_turn(memory: "ConversationBufferMemory", query: str, response: Dict[str, Any]) -> None:
+    """
+    Append the question and answer to the session history (summary memory may also fold older turns).
+    Runs after the response has gone out, so failures are logged here rather than raised.
+    """
+    try:
+        await run_blocking(memory.save_context, {"input": query}, {"output": response.get("answer", "")})
+    except Exception as e:
+        print(colored(f"Could not save the turn to the session history: {e}", "red"))
+        traceback.print_exc()
 
 # --- Health Check Endpoint ---
-@app.get("/health")
+@router.get("/health")
 async def health_check():
-    """Health check endpoint for connection testing"""
-    return {"status": "healthy", "message": "WealthLens Backend is running"}
+    """Health check endpoint for connection testing. Never waits on subsystems, which may still be warming up."""
+    return {"status": "healthy", "message": "WealthLens Backend is running", "subsystems": subsystems.status()}
+
+# --- Metrics Endpoint ---
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage, provider and LLM latency histograms plus token counters"""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.get("/llm/scheduler")
+async def llm_scheduler_stats():
+    """Per-model LLM budgets: queue depth by priority, available requests/tokens, 429s and retries"""
+    from llm_scheduler import llm_scheduler
+    return {"enabled": ENABLE_LLM_SCHEDULER, "models": llm_scheduler.stats()}
 
 # --- API Endpoint ---
-@app.post("/query")
-async def handle_query(request: QueryRequest):
+@router.post("/query")
+async def handle_query(request: QueryRequest, background_tasks: BackgroundTasks):
     """
     Handles user queries, processes them through the agent flow,
     and returns the AI's response.
     """
     try:
         # Get or create memory for this session
-        memory = get_or_create_memory()
+        session_id = request.session_id or uuid.uuid4().hex
+        memory = await get_or_create_memory(session_id)
         
-        # Process the query
-        response = process_query_flow(
-            query=request.query,
-            memory=memory,
-            deep_search=request.deep_search,
-            stream_callback=None  # No streaming for API calls
-        )
+        # Process the query without blocking the event loop
+        with metrics.request_timings() as timings:
+            response = await aprocess_query_flow(
+                query=request.query,
+                memory=memory,
+                deep_search=request.deep_search,
+                stream_callback=None  # No streaming for API calls
+            )
+        # Saved after the response is sent: folding old turns into the summary costs an LLM call
+        background_tasks.add_task(save_turn, memory, request.query, response)
         
-        return {"answer": {"answer": response, "deep_research_log": ""}}
+        result = {"answer": {"answer": response, "deep_research_log": ""}, "session_id": session_id}
+        if request.include_timings:
+            result["timings"] = timings
+        return result
         
     except Exception as e:
         error_msg = f"Error processing query: {str(e)}"
@@ -547,31 +675,203 @@ async def handle_query(request: QueryRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=error_msg)
 
+# --- Answer Cache Management ---
+@router.delete("/cache/answers")
+async def invalidate_answer_cache(query: Optional[str] = None, deep_search: Optional[bool] = None):
+    """
+    Invalidate cached answers: everything, or only the entries a given query would match.
+    deep_search narrows invalidation to one mode.
+    """
+    mode = None if deep_search is None else ("deep" if deep_search else "standard")
+    answer_cache = await subsystems.aget("answer_cache")
+    removed = await answer_cache.ainvalidate(query=query, mode=mode)
+    return {"removed": removed, "stats": answer_cache.stats()}
+
+@router.get("/cache/answers/stats")
+async def answer_cache_stats():
+    """Semantic answer cache hit-rate metrics"""
+    return (await subsystems.aget("answer_cache")).stats()
+
+@router.get("/cache/embeddings/stats")
+async def embeddings_cache_stats():
+    """Embedding cache hits and the embeddings it saved computing, per model"""
+    from embedding_cache import embedding_cache_stats
+    return embedding_cache_stats()
+
+@router.get("/cache/search/stats")
+async def search_cache_stats():
+    """Search result cache: fresh and stale hits, background refreshes, provider calls saved"""
+    from search_cache import search_cache
+    return search_cache.stats()
+
+@router.delete("/cache/search")
+async def invalidate_search_cache(provider: Optional[str] = None):
+    """Drop cached search results for one provider (tavily, google, bing, duckduckgo), or all of them"""
+    from search_cache import search_cache
+    removed = await run_blocking(search_cache.invalidate, provider)
+    return {"removed": removed, "stats": search_cache.stats()}
+
+@router.get("/coalescing/stats")
+async def coalescing_stats():
+    """Identical in-flight queries and web searches that shared one run"""
+    return {"enabled": ENABLE_REQUEST_COALESCING, "query": query_flights.stats(), "search": search_flights.stats()}
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# --- Session Management ---
+@router.delete("/sessions/{session_id}")
+async def clear_session(session_id: str):
+    """Forget a conversation's history"""
+    session_store = await subsystems.aget("session_store")
+    await run_blocking(session_store.clear, session_id)
+    return {"cleared": session_id}
+
+@router.get("/sessions/stats")
+async def session_stats():
+    """Session backend, live sessions and history window"""
+    session_store = await subsystems.aget("session_store")
+    return await run_blocking(session_store.stats)
+
+# --- Streaming API Endpoint ---
+@router.post("/query/stream")
+async def handle_query_stream(request: QueryRequest):
+    """
+    Streams the query pipeline as server-sent events:
+    stage (pipeline stage started), log (progress / deep research lines),
+    token (answer chunk), done (final answer payload) and error.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    session_id = request.session_id or uuid.uuid4().hex
+    background_tasks = BackgroundTasks()  # Run by the response once the stream has closed
+
+    def push(event: str, data: Dict[str, Any]) -> None:
+        # Callbacks may fire on executor threads (e.g. deep research), hop back onto the loop
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def run_pipeline():
+        try:
+            memory = await get_or_create_memory(session_id)
+            with metrics.request_timings() as timings:
+                response = await aprocess_query_flow(
+                    query=request.query,
+                    memory=memory,
+                    deep_search=request.deep_search,
+                    stream_callback=lambda message: push("log", {"message": message}),
+                    event_callback=push
+                )
+            answer = {**response, "session_id": session_id}
+            if request.include_timings:
+                answer["timings"] = timings
+            push("done", answer)
+            # Saved after the stream ends, as for /query: folding old turns into the summary costs
+            # an LLM call, and clients treat the closed stream as the end of the answer
+            background_tasks.add_task(save_turn, memory, request.query, response)
+        except Exception as e:
+            error_msg = f"Error processing query: {str(e)}"
+            print(error_msg)
+            traceback.print_exc()
+            push("error", {"detail": error_msg})
+        finally:
+            push(None, None) # End-of-stream marker
+
+    async def event_stream():
+        task = asyncio.create_task(run_pipeline())
+        # First byte goes out immediately, before any LLM or search call
+        yield _format_sse("stage", {"stage": "accepted", "session_id": session_id})
+        try:
+            while True:
+                event, data = await queue.get()
+                if event is None:
+                    break
+                yield _format_sse(event, data)
+        finally:
+            if not task.done():
+                task.cancel() # Client went away, stop the pipeline
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
+
 # --- Serve Static Frontend Files (Add this section) ---
-# Define the path to the React build directory relative to run.py
-# Adjust the path separators and levels ('..') as necessary based on your structure
-frontend_build_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Frontend_React', 'build'))
-
-# Check if the build directory exists before mounting
-if os.path.exists(frontend_build_dir):
-    print(colored(f"Serving static files from: {frontend_build_dir}", "cyan"))
-    # Mount the static files directory (serving CSS, JS, images, etc.)
-    # The path "/static" here means files in the build/static folder will be available at http://localhost:8000/static/...
-    app.mount("/static", StaticFiles(directory=os.path.join(frontend_build_dir, "static")), name="static")
-
-    # Catch-all route to serve index.html for any other GET request
-    # This is crucial for client-side routing (React Router)
-    @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str = ""):
-        index_path = os.path.join(frontend_build_dir, 'index.html')
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-        else:
-            # Handle case where index.html is not found (optional)
-            raise HTTPException(status_code=404, detail="Frontend index.html not found")
-else:
-    print(colored(f"Warning: Frontend build directory not found at {frontend_build_dir}. Static file serving disabled.", "yellow"))
-    print(colored("Run 'npm run build' in the Frontend_React directory.", "yellow"))
+def _mount_frontend(app: FastAPI) -> None:
+    # Define the path to the React build directory relative to run.py
+    # Adjust the path separators and levels ('..') as necessary based on your structure
+    frontend_build_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Frontend_React', 'build'))
+
+    # Check if the build directory exists before mounting
+    if os.path.exists(frontend_build_dir):
+        print(colored(f"Serving static files from: {frontend_build_dir}", "cyan"))
+        # Mount the static files directory (serving CSS, JS, images, etc.)
+        # The path "/static" here means files in the build/static folder will be available at http://localhost:8000/static/...
+        app.mount("/static", StaticFiles(directory=os.path.join(frontend_build_dir, "static")), name="static")
+
+        # Catch-all route to serve index.html for any other GET request
+        # This is crucial for client-side routing (React Router)
+        @app.get("/{full_path:path}")
+        async def serve_react_app(full_path: str = ""):
+            index_path = os.path.join(frontend_build_dir, 'index.html')
+            if os.path.exists(index_path):
+                return FileResponse(index_path)
+            else:
+                # Handle case where index.html is not found (optional)
+                raise HTTPException(status_code=404, detail="Frontend index.html not found")
+    else:
+        print(colored(f"Warning: Frontend build directory not found at {frontend_build_dir}. Static file serving disabled.", "yellow"))
+        print(colored("Run 'npm run build' in the Frontend_React directory.", "yellow"))
+
+
+# --- FastAPI App Setup ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        # The server (and /health) is up immediately; subsystems are built in the background
+        threading.Thread(target=subsystems.warmup, name="wealthlens-warmup", daemon=True).start()
+    yield
+
+
+def create_app() -> FastAPI:
+    """App factory: routes, CORS and static files only. Nothing heavy is built here."""
+    if MOCK_PROVIDERS_URL:
+        # Load testing against mock_providers.py, no real provider is called
+        from mock_providers import install_redirect
+        install_redirect(MOCK_PROVIDERS_URL)
+    app = FastAPI(
+        title="Financial Assistant API",
+        description="API endpoint for the AI Financial Assistant",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            "http://localhost:3000", 
+            "http://localhost:8000",
+            "http://localhost:19006",  # Expo web
+            "http://localhost:19000",  # Expo dev server
+            "exp://localhost:19000",   # Expo Go app
+            "exp://192.168.21.247:19000",  # Expo Go on mobile (replace with your IP)
+            "*"  # Allow all origins for development
+        ],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    # Registered last: the frontend catch-all route must not shadow the API routes
+    _mount_frontend(app)
+    return app
+
+
+app = create_app()
+print(colored(f"run.py imported in {time.perf_counter() - _import_started:.2f}s (subsystems load lazily)", "cyan"))
 
 
 # ... (rest of your existing functions like process_query_flow, display_tool_calls, etc.) ...
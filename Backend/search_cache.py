@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Search Cache for WealthLens
+Persistent web search result cache (SQLite + in-memory LRU) with freshness tiers and stale-while-revalidate
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
+
+from termcolor import colored
+
+from async_utils import blocking_executor, run_blocking
+from single_flight import search_flights, normalize_query
+from vars import SEARCH_CACHE_PATH, SEARCH_CACHE_MEMORY_ENTRIES, SEARCH_CACHE_TIERS
+
+# Questions about prices and the current session must not be answered from hour-old results
+_REALTIME = re.compile(
+    r"\b(today|now|right now|live|intraday|current(ly)?|price|prices|quote|trading at|opening|closing|"
+    r"this morning|tonight|sensex|nifty|dow|nasdaq|s&p)\b")
+_NEWS = re.compile(
+    r"\b(news|latest|recent(ly)?|update|updates|yesterday|this week|this month|earnings|results|quarter|"
+    r"q[1-4]|announce[sd]?|announcement|guidance|ipo|merger|acquisition|rbi|fed|policy|budget|20\d\d)\b")
+
+
+def freshness_tier(query: str) -> str:
+    """"realtime", "news" or "evergreen" (definitions, how-tos, history)"""
+    normalized = normalize_query(query)
+    if _REALTIME.search(normalized):
+        return "realtime"
+    if _NEWS.search(normalized):
+        return "news"
+    return "evergreen"
+
+
+def _cacheable(result: Any) -> bool:
+    """Only answers with results are kept; failures and empty searches are retried next time"""
+    return bool(result) and bool(result.get("results"))
+
+
+class SearchCache:
+    """
+    Provider responses keyed by (provider, depth, normalized query). Each entry is fresh for its
+    tier's TTL and may then be served stale, up to the tier's stale limit, while one background
+    refresh fetches a new copy. Misses go through single-flight, so a burst of identical
+    searches costs one provider call.
+    """
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, memory_entries: int = SEARCH_CACHE_MEMORY_ENTRIES,
+                 tiers: Dict[str, Tuple[float, float]] = SEARCH_CACHE_TIERS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.tiers = tiers
+        # key -> (payload json, fresh_until, stale_until); JSON so callers never share mutable results
+        self._memory: "OrderedDict[Tuple[str, str, str], Tuple[str, float, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()  # Keeps background refresh tasks alive until they finish
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "stores": 0, "revalidations": 0,
+                       "revalidation_errors": 0, "not_cached": 0, "disk_errors": 0}
+
+    # --- storage ---
+
+    def _conn(self) -> sqlite3.Connection:
+        """Open the database lazily. Caller holds the lock."""
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                " provider TEXT NOT NULL, depth TEXT NOT NULL, query TEXT NOT NULL, payload TEXT NOT NULL,"
+                " fresh_until REAL NOT NULL, stale_until REAL NOT NULL, PRIMARY KEY (provider, depth, query))"
+            )
+        return self._db
+
+    def _remember(self, key: tuple, entry: Tuple[str, float, float]) -> None:
+        """Insert into the LRU front. Caller holds the lock."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key: tuple) -> Optional[Tuple[str, float, float]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            try:
+                row = self._conn().execute(
+                    "SELECT payload, fresh_until, stale_until FROM search_results"
+                    " WHERE provider = ? AND depth = ? AND query = ?", key).fetchone()
+            except sqlite3.Error as e:
+                self._stats["disk_errors"] += 1
+                print(colored(f"Search cache read failed: {e}", "yellow"))
+                return None
+            if row is not None:
+                self._remember(key, row)
+            return row
+
+    def _store(self, key: tuple, query: str, result: Dict[str, Any]) -> None:
+        if not _cacheable(result):
+            with self._lock:
+                self._stats["not_cached"] += 1
+            return
+        fresh_ttl, stale_ttl = self.tiers[freshness_tier(query)]
+        now = time.time()
+        entry = (json.dumps(result, default=str), now + fresh_ttl, now + stale_ttl)
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["stores"] += 1
+            self._writes += 1
+            try:
+                conn = self._conn()
+                conn.execute("INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?, ?)", (*key, *entry))
+                if self._writes % 100 == 0:
+                    conn.execute("DELETE FROM search_results WHERE stale_until < ?", (now,))
+                conn.commit()
+            except sqlite3.Error as e:
+                self._stats["disk_errors"] += 1
+                print(colored(f"Search cache write failed: {e}", "yellow"))
+
+    def _check(self, key: tuple) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """(cached result or None, needs a background refresh)"""
+        entry = self._lookup(key)
+        now = time.time()
+        with self._lock:
+            if entry is None or entry[2] <= now:
+                self._stats["misses"] += 1
+                return None, False
+            fresh = entry[1] > now
+            self._stats["fresh_hits" if fresh else "stale_hits"] += 1
+            refresh = not fresh and key not in self._refreshing
+            if refresh:
+                self._refreshing.add(key)
+        return json.loads(entry[0]), refresh
+
+    def _refresh_done(self, key: tuple, error: Optional[Exception]) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            self._stats["revalidations"] += 1
+            if error is not None:
+                self._stats["revalidation_errors"] += 1
+        if error is not None:
+            print(colored(f"Search cache refresh of {key[0]} '{key[2]}' failed, keeping the stale copy: {error}", "yellow"))
+
+    # --- public API ---
+
+    def get_or_fetch(self, provider: str, depth: str, query: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Cached result for this search, or fetch() once for all concurrent callers and cache it"""
+        key = (provider, depth, normalize_query(query))
+        cached, refresh = self._check(key)
+        if refresh:
+            blocking_executor.submit(self._revalidate, key, query, fetch)
+        if cached is not None:
+            return cached
+
+        def fetch_and_store():
+            result = fetch()
+            self._store(key, query, result)
+            return result
+        return search_flights.do(("cache",) + key, fetch_and_store)
+
+    def _revalidate(self, key: tuple, query: str, fetch: Callable[[], Dict[str, Any]]) -> None:
+        error = None
+        try:
+            self._store(key, query, fetch())
+        except Exception as e:
+            error = e
+        self._refresh_done(key, error)
+
+    async def aget_or_fetch(self, provider: str, depth: str, query: str,
+                            fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Async get_or_fetch; SQLite work runs off the loop, the stale refresh as a task on it"""
+        key = (provider, depth, normalize_query(query))
+        cached, refresh = await run_blocking(self._check, key)
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._arevalidate(key, query, fetch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if cached is not None:
+            return cached
+
+        async def fetch_and_store():
+            result = await fetch()
+            await run_blocking(self._store, key, query, result)
+            return result
+        return await search_flights.ado(("cache",) + key, fetch_and_store)
+
+    async def _arevalidate(self, key: tuple, query: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        error = None
+        try:
+            await run_blocking(self._store, key, query, await fetch())
+        except asyncio.CancelledError:
+            error = RuntimeError("event loop closed before the refresh finished")
+        except Exception as e:
+            error = e
+        self._refresh_done(key, error)
+
+    def invalidate(self, provider: Optional[str] = None) -> int:
+        """Drop one provider's entries, or everything; returns the number of rows removed"""
+        with self._lock:
+            keys = [k for k in self._memory if provider is None or k[0] == provider]
+            for key in keys:
+                del self._memory[key]
+            try:
+                conn = self._conn()
+                if provider is None:
+                    removed = conn.execute("DELETE FROM search_results").rowcount
+                else:
+                    removed = conn.execute("DELETE FROM search_results WHERE provider = ?", (provider,)).rowcount
+                conn.commit()
+                return removed
+            except sqlite3.Error as e:
+                self._stats["disk_errors"] += 1
+                print(colored(f"Search cache invalidation failed: {e}", "yellow"))
+                return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters and the provider calls the cache saved"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["refreshing"] = len(self._refreshing)
+        lookups = stats["fresh_hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["fresh_hits"] + stats["stale_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Create a global instance
+search_cache = SearchCache()
+
+
+if __name__ == "__main__":
+    # Example usage
+    for question in ["Sensex today", "Latest news on Apple earnings", "What is an index fund?"]:
+        fresh, stale = SEARCH_CACHE_TIERS[freshness_tier(question)]
+        print(colored(f"{question!r}: {freshness_tier(question)} (fresh {fresh}s, stale up to {stale}s)", "cyan"))
+
+    calls = []
+
+    def fake_tavily():
+        calls.append(1)
+        return {"results": [{"url": "https://example.com", "content": "Index funds track an index."}]}
+
+    for _ in range(3):
+        search_cache.get_or_fetch("example", "basic", "What is an index fund?", fake_tavily)
+    print(colored(f"3 lookups, {len(calls)} provider call(s): {search_cache.stats()}", "cyan"))
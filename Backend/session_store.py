@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Session Store for WealthLens
+Conversation history shared by every server worker, keyed by the client's session id
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from termcolor import colored
+
+from vars import (
+    SESSION_BACKEND, SESSION_DB_PATH, SESSION_REDIS_URL, SESSION_MAX_MESSAGES, SESSION_IDLE_TTL
+)
+
+# Any server speaking the Redis protocol works (Redis, Valkey, KeyDB, Dragonfly)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class SessionStore:
+    """
+    Backend interface. Messages are stored as LangChain message dicts, at most max_messages per
+    session (oldest dropped first); sessions idle for longer than idle_ttl seconds are evicted.
+    """
+
+    name = "base"
+
+    def __init__(self, max_messages: int = SESSION_MAX_MESSAGES, idle_ttl: float = SESSION_IDLE_TTL):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+
+    def load(self, session_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def replace_prefix(self, session_id: str, count: int, message: Dict[str, Any]) -> None:
+        """Replace the oldest count messages with one message (history compaction); newer ones are kept"""
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def evict_idle(self) -> int:
+        """Drop idle sessions, returns how many were removed"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "max_messages": self.max_messages, "idle_ttl": self.idle_ttl}
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store: only correct with a single server worker"""
+
+    name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._last_active: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._last_active[session_id] = time.time()
+            return list(self._sessions.get(session_id, []))
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            history = self._sessions.setdefault(session_id, [])
+            history.extend(messages)
+            del history[:-self.max_messages]
+            self._sessions.move_to_end(session_id)
+            self._last_active[session_id] = time.time()
+        self.evict_idle()
+
+    def replace_prefix(self, session_id: str, count: int, message: Dict[str, Any]) -> None:
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None:
+                history[:count] = [message]
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._last_active.pop(session_id, None)
+
+    def evict_idle(self) -> int:
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            idle = [sid for sid, seen in self._last_active.items() if seen < cutoff]
+            for sid in idle:
+                self._sessions.pop(sid, None)
+                del self._last_active[sid]
+        return len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**super().stats(), "sessions": len(self._sessions)}
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    One SQLite file in WAL mode, shared by all worker processes on the host: readers never block
+    the writer, and each process keeps its own connection. Idle sessions are swept at most once a
+    minute per process, piggybacking on writes.
+    """
+
+    name = "sqlite"
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, path: str = SESSION_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._last_sweep = 0.0
+
+    def _conn(self) -> sqlite3.Connection:
+        """Open the database lazily, once per process (connections must not cross a fork). Caller holds the lock."""
+        if self._db is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, last_active REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session_id TEXT NOT NULL, seq INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_idle ON sessions (last_active)")
+            self._db.commit()
+        return self._db
+
+    def load(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            conn = self._conn()
+            rows = conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._conn()
+            with conn:  # One transaction: append, trim to the window, touch the session
+                conn.executemany(
+                    "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                    [(session_id, json.dumps(m)) for m in messages],
+                )
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq NOT IN"
+                    " (SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?)",
+                    (session_id, session_id, self.max_messages),
+                )
+                conn.execute(
+                    "INSERT INTO sessions (id, last_active) VALUES (?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET last_active = excluded.last_active",
+                    (session_id, now),
+                )
+            sweep = now - self._last_sweep > self.SWEEP_INTERVAL
+        if sweep:
+            self.evict_idle()
+
+    def replace_prefix(self, session_id: str, count: int, message: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._conn()
+            with conn:
+                seqs = [row[0] for row in conn.execute(
+                    "SELECT seq FROM messages WHERE session_id = ? ORDER BY seq LIMIT ?", (session_id, count)
+                )]
+                if not seqs:
+                    return
+                conn.executemany("DELETE FROM messages WHERE seq = ?", [(seq,) for seq in seqs])
+                # Reuse the oldest seq so the replacement sorts before the messages that were kept
+                conn.execute(
+                    "INSERT INTO messages (seq, session_id, message) VALUES (?, ?, ?)",
+                    (seqs[0], session_id, json.dumps(message)),
+                )
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            self._last_sweep = time.time()
+            conn = self._conn()
+            with conn:
+                idle = [row[0] for row in conn.execute(
+                    "SELECT id FROM sessions WHERE last_active < ?", (self._last_sweep - self.idle_ttl,)
+                )]
+                conn.executemany("DELETE FROM messages WHERE session_id = ?", [(sid,) for sid in idle])
+                conn.executemany("DELETE FROM sessions WHERE id = ?", [(sid,) for sid in idle])
+        if idle:
+            print(colored(f"Evicted {len(idle)} idle sessions", "grey"))
+        return len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._conn()
+            sessions = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            messages = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {**super().stats(), "path": self.path, "sessions": sessions, "messages": messages}
+
+
+class RedisSessionStore(SessionStore):
+    """
+    One Redis list per session. LTRIM keeps the window and EXPIRE does idle eviction on the
+    server side, so workers on several hosts can share sessions.
+    """
+
+    name = "redis"
+    KEY_PREFIX = "wealthlens:session:"
+
+    def __init__(self, url: str = SESSION_REDIS_URL, **kwargs):
+        super().__init__(**kwargs)
+        if redis is None:
+            raise ImportError("SESSION_BACKEND='redis' needs the redis package (pip install redis)")
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, session_id: str) -> str:
+        return self.KEY_PREFIX + session_id
+
+    def load(self, session_id: str) -> List[Dict[str, Any]]:
+        key = self._key(session_id)
+        pipe = self._client.pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.expire(key, int(self.idle_ttl))
+        raw, _ = pipe.execute()
+        return [json.loads(item) for item in raw]
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        key = self._key(session_id)
+        pipe = self._client.pipeline()
+        pipe.rpush(key, *[json.dumps(m) for m in messages])
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, int(self.idle_ttl))
+        pipe.execute()
+
+    def replace_prefix(self, session_id: str, count: int, message: Dict[str, Any]) -> None:
+        key = self._key(session_id)
+        pipe = self._client.pipeline()  # MULTI/EXEC: appends from other workers land after it
+        pipe.ltrim(key, count, -1)
+        pipe.lpush(key, json.dumps(message))
+        pipe.expire(key, int(self.idle_ttl))
+        pipe.execute()
+
+    def clear(self, session_id: str) -> None:
+        self._client.delete(self._key(session_id))
+
+    def evict_idle(self) -> int:
+        return 0  # Keys expire on their own
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = sum(1 for _ in self._client.scan_iter(match=self.KEY_PREFIX + "*", count=500))
+        return {**super().stats(), "url": self.url, "sessions": sessions}
+
+
+def build_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    """Session store for the configured backend ("sqlite", "redis" or "memory")"""
+    stores = {"sqlite": SQLiteSessionStore, "redis": RedisSessionStore, "memory": MemorySessionStore}
+    if backend not in stores:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r}, expected one of {sorted(stores)}")
+    store = stores[backend]()
+    print(colored(f"✅ Session store initialized ({backend})", "green"))
+    return store
+
+
+class SessionChatMessageHistory(BaseChatMessageHistory):
+    """LangChain chat history over a SessionStore, so ConversationBufferMemory works unchanged"""
+
+    def __init__(self, store: SessionStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return messages_from_dict(self.store.load(self.session_id))
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append(self.session_id, [message_to_dict(m) for m in messages])
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+
+if __name__ == "__main__":
+    # Example usage
+    from langchain_core.messages import HumanMessage, AIMessage
+
+    store = SQLiteSessionStore(path="./db/sessions_example.sqlite3", max_messages=4)
+    history = SessionChatMessageHistory(store, "example-session")
+    history.clear()
+    for i in range(3):
+        history.add_messages([HumanMessage(content=f"question {i}"), AIMessage(content=f"answer {i}")])
+    print([m.content for m in history.messages])  # Only the last 4 messages are kept
+    print(store.stats())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Single-Flight for WealthLens
+Coalesces concurrent identical calls (queries, quote fetches, searches) into one in-flight computation
+"""
+
+import asyncio
+import re
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from termcolor import colored
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s&.%-]", " ", query.lower())).strip(" .")
+
+
+class _AsyncFlight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    At most one computation per key at a time: the first caller (leader) runs it, callers that
+    arrive while it is in flight wait for the same result or exception. Nothing is kept once
+    the flight lands; pair it with a cache for reuse over time.
+
+    Every caller receives the same result object, so callers that mutate it must copy it first.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, Future] = {}
+        self._ainflight: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _AsyncFlight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0, "errors": 0, "abandoned": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Blocking flavour: run fn once per key; concurrent callers with the same key wait for that result"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            self._stats["leaders" if leader else "coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def ado(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                  on_join: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Async flavour: factory() runs as a task of its own, so one caller giving up (a client
+        disconnect) does not fail the others; it is cancelled only when every caller has left.
+        The task runs in the leader's context (its request metrics). on_join is called when
+        this caller joins a flight already in progress.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)  # Futures belong to one event loop (process_query_flow runs private loops)
+        with self._lock:
+            flight = self._ainflight.get(flight_key)
+            joined = flight is not None
+            if not joined:
+                flight = self._ainflight[flight_key] = _AsyncFlight(loop.create_task(factory()))
+                flight.task.add_done_callback(lambda task: self._landed(flight_key, flight))
+            flight.waiters += 1
+            self._stats["coalesced" if joined else "leaders"] += 1
+
+        if joined and on_join:
+            on_join()
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                with self._lock:
+                    flight.waiters -= 1
+                    abandoned = flight.waiters == 0
+                    if abandoned:
+                        # Newcomers must start afresh instead of joining a cancelled task
+                        self._ainflight.pop(flight_key, None)
+                        self._stats["abandoned"] += 1
+                if abandoned:
+                    flight.task.cancel()
+            raise
+
+    def _landed(self, flight_key: Hashable, flight: _AsyncFlight) -> None:
+        with self._lock:
+            if self._ainflight.get(flight_key) is flight:
+                del self._ainflight[flight_key]
+            if not flight.task.cancelled() and flight.task.exception() is not None:
+                self._stats["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._inflight) + len(self._ainflight)
+        calls = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_rate"] = round(stats["coalesced"] / calls, 3) if calls else 0.0
+        return stats
+
+
+# Create the global instances
+query_flights = SingleFlight("query")    # Whole query pipeline, keyed on (mode, normalized query[, session, history digest])
+search_flights = SingleFlight("search")  # Web search calls, keyed on (provider, strategy/depth, normalized query)
+
+
+if __name__ == "__main__":
+    # Example usage: five concurrent identical requests, one computation
+    calls = 0
+
+    async def slow_answer():
+        global calls
+        calls += 1
+        await asyncio.sleep(0.5)
+        return {"answer": "Sensex closed at 81,000"}
+
+    async def main():
+        key = ("standard", normalize_query("Sensex today?"))
+        results = await asyncio.gather(*(query_flights.ado(key, slow_answer) for _ in range(5)))
+        print(colored(f"{len(results)} answers from {calls} computation(s): {query_flights.stats()}", "cyan"))
+
+    asyncio.run(main())
@@ -5,6 +5,7 @@ Start script for WealthLens Backend Server
 import uvicorn
 import os
 from dotenv import load_dotenv
+from vars import SERVER_WORKERS, SESSION_BACKEND
 
 # Load environment variables
 load_dotenv()
@@ -14,13 +15,18 @@ if __name__ == "__main__":
     print("📍 Backend will be available at: http://localhost:8000")
     print("🌐 Health check: http://localhost:8000/health")
     print("💬 API endpoint: http://localhost:8000/query")
+    print(f"⚙️  Workers: {SERVER_WORKERS} (sessions: {SESSION_BACKEND})")
     print("=" * 50)
-    
+
+    if SERVER_WORKERS > 1 and SESSION_BACKEND == "memory":
+        print("⚠️  SESSION_BACKEND='memory' is per process: conversations will break across workers")
+
     # Start the server
     uvicorn.run(
         "run:app",
         host="0.0.0.0",  # Allow external connections (important for mobile)
         port=8000,
-        reload=True,  # Auto-reload on code changes
+        reload=SERVER_WORKERS == 1,  # Auto-reload on code changes (single process only)
+        workers=SERVER_WORKERS,  # Set WEB_CONCURRENCY to scale across cores
         log_level="info"
     )
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Subsystems for WealthLens
+Heavy pipeline dependencies (vector store, LLM clients, search, caches), built on first use or by a background warmup
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Any, Callable
+
+from termcolor import colored
+
+from async_utils import run_blocking
+from vars import (
+    get_llm_id, get_llm_provider,
+    MAX_SEARCH_CALLS, MAX_DEPTH, RETRIEVAL_MODE, ENABLE_RERANKER, ENABLE_CROSS_ENCODER_GRADING
+)
+
+
+class Subsystems:
+    """
+    Each attribute is created once, on first access, under its own lock, so a request that
+    needs the router does not wait behind the vector store loading. warmup() touches them
+    in the order the pipeline needs them from a background thread after the server starts.
+    """
+
+    # The deep research agent stack is left out: it needs TAVILY_API_KEY and is rarely used
+    WARMUP_ORDER = (
+        "main_llm_langchain", "main_llm_agno", "query_router", "enhanced_financial_tools",
+        "enhanced_web_search", "vector_store", "retriever", "knowledge_base", "local_grader", "answer_cache",
+        "session_store",
+    )
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.build_seconds: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.warmup_state = "not_started"
+
+    def _get(self, name: str, builder: Callable[[], Any]) -> Any:
+        if name in self._values:
+            return self._values[name]
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values:
+                start = time.perf_counter()
+                self._values[name] = builder()
+                self.build_seconds[name] = round(time.perf_counter() - start, 3)
+        return self._values[name]
+
+    async def aget(self, name: str) -> Any:
+        """Async access: a subsystem still being built is awaited off the event loop"""
+        if name in self._values:
+            return self._values[name]
+        return await run_blocking(getattr, self, name)
+
+    # --- Knowledge base ---
+
+    @property
+    def vector_store(self):
+        def build():
+            from ingest import vector_store  # Loads Ollama embeddings and opens Chroma
+            return vector_store
+        return self._get("vector_store", build)
+
+    @property
+    def retriever(self):
+        def build():
+            from hybrid_retriever import build_retriever
+            from reranker import reranker
+            try:
+                # Hybrid (BM25 + dense, RRF) or plain dense, see RETRIEVAL_MODE in vars.py
+                retriever = build_retriever(self.vector_store, RETRIEVAL_MODE, reranker if ENABLE_RERANKER else None)
+                print(colored(f"✅ Knowledge base retriever initialized ({RETRIEVAL_MODE})", "green"))
+                return retriever
+            except Exception as e:
+                print(colored(f"Error initializing vector store/retriever: {e}", "red"))
+                print(colored("Knowledge base retrieval will be unavailable.", "yellow"))
+                return None
+        return self._get("retriever", build)
+
+    @property
+    def knowledge_base(self):
+        def build():
+            from agno.knowledge.langchain import LangChainKnowledgeBase
+            return LangChainKnowledgeBase(retriever=self.retriever) if self.retriever else None
+        return self._get("knowledge_base", build)
+
+    @property
+    def local_grader(self):
+        def build():
+            # Per-chunk grading from retrieval scores, replaces the LLM grading call (see GRADING_MODE)
+            from retrieval_grader import LocalRetrievalGrader
+            from reranker import reranker
+            return LocalRetrievalGrader(
+                vector_store=self.vector_store, cross_encoder=reranker if ENABLE_CROSS_ENCODER_GRADING else None)
+        return self._get("local_grader", build)
+
+    # --- LLMs ---
+    # Ensure framework="langchain" is specified when Langchain specific features like parsers are used
+
+    @property
+    def main_llm_langchain(self):
+        return self._get("main_llm_langchain", lambda: get_llm_provider(get_llm_id("remote"), framework="langchain"))
+
+    @property
+    def tool_llm_langchain(self):
+        return self._get("tool_llm_langchain", lambda: get_llm_provider(get_llm_id("tool"), framework="langchain"))
+
+    # Keep Agno-compatible LLMs if needed for Agno Agents
+    @property
+    def main_llm_agno(self):
+        return self._get("main_llm_agno", lambda: get_llm_provider(get_llm_id("remote")))
+
+    @property
+    def tool_llm_agno(self):
+        return self._get("tool_llm_agno", lambda: get_llm_provider(get_llm_id("tool")))
+
+    # --- Tools and search ---
+
+    @property
+    def tavily_client(self):
+        def build():
+            tavily_api_key = os.environ.get("TAVILY_API_KEY")
+            if not tavily_api_key:
+                print(colored("⚠️ TAVILY_API_KEY not found - web search will be limited", "yellow"))
+                return None
+            from tavily import TavilyClient
+            tavily_client = TavilyClient(api_key=tavily_api_key)
+            if not hasattr(tavily_client, 'name'):
+                tavily_client.name = "TavilySearch"
+            print(colored("✅ Tavily client initialized", "green"))
+            return tavily_client
+        return self._get("tavily_client", build)
+
+    @property
+    def yf_tool(self):
+        def build():
+            from agno.tools.yfinance import YFinanceTools
+            yf_tool = YFinanceTools(
+                stock_price=True,
+                analyst_recommendations=True,
+                stock_fundamentals=True,
+                company_info=True,
+            )
+            if not hasattr(yf_tool, 'name'):
+                yf_tool.name = "YFinanceTools"
+            return yf_tool
+        return self._get("yf_tool", build)
+
+    @property
+    def researcher(self):
+        def build():
+            from deep_research import DeepResearch
+            return DeepResearch(max_search_calls=MAX_SEARCH_CALLS, max_depth=MAX_DEPTH)
+        return self._get("researcher", build)
+
+    @property
+    def enhanced_financial_tools(self):
+        def build():
+            from enhanced_financial_tools import enhanced_financial_tools
+            print(colored("✅ Enhanced Financial Tools initialized", "green"))
+            return enhanced_financial_tools
+        return self._get("enhanced_financial_tools", build)
+
+    @property
+    def enhanced_web_search(self):
+        def build():
+            from enhanced_web_search import enhanced_web_search
+            print(colored("✅ Enhanced Web Search initialized", "green"))
+            return enhanced_web_search
+        return self._get("enhanced_web_search", build)
+
+    @property
+    def query_router(self):
+        def build():
+            # Single-call query router (small talk / real-time / intent)
+            from query_router import query_router
+            return query_router
+        return self._get("query_router", build)
+
+    @property
+    def answer_cache(self):
+        def build():
+            # Semantic answer cache (near-duplicate questions reuse recent answers)
+            from answer_cache import answer_cache
+            return answer_cache
+        return self._get("answer_cache", build)
+
+    @property
+    def session_store(self):
+        def build():
+            # Conversation history shared across worker processes (see SESSION_BACKEND)
+            from session_store import build_session_store
+            return build_session_store()
+        return self._get("session_store", build)
+
+    # --- Warmup ---
+
+    def warmup(self):
+        """Build every subsystem in pipeline order; failures are recorded, not raised"""
+        self.warmup_state = "running"
+        start = time.perf_counter()
+        for name in self.WARMUP_ORDER:
+            try:
+                getattr(self, name)
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(colored(f"⚠️ Warmup of {name} failed: {e}", "yellow"))
+        self.warmup_state = "done"
+        print(colored(f"✅ Subsystems warmed up in {time.perf_counter() - start:.1f}s", "green"))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "warmup": self.warmup_state,
+            "ready": [name for name in self.WARMUP_ORDER if name in self._values],
+            "pending": [name for name in self.WARMUP_ORDER if name not in self._values and name not in self.errors],
+            "errors": dict(self.errors),
+            "build_seconds": dict(self.build_seconds),
+        }
+
+
+# Create a global instance
+subsystems = Subsystems()
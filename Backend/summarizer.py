@@ -3,7 +3,7 @@
 # Using Langchain's agent framework as provided, but simplifying the tool part
 # as the core task is LLM-based summarization, not complex tool use.
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage
 from termcolor import colored
 # from langchain_groq import ChatGroq # Use centralized provider
 from vars import get_llm_id, get_llm_provider
@@ -26,19 +26,21 @@ prompt_template = ChatPromptTemplate.from_messages([
     6.  **Readability:** Write in clear, natural language.
     7.  **Format Handling:** If the input format is mentioned (e.g., HTML, JSON), focus on extracting and summarizing the meaningful content within that structure.
     """),
-    HumanMessage(content="{text_to_summarize}")
+    # A ("human", ...) tuple is a template; a literal HumanMessage would send "{text_to_summarize}" verbatim
+    ("human", "{text_to_summarize}")
 ])
 
 # Chain for direct summarization
 summarization_chain = prompt_template | summarizer_llm # | StrOutputParser() # Assuming Agno model returns content directly
 
-def summarize(text: str, format_type: Optional[str] = None) -> str:
+def summarize(text: str, format_type: Optional[str] = None, chain=None) -> str:
     """
     Summarizes the provided text using an LLM chain.
 
     Args:
         text: The text to summarize.
         format_type: Optional hint about the format (currently used to refine the input message).
+        chain: Runnable to use instead of summarization_chain (e.g. prompt_template | another LLM).
 
     Returns:
         A summary of the text.
@@ -52,7 +54,7 @@ def summarize(text: str, format_type: Optional[str] = None) -> str:
     input_text += f":\n\n---\n{text}\n---"
 
     try:
-        response = summarization_chain.invoke({"text_to_summarize": input_text})
+        response = (chain or summarization_chain).invoke({"text_to_summarize": input_text})
         # Assuming response object has a 'content' attribute like Agno/Langchain messages
         if hasattr(response, 'content'):
             return response.content
@@ -0,0 +1,11 @@
+"""Shared fixtures for the WealthLens backend unit tests (run from Backend/: python -m pytest)"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Modules that build LLM clients at import only need a key to exist; tests never reach the API
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
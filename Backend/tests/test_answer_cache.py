@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import answer_cache as answer_cache_module
+from answer_cache import SemanticAnswerCache
+
+
+class FakeEmbeddings:
+    """Questions about the same topic word share a direction; the rest are orthogonal"""
+
+    topics = ["sip", "etf", "nifty", "gold"]
+
+    async def aembed_query(self, text):
+        vector = [1.0 if topic in text else 0.0 for topic in self.topics]
+        vector.append(0.0 if any(vector) else 1.0)
+        return vector
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(clock):
+    return SemanticAnswerCache(embeddings=FakeEmbeddings(), threshold=0.9, ttl=3600, realtime_ttl=60, max_entries=2)
+
+
+def lookup(cache, query, mode="standard"):
+    return asyncio.run(cache.alookup(query, mode))[0]
+
+
+def store(cache, query, answer, realtime=False, mode="standard"):
+    asyncio.run(cache.astore(query, {"answer": answer}, realtime=realtime, mode=mode))
+
+
+def test_exact_and_semantic_hits(cache):
+    store(cache, "What is an SIP?", "A systematic investment plan")
+
+    exact = lookup(cache, "what is an sip")
+    similar = lookup(cache, "Explain SIP investing")
+
+    assert exact["answer"] == similar["answer"] == "A systematic investment plan"
+    assert exact["cache"]["similarity"] == 1.0
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["hits"] == 2
+
+
+def test_dissimilar_questions_and_other_modes_miss(cache):
+    store(cache, "What is an SIP?", "A systematic investment plan")
+
+    assert lookup(cache, "What is an ETF?") is None
+    assert lookup(cache, "What is an SIP?", mode="deep") is None
+
+
+def test_entries_expire_after_their_ttl(cache, clock):
+    store(cache, "What is an SIP?", "A systematic investment plan")
+    store(cache, "Nifty level", "24,000", realtime=True)
+
+    clock[0] += 61
+    assert lookup(cache, "Nifty level") is None
+    assert lookup(cache, "What is an SIP?") is not None
+
+    clock[0] += 3600
+    assert lookup(cache, "What is an SIP?") is None
+    assert cache.stats()["expired"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    store(cache, "What is an SIP?", "sip")
+    store(cache, "What is an ETF?", "etf")
+    lookup(cache, "What is an SIP?")  # SIP is now the most recently used
+    store(cache, "Is gold a hedge?", "gold")
+
+    assert lookup(cache, "What is an ETF?") is None
+    assert lookup(cache, "What is an SIP?")["answer"] == "sip"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_drops_matching_entries(cache):
+    store(cache, "What is an SIP?", "sip")
+    store(cache, "What is an ETF?", "etf")
+
+    assert asyncio.run(cache.ainvalidate("Tell me about SIP")) == 1
+    assert lookup(cache, "What is an SIP?") is None
+    assert lookup(cache, "What is an ETF?") is not None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("price of AAPL today", "price of MSFT today"),
+    ("Should I invest in Tesla?", "Should I invest in Nvidia?"),
+    ("should i invest in tesla", "should i invest in nvidia"),
+    ("Gold returns in 2023", "Gold returns in 2024"),
+])
+def test_questions_about_other_entities_miss_however_similar(cache, cached, asked):
+    # FakeEmbeddings puts both questions on the same vector: only the entity check tells them apart
+    store(cache, cached, "cached answer")
+
+    assert lookup(cache, asked) is None
+    assert cache.stats()["entity_mismatches"] == 1
+
+
+def test_rephrasings_naming_the_same_entities_still_hit(cache):
+    store(cache, "What is the price of AAPL today?", "cached answer")
+
+    assert lookup(cache, "AAPL price today")["answer"] == "cached answer"
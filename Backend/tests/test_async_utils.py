@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from async_utils import LoopLocalAsyncClient, run_blocking
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so pooled connections are reused
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_loop_local_client_survives_new_event_loops(server_url):
+    client = LoopLocalAsyncClient(httpx.AsyncClient)
+
+    async def get():
+        return (await client.get(server_url)).text, client.loop_client()
+
+    # Like process_query_flow: each query runs on a fresh asyncio.run loop
+    first_text, first_inner = asyncio.run(get())
+    second_text, second_inner = asyncio.run(get())
+    assert first_text == second_text == "ok"
+    assert first_inner is not second_inner
+
+
+def test_loop_local_client_reuses_the_pool_within_a_loop(server_url):
+    client = LoopLocalAsyncClient(httpx.AsyncClient)
+
+    async def main():
+        await client.get(server_url)
+        inner = client.loop_client()
+        await client.get(server_url)
+        return inner is client.loop_client()
+
+    assert asyncio.run(main())
+
+
+def test_run_blocking_carries_context():
+    import contextvars
+    var = contextvars.ContextVar("var", default="unset")
+
+    async def main():
+        var.set("request-1")
+        return await run_blocking(var.get)
+
+    assert asyncio.run(main()) == "request-1"
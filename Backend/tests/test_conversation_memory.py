@@ -0,0 +1,61 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+
+import summarizer
+from conversation_memory import SummarizingMemory, SUMMARY_PREFIX, estimate_tokens
+from session_store import MemorySessionStore
+
+
+def fake_summarizer(prompts):
+    """summarize_fn running the real summarizer prompt against an LLM that records what it was sent"""
+    def llm(prompt_value):
+        prompts.append(prompt_value.to_messages())
+        return AIMessage(content="User asked about TCS P/E (28x) and Infosys dividends.")
+
+    chain = summarizer.prompt_template | RunnableLambda(llm)
+    return lambda text, format_type=None: summarizer.summarize(text, format_type, chain=chain)
+
+
+def test_folded_turns_reach_the_summarizer_prompt():
+    prompts = []
+    memory = SummarizingMemory(MemorySessionStore(), "s1", recent_turns=1, summarize_fn=fake_summarizer(prompts))
+    memory.save_context({"input": "What is the P/E of TCS?"}, {"output": "TCS trades at 28x earnings."})
+    memory.save_context({"input": "And Infosys dividends?"}, {"output": "Infosys yields about 2.5%."})
+
+    assert len(prompts) == 1
+    human = [m for m in prompts[0] if isinstance(m, HumanMessage)][0].content
+    assert "What is the P/E of TCS?" in human
+    assert "TCS trades at 28x earnings." in human
+    assert "{text_to_summarize}" not in human
+
+
+def test_history_is_summary_plus_recent_turns():
+    memory = SummarizingMemory(MemorySessionStore(), "s2", recent_turns=1, summarize_fn=fake_summarizer([]))
+    memory.save_context({"input": "What is the P/E of TCS?"}, {"output": "TCS trades at 28x earnings."})
+    memory.save_context({"input": "And Infosys dividends?"}, {"output": "Infosys yields about 2.5%."})
+
+    history = memory.load_memory_variables({})["chat_history"]
+    assert isinstance(history[0], SystemMessage) and history[0].content.startswith(SUMMARY_PREFIX)
+    assert "TCS P/E" in history[0].content
+    assert [m.content for m in history[1:]] == ["And Infosys dividends?", "Infosys yields about 2.5%."]
+
+
+def test_summarizer_failure_keeps_a_clipped_transcript():
+    memory = SummarizingMemory(MemorySessionStore(), "s3", recent_turns=1,
+                               summarize_fn=lambda text, format_type=None: "Error: unavailable")
+    memory.save_context({"input": "Q1 about HDFC"}, {"output": "A1"})
+    memory.save_context({"input": "Q2"}, {"output": "A2"})
+
+    summary = memory.load_memory_variables({})["chat_history"][0].content
+    assert "Q1 about HDFC" in summary
+
+
+def test_history_stays_within_token_budget():
+    memory = SummarizingMemory(MemorySessionStore(), "s4", recent_turns=3, token_budget=200, summary_tokens=50,
+                               summarize_fn=fake_summarizer([]))
+    for i in range(6):
+        memory.save_context({"input": f"Question {i} " + "x" * 200}, {"output": f"Answer {i} " + "y" * 200})
+
+    history = memory.load_memory_variables({})["chat_history"]
+    assert sum(estimate_tokens(m.content) for m in history) <= 200 + 10
+    assert history[-1].content.startswith("Answer 5")
@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import deep_research
+from deep_research import DeepResearch
+
+
+@pytest.fixture
+def fake_agents(monkeypatch):
+    """Agents answer instantly; the analyst waits until both runs are in flight"""
+    both_started = threading.Barrier(2, timeout=5)
+
+    def run_agent(self, role, prompt, step):
+        if role == "planner":
+            return SimpleNamespace(content="1. first part\n2. second part")
+        if role == "analyst":
+            try:
+                both_started.wait()
+            except threading.BrokenBarrierError:
+                pass
+            return SimpleNamespace(content="summary")
+        if role == "synthesizer":
+            return SimpleNamespace(content=prompt)
+        return SimpleNamespace(content="NO")
+
+    monkeypatch.setattr(DeepResearch, "_run_agent", run_agent)
+    monkeypatch.setattr(deep_research, "ENABLE_SEARCH_CACHE", False)
+    monkeypatch.setattr(deep_research.tavily_client, "search",
+                        lambda **kwargs: {"results": [{"url": "https://example.com", "content": kwargs["query"]}]})
+    return both_started
+
+
+def test_concurrent_runs_on_one_researcher_keep_their_own_state(fake_agents):
+    researcher = DeepResearch(max_depth=0, max_search_calls=1, parallel=False)
+    results = {}
+
+    def research(query):
+        results[query] = researcher.research(query)
+
+    threads = [threading.Thread(target=research, args=(q,)) for q in ("Tesla outlook", "Nio outlook")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    for query, other in (("Tesla outlook", "Nio outlook"), ("Nio outlook", "Tesla outlook")):
+        log = results[query]["debug_log"]
+        assert f"Starting Deep Research on: {query}" in log
+        assert other not in log
+        # Each run has its own budget of one search
+        assert "Total search calls made: 1" in log
+
+
+def test_parallel_branches_log_in_subquestion_order(fake_agents):
+    researcher = DeepResearch(max_depth=0, max_search_calls=4, parallel=True, max_workers=2)
+    log = researcher.research("Tesla outlook")["debug_log"]
+
+    assert log.index("Researching (Depth 0): first part") < log.index("Researching (Depth 0): second part")
+    assert "Total search calls made: 2" in log
+
+
+def test_agent_pools_are_shared_between_researchers():
+    assert DeepResearch().agent_pools is DeepResearch().agent_pools
+
+
+def test_nested_fan_out_on_a_single_thread_pool_does_not_deadlock(fake_agents, monkeypatch):
+    fake_agents.abort()  # Analysts need not overlap here
+    # Every branch decomposes once; with one shared thread, branches wait on children that
+    # could never be scheduled unless the waiting caller runs them itself
+    monkeypatch.setattr(DeepResearch, "_should_decompose", lambda self, *args, **kwargs: True)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(deep_research, "_research_executor", executor)
+    researcher = DeepResearch(max_depth=2, max_search_calls=50, parallel=True, max_workers=2)
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(researcher.research("Tesla outlook")), daemon=True)
+    thread.start()
+    thread.join(timeout=20)
+    executor.shutdown(wait=False)
+
+    assert not thread.is_alive()
+    # 2 subquestions, 2 children each, 2 grandchildren each
+    assert result["debug_log"].count("Researching (Depth 2)") == 8
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings
+
+
+class FakeModel(Embeddings):
+    """Deterministic 3-d vectors; records every text it is asked to embed"""
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        return [len(text) / 10, 0.1, 1 / 3]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return self._vector(text)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CachedEmbeddings(FakeModel(), "fake", path=str(tmp_path / "embeddings.sqlite3"), memory_entries=2)
+
+
+def test_only_misses_reach_the_model(cache):
+    cache.embed_documents(["alpha", "beta"])
+    cache.embed_documents(["alpha", "beta", "gamma", "gamma"])
+
+    assert cache.model.embedded == ["alpha", "beta", "gamma"]
+    assert cache.stats()["batch_duplicates"] == 1
+
+
+def test_vectors_are_stored_as_float32_and_returned_as_lists(cache):
+    miss = cache.embed_documents(["alpha"])[0]
+    hit = cache.embed_documents(["alpha"])[0]
+
+    assert isinstance(miss, list) and isinstance(miss[0], float)
+    assert miss == hit  # Same float32-rounded values whether cached or not
+    assert all(v.dtype == np.float32 for v in cache._memory.values())
+    assert cache.stats()["memory_bytes"] == 3 * 4
+
+
+def test_lru_evicts_to_disk_and_reloads(cache):
+    cache.embed_documents(["a", "b", "c"])  # Only two fit in memory
+    assert cache.stats()["memory_entries"] == 2
+
+    vector = cache.embed_documents(["a"])[0]
+
+    assert cache.model.embedded == ["a", "b", "c"]
+    assert cache.stats()["disk_hits"] == 1
+    assert vector == pytest.approx([0.1, 0.1, 1 / 3])
+
+
+def test_queries_and_documents_are_cached_apart(cache):
+    cache.embed_documents(["alpha"])
+    cache.embed_query("alpha")
+
+    assert cache.model.embedded == ["alpha", "alpha"]
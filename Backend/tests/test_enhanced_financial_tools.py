@@ -0,0 +1,33 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import enhanced_financial_tools as tools_module
+from enhanced_financial_tools import EnhancedFinancialTools
+
+
+def download(closes):
+    """A yf.download frame: (field, symbol) columns, one row per session"""
+    index = pd.date_range("2026-10-15", periods=2, freq="D")
+    frames = {
+        (field, symbol): [close * scale for close in series]
+        for symbol, series in closes.items()
+        for field, scale in (("Open", 0.99), ("High", 1.01), ("Low", 0.98), ("Close", 1.0))
+    }
+    frames.update({("Volume", symbol): [1000.0, 2000.0] for symbol in closes})
+    return pd.DataFrame(frames, index=index)
+
+
+def test_market_indices_keep_the_per_symbol_quote_shape_and_are_valid_json(monkeypatch):
+    data = download({"^GSPC": [5000.0, 5050.0], "^NSEI": [np.nan, 24000.0]})
+    monkeypatch.setattr(tools_module.quote_cache, "get_download", lambda symbols, period: data)
+
+    result = EnhancedFinancialTools().get_market_indices()
+
+    assert result["success"] and set(result["data"]) == {"S&P 500", "NIFTY 50"}
+    sp = result["data"]["S&P 500"]
+    assert sp["change"] == 50.0 and sp["change_percent"] == 1.0
+    assert sp["currency"] == "USD" and "market_cap" in sp
+    assert result["data"]["NIFTY 50"]["currency"] == "INR"
+    json.dumps(result, allow_nan=False)  # One session of data: no NaN leaks into the payload
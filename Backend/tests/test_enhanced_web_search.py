@@ -0,0 +1,96 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import enhanced_web_search as search_module
+from enhanced_web_search import enhanced_web_search
+
+
+def _result(source, *urls):
+    return {"success": True, "source": source, "message": source,
+            "results": [{"title": u, "url": u, "content": u} for u in urls]}
+
+
+def _sync_provider(delay, result):
+    def provider():
+        time.sleep(delay)
+        return result
+    return provider
+
+
+def _async_provider(delay, result):
+    async def provider():
+        await asyncio.sleep(delay)
+        return result
+    return provider
+
+
+@pytest.fixture(autouse=True)
+def short_windows(monkeypatch):
+    monkeypatch.setattr(search_module, "SEARCH_FANOUT_DEADLINE", 2.0)
+    monkeypatch.setattr(search_module, "SEARCH_FANOUT_GRACE", 0.5)
+    monkeypatch.setattr(search_module, "SEARCH_MIN_RESULTS", 3)
+
+
+def test_fanout_waits_for_tavily_within_the_grace_window():
+    tavily = _result("Tavily", "t1")
+    scraper = _result("Google", "g1", "g2", "g3")
+    results = enhanced_web_search._fanout_search([_sync_provider(0.2, tavily), _sync_provider(0.0, scraper)])
+
+    assert results == [tavily, scraper]
+
+
+def test_fanout_gives_up_on_tavily_after_the_grace_window():
+    scraper = _result("Google", "g1", "g2", "g3")
+    start = time.monotonic()
+    results = enhanced_web_search._fanout_search([_sync_provider(1.5, _result("Tavily", "t1")), _sync_provider(0.0, scraper)])
+
+    assert results == [None, scraper]
+    assert time.monotonic() - start < 1.0
+
+
+def test_afanout_waits_for_tavily_within_the_grace_window():
+    tavily = _result("Tavily", "t1")
+    scraper = _result("Google", "g1", "g2", "g3")
+    results = asyncio.run(enhanced_web_search._afanout_search([_async_provider(0.2, tavily), _async_provider(0.0, scraper)]))
+
+    assert results == [tavily, scraper]
+
+
+def test_afanout_cancels_tavily_after_the_grace_window():
+    scraper = _result("Google", "g1", "g2", "g3")
+    start = time.monotonic()
+    results = asyncio.run(enhanced_web_search._afanout_search(
+        [_async_provider(1.5, _result("Tavily", "t1")), _async_provider(0.0, scraper)]))
+
+    assert results == [None, scraper]
+    assert time.monotonic() - start < 1.0
+
+
+def test_afanout_stops_as_soon_as_tavily_and_enough_results_are_in():
+    tavily = _result("Tavily", "t1", "t2", "t3")
+    start = time.monotonic()
+    results = asyncio.run(enhanced_web_search._afanout_search(
+        [_async_provider(0.0, tavily), _async_provider(1.5, _result("Bing", "b1"))]))
+
+    assert results == [tavily, None]
+    assert time.monotonic() - start < 1.0
+
+
+def test_fanout_cancels_providers_still_queued_at_the_deadline(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(search_module, "_fanout_executor", pool)
+    monkeypatch.setattr(search_module, "SEARCH_FANOUT_DEADLINE", 0.2)
+    ran = []
+
+    def queued():
+        ran.append("queued")
+        return _result("Bing", "b1")
+
+    results = enhanced_web_search._fanout_search([_sync_provider(0.5, _result("Tavily", "t1")), queued])
+    pool.shutdown(wait=True)
+
+    assert results == [None, None]
+    assert ran == []
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from hybrid_retriever import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_rrf_rewards_documents_ranked_by_both_retrievers():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "a"]], rrf_k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b", "d"]
+    assert dict(fused)["a"] == pytest.approx(1 / 61 + 1 / 63)
+    assert dict(fused)["b"] == pytest.approx(1 / 62)
+
+
+def test_rrf_with_one_ranking_keeps_its_order():
+    assert [doc_id for doc_id, _ in reciprocal_rank_fusion([["x", "y", "z"], []])] == ["x", "y", "z"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Revenue of 3,400 crore", ["revenue", "3,400", "3400", "crore"]),
+    ("1,00,000 units", ["1,00,000", "100000", "units"]),
+    ("EPS rose 12.5% to 3,400.50", ["eps", "rose", "12.5%", "12", "5%", "3,400.50", "3400.50"]),
+])
+def test_figures_stay_whole(text, expected):
+    assert tokenize(text) == expected
+
+
+def test_tickers_and_isins_stay_whole_and_index_their_parts():
+    assert tokenize("BRK.B and ^NSEI, ISIN INE002A01018") == ["brk.b", "brk", "b", "^nsei", "isin", "ine002a01018"]
+
+
+def test_commas_between_words_still_split():
+    assert tokenize("growth, margins,debt") == ["growth", "margins", "debt"]
+
+
+def test_an_index_saved_by_an_older_tokenizer_is_retokenized_on_load(tmp_path):
+    path = tmp_path / "bm25.json"
+    # Old format: no tokenizer version, "3,400" split into "3" and "400"
+    path.write_text(json.dumps({
+        "postings": {"3": {"c1": 1}, "400": {"c1": 1}, "crore": {"c1": 1}},
+        "doc_len": {"c1": 3},
+        "docs": {"c1": {"text": "3,400 crore", "metadata": {}}},
+    }))
+
+    index = BM25Index(path=str(path))
+
+    assert "3,400" in index.postings and "3" not in index.postings
+    assert index.doc_len == {"c1": 3}
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+from hybrid_retriever import BM25Index, content_id
+
+
+@pytest.fixture(scope="module")
+def ingest(tmp_path_factory):
+    # Importing ingest opens its Chroma store under ./db: keep that out of the source tree
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("ingest"))
+    try:
+        import ingest
+        yield ingest
+    finally:
+        os.chdir(cwd)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.vectors = {}
+        self.added = []
+
+    def get(self, ids, include):
+        return {"ids": [i for i in ids if i in self.vectors]}
+
+    def add_documents(self, documents, ids):
+        self.added.extend(ids)
+        self.vectors.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.vectors.pop(doc_id, None)
+
+
+@pytest.fixture
+def env(ingest, tmp_path, monkeypatch):
+    """Ingestion against a fake vector store; a "PDF" is a text file with one chunk per line"""
+    store = FakeVectorStore()
+    index = BM25Index(path=str(tmp_path / "bm25.json"))
+    monkeypatch.setattr(ingest, "vector_store", store)
+    monkeypatch.setattr(ingest, "bm25_index", index)
+    monkeypatch.setattr(ingest, "manifest_path", str(tmp_path / "manifest.json"))
+
+    def load_and_split(file_path):
+        with open(file_path) as f:
+            lines = f.read().splitlines()
+        return [Document(page_content=line) for line in lines], 1
+
+    monkeypatch.setattr(ingest, "load_and_split", load_and_split)
+
+    def write(name, *chunks):
+        path = tmp_path / name
+        path.write_text("\n".join(chunks))
+        return str(path)
+
+    return store, index, write
+
+
+def test_chunk_ids_are_content_hashes_and_duplicates_are_dropped(ingest):
+    docs = [Document(page_content=t) for t in ("alpha", "beta", "alpha")]
+    unique_docs, ids = ingest.unique_chunks(docs)
+
+    assert [d.page_content for d in unique_docs] == ["alpha", "beta"]
+    assert ids == [content_id("alpha"), content_id("beta")]
+    assert ingest.chunk_id(Document(page_content="alpha", metadata={"page": 3})) == content_id("alpha")
+
+
+def test_new_file_is_embedded_indexed_and_recorded(ingest, env):
+    store, index, write = env
+    path = write("report.pdf", "alpha", "beta", "alpha")
+
+    assert ingest.ingest_file(path) == 1
+
+    ids = [content_id("alpha"), content_id("beta")]
+    assert store.added == ids
+    assert set(index.docs) == set(ids)
+    entry = ingest.load_manifest()["files"]["report.pdf"]
+    assert entry["chunk_ids"] == ids and entry["sha256"] == ingest.file_hash(path)
+
+
+def test_unchanged_and_renamed_files_are_not_embedded_again(ingest, env):
+    store, index, write = env
+    ingest.ingest_file(write("report.pdf", "alpha", "beta"))
+
+    assert ingest.ingest_file(write("ingested_report.pdf", "alpha", "beta")) == 0
+    assert ingest.ingest_file(write("copy.pdf", "alpha", "beta")) == 0
+
+    assert len(store.added) == 2
+    files = ingest.load_manifest()["files"]
+    assert files["copy.pdf"]["chunk_ids"] == files["report.pdf"]["chunk_ids"]
+
+
+def test_updated_file_embeds_new_chunks_and_removes_stale_ones(ingest, env):
+    store, index, write = env
+    ingest.ingest_file(write("report.pdf", "alpha", "beta"))
+    ingest.ingest_file(write("other.pdf", "beta", "gamma"))
+
+    ingest.ingest_file(write("report.pdf", "alpha", "delta"))
+
+    assert store.added[-1:] == [content_id("delta")]
+    # "beta" left report.pdf but other.pdf still uses it
+    assert set(store.vectors) == {content_id(t) for t in ("alpha", "beta", "gamma", "delta")}
+
+    ingest.ingest_file(write("other.pdf", "gamma"))
+
+    assert content_id("beta") not in store.vectors
+    assert content_id("beta") not in index.docs
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import httpx
+import pytest
+
+import llm_scheduler as llm_scheduler_module
+from llm_scheduler import LLMScheduler, TokenBucket, llm_priority
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_scheduler_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(capacity=10, rate=2)
+    bucket.level = 0
+
+    clock[0] += 2
+    assert bucket.wait_time(4, clock[0]) == 0.0
+    assert bucket.wait_time(6, clock[0]) == pytest.approx(1.0)
+
+    clock[0] += 100
+    bucket.refill(clock[0])
+    assert bucket.level == 10
+
+
+def test_token_bucket_caps_oversized_requests_at_a_full_bucket(clock):
+    bucket = TokenBucket(capacity=10, rate=1)
+    bucket.level = 5
+    assert bucket.wait_time(1000, clock[0]) == pytest.approx(5.0)
+
+
+def test_limits_are_split_across_workers():
+    scheduler = LLMScheduler(limits={"default": {"rpm": 60, "tpm": 6000}}, workers=3)
+    scheduler.acquire("model", 100, "interactive")
+    stats = scheduler.stats()["model"]
+
+    assert stats["requests_available"] == pytest.approx(19, abs=0.1)
+    assert stats["tokens_available"] == pytest.approx(1900, abs=5)
+    assert stats["granted"] == 1
+
+
+def test_interactive_calls_are_admitted_before_queued_background_calls():
+    scheduler = LLMScheduler(limits={"default": {"rpm": 600, "tpm": 10 ** 6}}, workers=1)
+    with scheduler._lock:
+        scheduler._budget("model").requests.level = -2.0  # Drained: the next slot frees up in ~0.3s
+    order = []
+
+    def call(name, priority):
+        scheduler.acquire("model", 10, priority)
+        order.append(name)
+
+    background = threading.Thread(target=call, args=("research", "background"))
+    background.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=("synthesis", "interactive"))
+    interactive.start()
+    background.join(timeout=5)
+    interactive.join(timeout=5)
+
+    assert order == ["synthesis", "research"]
+
+
+def test_rate_limit_response_pauses_the_model_and_usage_refunds_the_estimate():
+    scheduler = LLMScheduler(limits={"default": {"rpm": 60, "tpm": 10000}}, workers=1)
+    scheduler.acquire("model", 1000, "interactive")
+
+    ok = httpx.Response(200, json={"usage": {"total_tokens": 400}})
+    assert scheduler.settle("model", 1000, ok) is None
+    assert scheduler.stats()["model"]["tokens_available"] == pytest.approx(9600, abs=5)
+
+    limited = httpx.Response(429, headers={"retry-after": "7"})
+    assert scheduler.settle("model", 0, limited) == 7.0
+    assert scheduler.stats()["model"]["paused_for"] == pytest.approx(7, abs=0.1)
+
+
+def test_backoff_honours_retry_after():
+    scheduler = LLMScheduler(limits={"default": {"rpm": 60, "tpm": 10000}}, workers=1)
+    assert scheduler.backoff("model", 0, "429", retry_after=5.0) >= 5.0
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        with llm_priority("urgent"):
+            pass
@@ -0,0 +1,61 @@
+import pytest
+
+import metrics
+from query_router import query_router
+
+
+@pytest.mark.parametrize("query", [
+    "what is Reliance's market cap",
+    "What is the P/E of TCS?",
+    "what's INFY.NS revenue",
+    "What is $AAPL dividend yield?",
+])
+def test_data_questions_phrased_as_definitions_need_realtime(query):
+    decision = query_router.pre_classify(query)
+    assert decision == {"small_talk": False, "needs_realtime": True, "intent": "market_data"}
+
+
+@pytest.mark.parametrize("query", [
+    "what's the price of TCS",
+    "What is the nifty today?",
+    "What is the current price of gold?",
+    "Where is INFY trading now?",
+    "How is TCS doing now",
+])
+def test_realtime_markers_win(query):
+    assert query_router.pre_classify(query)["needs_realtime"] is True
+
+
+@pytest.mark.parametrize("query", [
+    "What is a Roth IRA?",
+    "what is an ETF",
+    "Explain compound interest",
+    "difference between a bond and a debenture",
+    "What is the current ratio?",
+    "Explain the current account deficit",
+])
+def test_evergreen_concepts_stay_local(query):
+    decision = query_router.pre_classify(query)
+    assert decision == {"small_talk": False, "needs_realtime": False, "intent": "concept"}
+
+
+@pytest.mark.parametrize("query", [
+    "What is a P/E ratio?",               # Metric, no company: could be either
+    "what is the market cap of Reliance",
+    "What does HDFC do?",                 # Company, no metric
+])
+def test_ambiguous_concept_questions_go_to_the_llm(query):
+    assert query_router.pre_classify(query) is None
+
+
+def test_small_talk():
+    assert query_router.pre_classify("hello!")["intent"] == "small_talk"
+
+
+def test_latency_saved_reaches_the_request_timings_and_prometheus():
+    with metrics.request_timings() as timings:
+        decision = query_router.route("What is a Roth IRA?")
+
+    assert timings["router"]["llm_calls_saved"] == decision["llm_calls_saved"] == 2
+    assert timings["router"]["latency_saved_ms"] == decision["latency_saved_ms"] > 0
+    assert 'wealthlens_router_latency_saved_seconds_total{source="local"}' in metrics.render_metrics()
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+import run
+
+
+class FailingMemory:
+    """Session memory whose save fails, as with a locked SQLite store"""
+
+    def __init__(self):
+        self.saves = 0
+
+    def save_context(self, inputs, outputs):
+        self.saves += 1
+        raise RuntimeError("database is locked")
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    memory = FailingMemory()
+
+    async def get_or_create_memory(session_id):
+        return memory
+
+    async def aprocess_query_flow(query, memory, deep_search, stream_callback, event_callback):
+        return {"answer": f"answer to {query}"}
+
+    monkeypatch.setattr(run, "get_or_create_memory", get_or_create_memory)
+    monkeypatch.setattr(run, "aprocess_query_flow", aprocess_query_flow)
+    return memory
+
+
+def test_the_stream_ends_at_done_and_the_turn_is_saved_afterwards(memory):
+    async def main():
+        response = await run.handle_query_stream(run.QueryRequest(query="What is an SIP?", session_id="s1"))
+        events = [chunk.split("\n")[0] async for chunk in response.body_iterator]
+        saves_before_close = memory.saves
+        await response.background()  # What the server runs once the stream has closed
+        return events, saves_before_close
+
+    events, saves_before_close = asyncio.run(main())
+
+    assert events == ["event: stage", "event: done"]
+    assert saves_before_close == 0
+    # The failed save was logged, not raised or sent to the client
+    assert memory.saves == 1
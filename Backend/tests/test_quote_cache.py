@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import quote_cache as quote_cache_module
+from quote_cache import QuoteCache
+
+
+class FakeTicker:
+    """yf.Ticker stand-in: history() answers from the bars the test sets, counting calls"""
+
+    bars = None
+    price = 100.0
+    previous_close = 99.0
+    calls = []
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    @property
+    def info(self):
+        FakeTicker.calls.append((self.symbol, "info"))
+        return {"longName": self.symbol.title(), "regularMarketPrice": FakeTicker.price,
+                "regularMarketDayHigh": 102.0}
+
+    @property
+    def fast_info(self):
+        FakeTicker.calls.append((self.symbol, "fast_info"))
+        return SimpleNamespace(last_price=FakeTicker.price, previous_close=FakeTicker.previous_close)
+
+    def history(self, period):
+        FakeTicker.calls.append((self.symbol, period))
+        bars = FakeTicker.bars
+        return bars.iloc[-5:] if period == "5d" else bars
+
+
+def _bars(closes, start="2026-10-05"):
+    return pd.DataFrame({"Close": closes}, index=pd.date_range(start, periods=len(closes), freq="D"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quote_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def fake_yf(monkeypatch):
+    FakeTicker.calls = []
+    FakeTicker.price = 100.0
+    FakeTicker.previous_close = 99.0
+    FakeTicker.bars = _bars([96.0, 97.0, 98.0, 99.0, 100.0, 101.0, 102.0])
+    monkeypatch.setattr(quote_cache_module.yf, "Ticker", FakeTicker)
+    return FakeTicker
+
+
+def test_history_is_served_from_cache_within_the_price_ttl(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, history_ttl=3600)
+    cache.get_history("TCS.NS", period="1y")
+    clock[0] += 10
+    hist = cache.get_history("TCS.NS", period="1y")
+
+    assert fake_yf.calls == [("TCS.NS", "1y")]
+    assert list(hist["Close"])[-1] == 102.0
+
+
+def test_only_the_last_bar_is_refetched_after_the_price_ttl(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, history_ttl=3600)
+    cache.get_history("TCS.NS", period="1y")
+
+    # Today's bar moved; the closed bars did not
+    fake_yf.bars = _bars([96.0, 97.0, 98.0, 99.0, 100.0, 101.0, 105.5])
+    clock[0] += 20
+    hist = cache.get_history("TCS.NS", period="1y")
+
+    assert fake_yf.calls == [("TCS.NS", "1y"), ("TCS.NS", "5d")]
+    assert list(hist["Close"]) == [96.0, 97.0, 98.0, 99.0, 100.0, 101.0, 105.5]
+    assert cache.stats()["price_refreshes"] == 1
+
+
+def test_a_new_session_bar_is_appended(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, history_ttl=3600)
+    cache.get_history("TCS.NS", period="1y")
+
+    # Yesterday's bar closed above where it was cached; today's session opened
+    fake_yf.bars = _bars([96.0, 97.0, 98.0, 99.0, 100.0, 101.0, 103.0, 104.0])
+    clock[0] += 20
+    hist = cache.get_history("TCS.NS", period="1y")
+
+    assert list(hist["Close"]) == [96.0, 97.0, 98.0, 99.0, 100.0, 101.0, 103.0, 104.0]
+
+
+def test_the_whole_frame_is_refetched_after_the_history_ttl(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, history_ttl=3600)
+    cache.get_history("TCS.NS", period="1y")
+    clock[0] += 3601
+    cache.get_history("TCS.NS", period="1y")
+
+    assert fake_yf.calls == [("TCS.NS", "1y"), ("TCS.NS", "1y")]
+
+
+def test_info_is_cached_and_only_prices_are_refreshed_after_the_price_ttl(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, profile_ttl=3600)
+    cache.get_info("TCS.NS")
+    clock[0] += 10
+    assert cache.get_info("TCS.NS")["regularMarketPrice"] == 100.0
+
+    fake_yf.price = 101.5
+    clock[0] += 10
+    info = cache.get_info("TCS.NS")
+
+    assert fake_yf.calls == [("TCS.NS", "info"), ("TCS.NS", "fast_info")]
+    assert info["regularMarketPrice"] == 101.5 and info["longName"] == "Tcs.Ns"
+    assert "regularMarketDayHigh" not in info  # A market field the light refresh could not update
+
+
+def test_a_light_refresh_missing_a_field_falls_back_to_the_full_info(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, profile_ttl=3600)
+    cache.get_info("TCS.NS")
+
+    fake_yf.previous_close = None
+    clock[0] += 20
+    info = cache.get_info("TCS.NS")
+
+    assert fake_yf.calls == [("TCS.NS", "info"), ("TCS.NS", "fast_info"), ("TCS.NS", "info")]
+    assert None not in info.values()
+
+
+def test_info_is_refetched_after_the_profile_ttl(clock, fake_yf):
+    cache = QuoteCache(price_ttl=15, profile_ttl=3600)
+    cache.get_info("TCS.NS")
+    clock[0] += 3601
+    cache.get_info("TCS.NS")
+
+    assert fake_yf.calls == [("TCS.NS", "info"), ("TCS.NS", "info")]
+
+
+def test_least_recently_used_symbols_are_evicted(clock, fake_yf):
+    cache = QuoteCache(max_symbols=2)
+    for symbol in ("TCS.NS", "INFY.NS", "TCS.NS", "HDFCBANK.NS"):
+        cache.get_info(symbol)
+    cache.get_info("INFY.NS")
+
+    assert fake_yf.calls.count(("INFY.NS", "info")) == 2
+    assert fake_yf.calls.count(("TCS.NS", "info")) == 1
+    assert cache.stats()["evictions"] == 2
+
+
+def test_a_disabled_cache_goes_to_yfinance_every_time(clock, fake_yf):
+    cache = QuoteCache(enabled=False)
+    cache.get_info("TCS.NS")
+    cache.get_info("TCS.NS")
+    cache.get_history("TCS.NS", period="1y")
+
+    assert fake_yf.calls == [("TCS.NS", "info"), ("TCS.NS", "info"), ("TCS.NS", "1y")]
+    assert cache.stats()["symbols"] == 0
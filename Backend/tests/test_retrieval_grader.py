@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+
+from hybrid_retriever import BM25Index, HybridRetriever, content_id
+from retrieval_grader import LocalRetrievalGrader
+
+CHUNKS = [
+    "Equity shares INE002A01018 listed on NSE and BSE",
+    "Reliance Industries reported record revenue",
+    "Reliance Retail expanded its store count",
+    "Every listed security has an ISIN assigned by NSDL",
+    "TCS equity ISIN INE467B01029",
+    "Gold prices rose on safe haven demand",
+]
+
+
+class FakeVectorStore:
+    """Dense search that misses the identifier: it only finds the gold chunk, with a low score"""
+
+    def similarity_search_with_relevance_scores(self, query, k):
+        return [(Document(page_content=CHUNKS[-1]), 0.2)]
+
+
+def test_a_chunk_only_bm25_found_by_an_exact_identifier_is_kept(tmp_path):
+    index = BM25Index(path=str(tmp_path / "bm25.json"))
+    for text in CHUNKS:
+        index.add(content_id(text), text)
+    store = FakeVectorStore()
+    retriever = HybridRetriever(vector_store=store, bm25=index, k=3)
+    query = "What is the ISIN INE002A01018 of Reliance"
+    docs = retriever.invoke(query)
+
+    relevant, grades = LocalRetrievalGrader(vector_store=store).grade(query, docs)
+
+    texts = [doc.page_content for doc in docs]
+    assert grades[texts.index(CHUNKS[0])]["signal"] == "bm25"
+    assert CHUNKS[0] in [doc.page_content for doc in relevant]
+    assert CHUNKS[-1] not in [doc.page_content for doc in relevant]
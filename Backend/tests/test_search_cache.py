@@ -0,0 +1,115 @@
+import pytest
+
+import search_cache as search_cache_module
+from search_cache import SearchCache, freshness_tier
+
+TIERS = {"realtime": (10, 100), "news": (60, 600), "evergreen": (600, 6000)}
+
+
+class InlineExecutor:
+    """Runs background refreshes immediately, so tests can check their effect"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(search_cache_module.time, "time", lambda: now[0])
+    monkeypatch.setattr(search_cache_module, "blocking_executor", InlineExecutor())
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return SearchCache(path=str(tmp_path / "search.sqlite3"), memory_entries=2, tiers=TIERS)
+
+
+class Provider:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"results": [{"url": "https://example.com", "content": f"answer {self.calls}"}]}
+
+
+def content(result):
+    return result["results"][0]["content"]
+
+
+@pytest.mark.parametrize("query, tier", [
+    ("Sensex today", "realtime"),
+    ("Latest news on Apple earnings", "news"),
+    ("What is an index fund?", "evergreen"),
+])
+def test_freshness_tiers(query, tier):
+    assert freshness_tier(query) == tier
+
+
+def test_fresh_entries_are_served_without_calling_the_provider(cache):
+    fetch = Provider()
+    cache.get_or_fetch("tavily", "basic", "What is an index fund?", fetch)
+    result = cache.get_or_fetch("tavily", "basic", "what is an index fund", fetch)
+
+    assert fetch.calls == 1
+    assert content(result) == "answer 1"
+    assert cache.stats()["fresh_hits"] == 1
+
+
+def test_stale_entries_are_served_while_refreshed(cache, clock):
+    fetch = Provider()
+    cache.get_or_fetch("tavily", "basic", "Sensex today", fetch)
+
+    clock[0] += 11  # Past the realtime fresh TTL, within its stale limit
+    stale = cache.get_or_fetch("tavily", "basic", "Sensex today", fetch)
+    refreshed = cache.get_or_fetch("tavily", "basic", "Sensex today", fetch)
+
+    assert content(stale) == "answer 1"
+    assert content(refreshed) == "answer 2"
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_entries_past_the_stale_limit_are_refetched(cache, clock):
+    fetch = Provider()
+    cache.get_or_fetch("tavily", "basic", "Sensex today", fetch)
+
+    clock[0] += 101
+    result = cache.get_or_fetch("tavily", "basic", "Sensex today", fetch)
+
+    assert content(result) == "answer 2"
+    assert cache.stats()["misses"] == 2
+
+
+def test_empty_results_are_not_cached(cache):
+    cache.get_or_fetch("tavily", "basic", "What is an index fund?", lambda: {"results": []})
+    fetch = Provider()
+    cache.get_or_fetch("tavily", "basic", "What is an index fund?", fetch)
+
+    assert fetch.calls == 1
+    assert cache.stats()["not_cached"] == 1
+
+
+def test_lru_is_bounded_and_backed_by_disk(cache, tmp_path):
+    fetch = Provider()
+    for query in ("What is a bond?", "What is a stock?", "What is a REIT?"):
+        cache.get_or_fetch("tavily", "basic", query, fetch)
+    assert cache.stats()["memory_entries"] == 2
+
+    # Evicted from memory, still on disk, and visible to a new process
+    reopened = SearchCache(path=str(tmp_path / "search.sqlite3"), memory_entries=2, tiers=TIERS)
+    result = reopened.get_or_fetch("tavily", "basic", "What is a bond?", fetch)
+
+    assert fetch.calls == 3
+    assert content(result) == "answer 1"
+
+
+def test_invalidate_one_provider(cache):
+    fetch = Provider()
+    cache.get_or_fetch("tavily", "basic", "What is a bond?", fetch)
+    cache.get_or_fetch("google", "html", "What is a bond?", fetch)
+
+    assert cache.invalidate("tavily") == 1
+    cache.get_or_fetch("google", "html", "What is a bond?", fetch)
+    assert fetch.calls == 2
@@ -0,0 +1,83 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, message_to_dict
+
+import session_store as session_store_module
+from session_store import MemorySessionStore, SessionChatMessageHistory, SQLiteSessionStore
+
+
+def msg(text):
+    return message_to_dict(HumanMessage(content=text))
+
+
+def texts(messages):
+    return [m["data"]["content"] for m in messages]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(max_messages=4, idle_ttl=3600)
+    return SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), max_messages=4, idle_ttl=3600)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(session_store_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_sessions_are_kept_apart(store):
+    store.append("a", [msg("a1")])
+    store.append("b", [msg("b1")])
+
+    assert texts(store.load("a")) == ["a1"]
+    assert texts(store.load("b")) == ["b1"]
+    assert store.load("unknown") == []
+
+
+def test_history_is_trimmed_to_the_window(store):
+    store.append("a", [msg(f"m{i}") for i in range(3)])
+    store.append("a", [msg("m3"), msg("m4")])
+
+    assert texts(store.load("a")) == ["m1", "m2", "m3", "m4"]
+
+
+def test_replace_prefix_keeps_the_newer_messages_in_order(store):
+    store.append("a", [msg(f"m{i}") for i in range(4)])
+    store.replace_prefix("a", 2, msg("summary"))
+
+    assert texts(store.load("a")) == ["summary", "m2", "m3"]
+
+
+def test_clear(store):
+    store.append("a", [msg("a1")])
+    store.clear("a")
+    assert store.load("a") == []
+
+
+def test_idle_sessions_are_evicted(store, clock):
+    store.append("old", [msg("old")])
+    clock[0] += 1800
+    store.append("recent", [msg("recent")])
+    clock[0] += 1801
+
+    assert store.evict_idle() == 1
+    assert store.load("old") == []
+    assert texts(store.load("recent")) == ["recent"]
+
+
+def test_sqlite_sessions_are_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SQLiteSessionStore(path=path).append("a", [msg("from worker 1")])
+
+    assert texts(SQLiteSessionStore(path=path).load("a")) == ["from worker 1"]
+
+
+def test_chat_message_history_round_trips_langchain_messages(store):
+    history = SessionChatMessageHistory(store, "a")
+    history.add_messages([SystemMessage(content="summary"), HumanMessage(content="hi"), AIMessage(content="hello")])
+
+    assert [(m.type, m.content) for m in history.messages] == [("system", "summary"), ("human", "hi"), ("ai", "hello")]
+    history.clear()
+    assert history.messages == []
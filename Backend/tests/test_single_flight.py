@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What's the   PRICE of TCS?! ") == "what s the price of tcs"
+    assert normalize_query("S&P 500 up 1.5%.") == "s&p 500 up 1.5%"
+
+
+def test_concurrent_calls_share_one_computation():
+    flights = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"answer": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("key", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 5
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    flights = SingleFlight("test")
+
+    def fail():
+        raise ValueError("provider down")
+
+    with pytest.raises(ValueError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: "recovered") == "recovered"
+    assert flights.stats()["errors"] == 1
+
+
+def test_async_callers_share_one_task_and_joiners_are_told():
+    flights = SingleFlight("test")
+    calls, joined = [], []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flights.ado("key", compute, on_join=lambda: joined.append(1)) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["answer"] * 3
+    assert len(calls) == 1 and len(joined) == 2
+
+
+def test_one_caller_leaving_does_not_cancel_the_others():
+    flights = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        leaver = asyncio.ensure_future(flights.ado("key", compute))
+        stayer = asyncio.ensure_future(flights.ado("key", compute))
+        await asyncio.sleep(0.01)
+        leaver.cancel()
+        return await stayer
+
+    assert asyncio.run(main()) == "answer"
+    assert flights.stats()["abandoned"] == 0
+
+
+def test_the_task_is_cancelled_when_every_caller_leaves():
+    flights = SingleFlight("test")
+    cancelled = []
+
+    async def compute():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        caller = asyncio.ensure_future(flights.ado("key", compute))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [1]
+    assert flights.stats()["abandoned"] == 1
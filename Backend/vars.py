@@ -1,9 +1,11 @@
 # vars.py
 
 import os
+import copy
+import threading
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from agno.models.groq.groq import Groq
+# LLM SDKs (httpx, langchain_groq, agno, groq) are imported inside the builders below so that
+# importing vars for its settings stays cheap (see subsystems.py)
 
 load_dotenv()
 
@@ -40,6 +42,132 @@ TOOL_CALL_LLM_LOCAL = "llama3.2:latest"
 MAX_SEARCH_CALLS = 5 # Max Tavily/Tool calls *within* deep research recursion
 MAX_DEPTH = 2        # Max recursion depth for subquestions
 NUM_SUBQUESTIONS = 3 # Initial number of subquestions
+PARALLEL_RESEARCH = True # Research subquestions (and their children) concurrently
+MAX_RESEARCH_WORKERS = 4 # Deep research threads, shared by every fan-out level and concurrent run
+
+# --- Query Router ---
+# One routing step replaces the separate small-talk and real-time classifier calls.
+ENABLE_LOCAL_ROUTER = True # Keyword/regex pre-classifier answers obvious queries without an LLM call
+ROUTER_LLM_LATENCY_PRIOR = 0.6 # Seconds per classifier round trip, used until real latencies are measured
+
+# --- Async Pipeline ---
+# Threads available for the blocking parts of the async pipeline (yfinance, Chroma retrieval,
+# sync SDK calls). Keeps slow providers from starving the uvicorn event loop.
+BLOCKING_EXECUTOR_WORKERS = 16
+HTTP_TIMEOUT = 10 # Seconds, for scraper/provider HTTP calls
+LLM_HTTP_TIMEOUT = 120 # Seconds, for LLM API calls (long generations)
+LLM_MAX_CONNECTIONS = 100 # Shared LLM HTTP pool size
+LLM_MAX_KEEPALIVE = 20
+# Web search provider strategy: "fanout" queries Tavily/financial/Google/Bing/DuckDuckGo concurrently
+# and stops once enough unique results arrive; "sequential" tries them one by one in priority order.
+SEARCH_STRATEGY = "fanout"
+SEARCH_FANOUT_DEADLINE = 8.0 # Seconds, global deadline for a fan-out search
+SEARCH_MIN_RESULTS = 3 # Results needed before remaining providers are skipped/cancelled
+SEARCH_FANOUT_GRACE = 1.5 # Seconds the fan-out still waits for the first-priority provider (Tavily) once enough results are in
+SEARCH_FANOUT_WORKERS = 16 # Threads shared by all sync fan-out searches; abandoned stragglers hold one until they time out
+CONCURRENT_RETRIEVAL_AND_SEARCH = True # Run RAG retrieval+grading and web search side by side, join at synthesis
+# Identical questions in flight at the same time (same normalized text and mode) share one pipeline
+# run, and identical web searches one search run; quote fetches are always coalesced (quote cache).
+ENABLE_REQUEST_COALESCING = True
+
+# --- LLM Scheduler ---
+# Every Groq call passes one process-wide scheduler: per-model request/token budgets (split across
+# SERVER_WORKERS), priority queues (interactive answers before deep research and summaries) and
+# jittered retries of 429/5xx. The SDKs' own retries are turned off while it is on.
+ENABLE_LLM_SCHEDULER = True
+LLM_RATE_LIMITS = { # Account limits per model: requests and tokens per minute
+    "default": {"rpm": 30, "tpm": 6000},
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"rpm": 30, "tpm": 30000},
+}
+LLM_MAX_RETRIES = 4
+LLM_BACKOFF_BASE = 0.5 # Seconds, first retry waits up to this, doubling per attempt
+LLM_BACKOFF_MAX = 20.0 # Seconds, cap of one backoff
+LLM_COMPLETION_TOKEN_ESTIMATE = 512 # Tokens reserved for the answer when a request sets no max_tokens
+LLM_QUEUE_TIMEOUT = 120 # Seconds a call may wait for budget before failing
+
+# --- Startup ---
+# The server answers /health right away; the vector store, LLM clients and tools are built on
+# first use, or ahead of time by a background warmup thread when this is on.
+WARMUP_ON_STARTUP = True
+# Uvicorn worker processes (start_server.py). With more than one, sessions must live in a shared
+# store ("sqlite" or "redis" below), never "memory".
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Load testing: when set (e.g. http://127.0.0.1:9100), every Groq / Tavily / Yahoo / search-engine /
+# Ollama call is sent to mock_providers.py instead of the real service
+MOCK_PROVIDERS_URL = os.getenv("MOCK_PROVIDERS_URL", "")
+
+# --- Conversation Sessions ---
+# "sqlite": WAL-mode file shared by all workers on this host; "redis": any Redis-protocol server
+# (Redis, Valkey, KeyDB), for workers on several hosts; "memory": single process only.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = "./db/sessions.sqlite3"
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_MAX_MESSAGES = 20 # History window per session (user + assistant messages), oldest dropped first
+SESSION_IDLE_TTL = 6 * 60 * 60 # Seconds without activity before a session is evicted
+
+# --- Conversation Memory ---
+# "summary": the last MEMORY_RECENT_TURNS question/answer pairs verbatim plus a rolling summary of
+# older ones, capped at MEMORY_TOKEN_BUDGET tokens per prompt; "buffer": the raw stored window.
+# SESSION_MAX_MESSAGES must stay above 2 * MEMORY_RECENT_TURNS + 3 so the summary is never trimmed.
+MEMORY_MODE = "summary"
+MEMORY_RECENT_TURNS = 3
+MEMORY_TOKEN_BUDGET = 1500 # History tokens per synthesis prompt (summary + verbatim turns)
+MEMORY_SUMMARY_TOKENS = 400 # Part of the budget the rolling summary may use
+
+# --- Semantic Answer Cache ---
+# Near-duplicate questions ("nifty 50 today?" / "what is the nifty today") reuse a recent answer.
+ENABLE_ANSWER_CACHE = True
+ANSWER_CACHE_SIMILARITY = 0.92 # Cosine similarity needed to reuse an answer
+ANSWER_CACHE_TTL = 6 * 3600 # Seconds, evergreen questions
+ANSWER_CACHE_REALTIME_TTL = 60 # Seconds, questions the router flagged as needing real-time data
+ANSWER_CACHE_MAX_ENTRIES = 2048
+
+# --- Market Data Cache ---
+# Shared yfinance quote cache: per-field-group TTLs (seconds), LRU bound on symbols.
+ENABLE_QUOTE_CACHE = True
+QUOTE_CACHE_MAX_SYMBOLS = 1024
+QUOTE_PRICE_TTL = 15          # regularMarketPrice, previousClose, day range/volume
+QUOTE_PROFILE_TTL = 6 * 3600  # marketCap, longName, currency and the rest of .info
+QUOTE_HISTORY_TTL = 24 * 3600 # .history() frames
+
+# --- Embedding Cache ---
+# Content-addressed (model, text hash) vectors on disk with an in-memory LRU in front.
+ENABLE_EMBEDDING_CACHE = True
+EMBEDDING_CACHE_PATH = "./db/embedding_cache.sqlite3"
+EMBEDDING_CACHE_MEMORY_ENTRIES = 10000
+
+# --- Search Cache ---
+# Tavily and search-engine results keyed by (provider, depth, normalized query), on disk with an
+# in-memory LRU in front. Per freshness tier: (fresh seconds, serve stale up to seconds); a stale
+# hit is answered at once while one background refresh fetches a new copy.
+ENABLE_SEARCH_CACHE = True
+SEARCH_CACHE_PATH = "./db/search_cache.sqlite3"
+SEARCH_CACHE_MEMORY_ENTRIES = 2000
+SEARCH_CACHE_TIERS = {
+    "realtime": (120, 600),                 # Prices, "today", index levels
+    "news": (30 * 60, 6 * 3600),            # Earnings, announcements, "latest"
+    "evergreen": (3 * 86400, 14 * 86400),   # Definitions, concepts, history
+}
+
+# --- Knowledge Base Retrieval ---
+# "hybrid": BM25 (exact tickers, ISINs, figures) fused with dense results via reciprocal rank fusion
+# "dense": the plain Chroma similarity retriever
+RETRIEVAL_MODE = "hybrid"
+RETRIEVAL_K = 3 # Chunks handed to grading / synthesis
+RETRIEVAL_FETCH_K = 20 # Candidates taken from each retriever before fusion
+RRF_K = 60 # Reciprocal rank fusion constant
+BM25_INDEX_PATH = "./db/bm25_index.json"
+ENABLE_RERANKER = False # Needs sentence-transformers; reorders the fused candidates on CPU
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# --- Retrieval Grading ---
+# "local": each chunk graded from its vector relevance score (or cross-encoder score), no LLM call
+# "llm": one remote LLM call returning a 0/1 JSON score for all chunks together
+GRADING_MODE = "local"
+LOCAL_GRADE_THRESHOLD = 0.5 # Chroma relevance score (0-1) a chunk needs to be kept
+LOCAL_GRADE_BM25_THRESHOLD = 0.5 # BM25 score relative to the query's best BM25 hit, for chunks only BM25 found
+ENABLE_CROSS_ENCODER_GRADING = False # Needs sentence-transformers (see RERANKER_MODEL)
+CROSS_ENCODER_THRESHOLD = 0.5 # sigmoid(cross-encoder logit) a chunk needs to be kept
 
 # --- Knowledge Base ---
 # Add path to your vector store if needed, or configure as necessary
@@ -68,8 +196,63 @@ def get_llm_id(type="remote"):
         else:
             return REMOTE_LLM
 
-def get_llm_provider(model_id, framework="agno"):
-    """Returns the appropriate Langchain/Agno LLM class based on config"""
+# --- LLM Client Registry ---
+# One client per (model_id, framework), built on first use and shared by every module/thread.
+# Remote clients share one keep-alive (HTTP/2 when h2 is installed) connection pool per sync use,
+# and one per event loop for async use (process_query_flow runs each query on a new loop).
+_llm_clients = {}
+_llm_clients_lock = threading.Lock()
+_http_clients = {}
+
+
+def _http_client_params(kind="sync"):
+    import httpx
+    try:
+        import h2  # noqa: F401 - httpx needs it for HTTP/2
+        http2 = True
+    except ImportError:
+        http2 = False
+    params = dict(
+        http2=http2,
+        timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=HTTP_TIMEOUT),
+        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+    )
+    if ENABLE_LLM_SCHEDULER:
+        from llm_scheduler import ScheduledTransport, AsyncScheduledTransport
+        transport = ScheduledTransport if kind == "sync" else AsyncScheduledTransport
+        params["transport"] = transport(http2=params["http2"], limits=params.pop("limits"))
+    return params
+
+
+def _shared_http_client(kind="sync"):
+    """Process-wide httpx client for LLM APIs. Caller holds _llm_clients_lock."""
+    import httpx
+    if kind not in _http_clients:
+        if kind == "sync":
+            _http_clients[kind] = httpx.Client(**_http_client_params("sync"))
+        else:
+            from async_utils import LoopLocalAsyncClient
+            # The SDK clients keep this object for life; its pools are created per running loop
+            _http_clients[kind] = LoopLocalAsyncClient(
+                lambda: httpx.AsyncClient(**_http_client_params("async")),
+                timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=HTTP_TIMEOUT),
+            )
+    return _http_clients[kind]
+
+
+def _groq_api_key():
+    # Ensure .env is loaded
+    load_dotenv()
+    api_key = os.environ.get('GROQ_API_KEY')
+    if not api_key:
+        print("❌ GROQ_API_KEY not found in environment variables.")
+        print("🔍 Available env vars:", [k for k in os.environ.keys() if 'GROQ' in k])
+        raise ValueError("GROQ_API_KEY not found in environment variables.")
+    return api_key
+
+
+def _build_llm_provider(model_id, framework):
+    from metrics import llm_metrics_callback
     if ENABLE_LOCAL:
         if framework == "agno":
             from agno.models.ollama import Ollama
@@ -79,27 +262,45 @@ def get_llm_provider(model_id, framework="agno"):
         # return ChatOllama(model=model_id, temperature=0)
         if framework == "langchain":
             from langchain_community.chat_models import ChatOllama
-            return ChatOllama(model=model_id, temperature=0)
+            return ChatOllama(model=model_id, temperature=0, callbacks=[llm_metrics_callback(model_id)])
     else:
+        api_key = _groq_api_key()
+        http_client = _shared_http_client("sync")
+        async_http_client = _shared_http_client("async")
         if framework == "agno":
             # Assuming Groq for remote, add others (Gemini, OpenAI) if needed
+            from agno.models.groq.groq import Groq
+            from groq import Groq as GroqClient, AsyncGroq as AsyncGroqClient
             print(f"Using remote Groq model: {model_id}")
+            model = Groq(id=model_id, temperature=0, api_key=api_key)
+            # Agno builds its SDK clients lazily and caches them here; pre-set them on the shared pools.
+            # The LLM scheduler retries with its own budget-aware backoff, so the SDK must not.
+            max_retries = 0 if ENABLE_LLM_SCHEDULER else 2
+            model.client = GroqClient(api_key=api_key, http_client=http_client, max_retries=max_retries)
+            model.async_client = AsyncGroqClient(api_key=api_key, http_client=async_http_client, max_retries=max_retries)
+            return model
+        if framework == "langchain":
+            from langchain_groq import ChatGroq
+            return ChatGroq(
+                model=model_id, temperature=0, groq_api_key=api_key,
+                http_client=http_client, http_async_client=async_http_client,
+                max_retries=0 if ENABLE_LLM_SCHEDULER else 2,
+                callbacks=[llm_metrics_callback(model_id)],
+            )
+    raise ValueError(f"Unsupported LLM framework: {framework}")
 
-            # Ensure .env is loaded
-            load_dotenv()
-            api_key = os.environ.get('GROQ_API_KEY')
-
-            if not api_key:
-                print("❌ GROQ_API_KEY not found in environment variables.")
-                print("🔍 Available env vars:", [k for k in os.environ.keys() if 'GROQ' in k])
-                raise ValueError("GROQ_API_KEY not found in environment variables.")
 
-            print(f"✅ Found GROQ_API_KEY: {api_key[:20]}...")
-            return Groq(id=model_id, temperature=0)
-        if framework == "langchain":
-            # Ensure .env is loaded for langchain too
-            load_dotenv()
-            api_key = os.environ.get('GROQ_API_KEY')
-            if not api_key:
-                raise ValueError("GROQ_API_KEY not found for langchain framework.")
-            return ChatGroq(model=model_id, temperature=0, groq_api_key=api_key)
\ No newline at end of file
+def get_llm_provider(model_id, framework="agno"):
+    """Returns the shared Langchain/Agno LLM client for this model, creating it on first use"""
+    key = (model_id, framework)
+    client = _llm_clients.get(key)
+    if client is None:
+        with _llm_clients_lock:
+            client = _llm_clients.get(key)
+            if client is None:
+                client = _llm_clients[key] = _build_llm_provider(model_id, framework)
+    if framework == "agno":
+        # Agents attach tools / response formats to their model, so each caller gets its own
+        # shallow copy; the copies share the cached SDK clients and their connection pools.
+        return copy.copy(client)
+    return client
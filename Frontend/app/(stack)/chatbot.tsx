@@ -14,7 +14,7 @@ import {
 import { useTheme } from '@/contexts/ThemeContext';
 import { useResponsive } from '@/hooks/useResponsive';
 import { Card } from '@/components/Card';
-import { chatbotApi, ChatMessage } from '@/services/chatbotApi';
+import { chatbotApi, ChatMessage, ChatbotStreamEvent } from '@/services/chatbotApi';
 import {
   Send,
   MessageCircle,
@@ -32,8 +32,42 @@ interface ChatHistory {
   title: string;
   messages: ChatMessage[];
   timestamp: Date;
+  sessionId?: string | null;
 }
 
+// The non-streaming endpoint has returned several shapes over time; always end up with display text
+const toResponseText = (aiResponseText: unknown): string => {
+  if (typeof aiResponseText === 'string') {
+    return aiResponseText;
+  }
+  if (aiResponseText && typeof aiResponseText === 'object') {
+    // If it's an object, try to extract meaningful text
+    const responseObj = aiResponseText as Record<string, any>;
+    if ('answer' in responseObj && typeof responseObj.answer === 'string') {
+      return responseObj.answer;
+    }
+    if ('message' in responseObj && typeof responseObj.message === 'string') {
+      return responseObj.message;
+    }
+    return 'I received an unexpected response format. Please try again.';
+  }
+  return String(aiResponseText || 'No response received');
+};
+
+// Loading text for the pipeline stages the backend streams
+const STAGE_LABELS: Record<string, string> = {
+  accepted: 'Thinking...',
+  cache_hit: 'Found a recent answer...',
+  coalesced: 'Joining an identical question in progress...',
+  financial_check: 'Checking your question...',
+  routing: 'Understanding your question...',
+  retrieval: 'Searching the knowledge base...',
+  grading: 'Checking the sources...',
+  web_search: 'Searching the web...',
+  deep_research: 'Conducting deep research...',
+  synthesis: 'Writing the answer...',
+};
+
 export default function ChatbotScreen() {
   const { colors } = useTheme();
   const { isTablet, isDesktop } = useResponsive();
@@ -42,6 +76,7 @@ export default function ChatbotScreen() {
   const [chatHistory, setChatHistory] = useState<ChatHistory[]>([]);
   const [showHistory, setShowHistory] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
+  const [loadingStage, setLoadingStage] = useState<string | null>(null);
   const [deepResearchMode, setDeepResearchMode] = useState(false);
   const [connectionStatus, setConnectionStatus] = useState<'connected' | 'disconnected' | 'testing'>('testing');
   const flatListRef = useRef<FlatList>(null);
@@ -74,40 +109,51 @@ export default function ChatbotScreen() {
     const currentQuery = inputText.trim();
     setInputText('');
     setIsLoading(true);
+    setLoadingStage(null);
+
+    const aiId = (Date.now() + 1).toString();
+    const isDeepResearch = deepResearchMode;
+    let streamedText = '';
+    let flushTimer: ReturnType<typeof setTimeout> | null = null;
+
+    // Insert the AI message on first use, then keep replacing its text
+    const showAnswer = (text: string) => {
+      setMessages(prev => {
+        const aiMessage: ChatMessage = { id: aiId, text, isUser: false, timestamp: new Date(), isDeepResearch };
+        return prev.some(m => m.id === aiId)
+          ? prev.map(m => (m.id === aiId ? aiMessage : m))
+          : [...prev, aiMessage];
+      });
+    };
 
-    try {
-      // Call the backend API
-      const aiResponseText = await chatbotApi.sendQuery(currentQuery, deepResearchMode);
-      
-      // Ensure the response is a string and handle any edge cases
-      let responseText: string;
-      if (typeof aiResponseText === 'string') {
-        responseText = aiResponseText;
-      } else if (aiResponseText && typeof aiResponseText === 'object') {
-        // If it's an object, try to extract meaningful text
-        const responseObj = aiResponseText as Record<string, any>;
-        if ('answer' in responseObj && typeof responseObj.answer === 'string') {
-          responseText = responseObj.answer;
-        } else if ('message' in responseObj && typeof responseObj.message === 'string') {
-          responseText = responseObj.message;
-        } else {
-          responseText = 'I received an unexpected response format. Please try again.';
+    // Tokens arrive faster than the list can re-render: flush the growing answer at most every 50 ms
+    const onStreamEvent = (event: ChatbotStreamEvent) => {
+      if (event.event === 'stage') {
+        setLoadingStage(event.data.stage);
+      } else if (event.event === 'token') {
+        streamedText += event.data.text;
+        if (!flushTimer) {
+          flushTimer = setTimeout(() => {
+            flushTimer = null;
+            showAnswer(streamedText);
+          }, 50);
         }
-      } else {
-        responseText = String(aiResponseText || 'No response received');
       }
-      
-      console.log('AI Response received:', { original: aiResponseText, processed: responseText });
-
-      const aiResponse: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        text: responseText,
-        isUser: false,
-        timestamp: new Date(),
-        isDeepResearch: deepResearchMode,
-      };
+    };
 
-      setMessages(prev => [...prev, aiResponse]);
+    try {
+      let responseText: string;
+      try {
+        responseText = await chatbotApi.sendQueryStream(currentQuery, isDeepResearch, onStreamEvent);
+      } catch (streamError) {
+        if (streamedText) throw streamError;
+        // Nothing shown yet (e.g. a proxy that buffers or rejects event streams): ask once without streaming
+        console.warn('Streaming failed, retrying without streaming:', streamError);
+        responseText = toResponseText(await chatbotApi.sendQuery(currentQuery, isDeepResearch));
+      }
+      if (flushTimer) clearTimeout(flushTimer);
+      console.log('AI Response received:', responseText.length, 'characters');
+      showAnswer(responseText);
 
       // Update connection status if successful
       if (connectionStatus === 'disconnected') {
@@ -115,20 +161,26 @@ export default function ChatbotScreen() {
       }
     } catch (error) {
       console.error('Error sending message:', error);
+      if (flushTimer) clearTimeout(flushTimer);
 
-      // Fallback response
-      const fallbackResponse: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        text: chatbotApi.getFallbackResponse(currentQuery),
-        isUser: false,
-        timestamp: new Date(),
-        isDeepResearch: false,
-      };
-
-      setMessages(prev => [...prev, fallbackResponse]);
+      if (streamedText) {
+        // Keep the part of the answer that arrived
+        showAnswer(streamedText + '\n\n[Connection lost before the answer was complete]');
+      } else {
+        // Fallback response
+        const fallbackResponse: ChatMessage = {
+          id: aiId,
+          text: chatbotApi.getFallbackResponse(currentQuery),
+          isUser: false,
+          timestamp: new Date(),
+          isDeepResearch: false,
+        };
+        setMessages(prev => [...prev, fallbackResponse]);
+      }
       setConnectionStatus('disconnected');
     } finally {
       setIsLoading(false);
+      setLoadingStage(null);
     }
   };
 
@@ -145,14 +197,22 @@ export default function ChatbotScreen() {
       title,
       messages: [...messages],
       timestamp: new Date(),
+      sessionId: chatbotApi.getSessionId(),
     };
 
     setChatHistory(prev => [newHistory, ...prev]);
+    clearMessages();
+  };
+
+  // A cleared chat is a new conversation on the backend too
+  const clearMessages = () => {
     setMessages([]);
+    chatbotApi.resetSession();
   };
 
   const loadFromHistory = (historyItem: ChatHistory) => {
     setMessages(historyItem.messages);
+    chatbotApi.setSessionId(historyItem.sessionId ?? null);
     setShowHistory(false);
   };
 
@@ -180,7 +240,7 @@ export default function ChatbotScreen() {
         'Do you want to save this conversation to history before clearing?',
         [
           { text: 'Cancel', style: 'cancel' },
-          { text: 'Clear Without Saving', style: 'destructive', onPress: () => setMessages([]) },
+          { text: 'Clear Without Saving', style: 'destructive', onPress: clearMessages },
           { text: 'Save & Clear', onPress: () => { saveToHistory(); } },
         ]
       );
@@ -197,7 +257,7 @@ export default function ChatbotScreen() {
           {
             text: 'Start New Without Saving',
             style: 'destructive',
-            onPress: () => setMessages([])
+            onPress: clearMessages
           },
           {
             text: 'Save & Start New',
@@ -209,7 +269,7 @@ export default function ChatbotScreen() {
       );
     } else {
       // If no messages, just ensure clean state
-      setMessages([]);
+      clearMessages();
     }
   };
 
@@ -435,7 +495,8 @@ export default function ChatbotScreen() {
           <View style={styles.loadingContent}>
             <ActivityIndicator size="small" color={colors.primary} />
             <Text style={[styles.loadingText, { color: colors.textSecondary }]}>
-              {deepResearchMode ? 'AI is conducting deep research...' : 'AI is typing...'}
+              {(loadingStage && STAGE_LABELS[loadingStage]) ||
+                (deepResearchMode ? 'AI is conducting deep research...' : 'AI is typing...')}
             </Text>
             {deepResearchMode && (
               <View style={[styles.deepResearchIndicator, { backgroundColor: colors.primary + '20' }]}>
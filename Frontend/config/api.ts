@@ -9,6 +9,7 @@ export const API_CONFIG = {
   ENDPOINTS: {
     HEALTH: '/health',
     QUERY: '/query',
+    QUERY_STREAM: '/query/stream',
   },
   
   // Development settings
@@ -4,6 +4,7 @@ import { getApiUrl, getEndpointUrl, API_CONFIG } from '@/config/api';
 export interface ChatbotRequest {
   query: string;
   deep_search?: boolean;
+  session_id?: string;
 }
 
 export interface ChatbotResponse {
@@ -11,8 +12,16 @@ export interface ChatbotResponse {
     answer: string;
     deep_research_log?: string;
   };
+  session_id?: string;
 }
 
+export type ChatbotStreamEvent =
+  | { event: 'stage'; data: { stage: string; session_id?: string } }
+  | { event: 'log'; data: { message: string } }
+  | { event: 'token'; data: { text: string } }
+  | { event: 'done'; data: { answer: string; deep_research_log?: string; session_id?: string } }
+  | { event: 'error'; data: { detail: string } };
+
 export interface ChatMessage {
   id: string;
   text: string;
@@ -23,6 +32,8 @@ export interface ChatMessage {
 
 class ChatbotApiService {
   private baseUrl: string;
+  // Backend conversation session: minted by the server on the first query, sent on every later one
+  private sessionId: string | null = null;
 
   constructor() {
     // Use the centralized API configuration
@@ -30,13 +41,42 @@ class ChatbotApiService {
     console.log('Chatbot API Service initialized with base URL:', this.baseUrl);
   }
 
+  getSessionId(): string | null {
+    return this.sessionId;
+  }
+
+  /**
+   * Continue an earlier conversation (e.g. one loaded from history), or pass null to start fresh
+   */
+  setSessionId(sessionId: string | null): void {
+    this.sessionId = sessionId;
+  }
+
+  /**
+   * Start a new conversation: the next query gets a new server-side session
+   */
+  resetSession(): void {
+    this.sessionId = null;
+  }
+
+  private buildRequest(query: string, deepSearch: boolean): ChatbotRequest {
+    const request: ChatbotRequest = { query, deep_search: deepSearch };
+    if (this.sessionId) request.session_id = this.sessionId;
+    return request;
+  }
+
+  private rememberSession(sessionId?: string): void {
+    if (sessionId) this.sessionId = sessionId;
+  }
+
   /**
    * Send a query to the chatbot backend
    */
   async sendQuery(query: string, deepSearch: boolean = false): Promise<string> {
     try {
       const endpoint = getEndpointUrl(API_CONFIG.ENDPOINTS.QUERY);
-      console.log(`Sending query to ${endpoint}:`, { query, deep_search: deepSearch });
+      const request = this.buildRequest(query, deepSearch);
+      console.log(`Sending query to ${endpoint}:`, request);
 
       const controller = new AbortController();
       const timeoutId = setTimeout(() => controller.abort(), 
@@ -49,10 +89,7 @@ class ChatbotApiService {
           'Content-Type': 'application/json',
           'Accept': 'application/json',
         },
-        body: JSON.stringify({
-          query: query,
-          deep_search: deepSearch,
-        }),
+        body: JSON.stringify(request),
         signal: controller.signal,
       });
 
@@ -66,6 +103,7 @@ class ChatbotApiService {
 
       const data = await response.json();
       console.log('Backend response data:', data);
+      this.rememberSession(data.session_id);
       
       // Handle the current backend response format: {answer: {answer: "text", deep_research_log: ""}}
       if (data.answer && typeof data.answer === 'object' && 'answer' in data.answer) {
@@ -98,6 +136,79 @@ class ChatbotApiService {
     }
   }
 
+  /**
+   * Send a query to the streaming endpoint (server-sent events).
+   * onEvent fires for each stage/log/token event; resolves with the final answer.
+   * Uses XMLHttpRequest progress events, which React Native delivers incrementally.
+   */
+  sendQueryStream(
+    query: string,
+    deepSearch: boolean = false,
+    onEvent: (event: ChatbotStreamEvent) => void = () => {}
+  ): Promise<string> {
+    const endpoint = getEndpointUrl(API_CONFIG.ENDPOINTS.QUERY_STREAM);
+    const request = this.buildRequest(query, deepSearch);
+    console.log(`Streaming query to ${endpoint}:`, request);
+
+    return new Promise((resolve, reject) => {
+      const xhr = new XMLHttpRequest();
+      let parsedUpTo = 0;
+      let finalAnswer: string | null = null;
+
+      const parseEvents = () => {
+        const text = xhr.responseText;
+        let boundary = text.indexOf('\n\n', parsedUpTo);
+        while (boundary !== -1) {
+          const block = text.slice(parsedUpTo, boundary);
+          parsedUpTo = boundary + 2;
+          boundary = text.indexOf('\n\n', parsedUpTo);
+
+          let eventName = 'message';
+          let data = '';
+          for (const line of block.split('\n')) {
+            if (line.startsWith('event: ')) eventName = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+          }
+          if (!data) continue;
+
+          try {
+            const event = { event: eventName, data: JSON.parse(data) } as ChatbotStreamEvent;
+            // The first "accepted" stage already carries the session, so it survives a dropped stream
+            if (event.event === 'stage' || event.event === 'done') this.rememberSession(event.data.session_id);
+            if (event.event === 'done') finalAnswer = event.data.answer;
+            onEvent(event);
+            if (event.event === 'error') {
+              reject(new Error(event.data.detail));
+            }
+          } catch (error) {
+            console.warn('Could not parse stream event:', block);
+          }
+        }
+      };
+
+      xhr.open('POST', endpoint);
+      xhr.setRequestHeader('Content-Type', 'application/json');
+      xhr.setRequestHeader('Accept', 'text/event-stream');
+      xhr.timeout = deepSearch ? API_CONFIG.TIMEOUT.DEEP_RESEARCH : API_CONFIG.TIMEOUT.QUERY;
+
+      xhr.onprogress = parseEvents;
+      xhr.onload = () => {
+        parseEvents();
+        if (xhr.status < 200 || xhr.status >= 300) {
+          reject(new Error(`Server responded with status ${xhr.status}: ${xhr.responseText}`));
+        } else if (finalAnswer !== null) {
+          resolve(finalAnswer);
+        } else {
+          reject(new Error('Stream ended without an answer.'));
+        }
+      };
+      xhr.onerror = () => reject(new Error('Failed to connect to the server. Please check if the backend is running and accessible.'));
+      xhr.ontimeout = () => reject(new Error('Request timed out. Please try again or check your connection.'));
+
+      xhr.send(JSON.stringify(request));
+    });
+  }
+
   /**
    * Test connection to the backend
    */